@@ -0,0 +1,382 @@
+"""
+Per-stage benchmark over the bundled programs/ and plans/ corpora.
+
+Every file is processed in a fresh child process (the parse cache disabled), and
+each stage is timed separately:
+
+    programs: parse, metadata, outcomes, subjects
+    plans:    parse, metadata, subjects, adaptive (only when the first pass finds
+              fewer than plan_parser.MIN_SUBJECTS_THRESHOLD subjects)
+
+For every stage the wall time and the process peak RSS after the stage are
+recorded, plus the number of subjects found per file. Results are written as JSON
+and compared against a stored baseline; the exit code is 1 when a stage regressed.
+Timings only compare on the same machine: the shipped benchmarks/baseline.json
+was recorded on a 1-CPU Linux box, so re-record it (--save-baseline) on the
+machine that runs the check, and again whenever the parser changes on purpose.
+
+    python benchmark.py                      # run, compare with benchmarks/baseline.json
+    python benchmark.py --save-baseline      # run and store the result as the new baseline
+    python benchmark.py --filter is_ --repeat 3 --threshold 0.3
+    python benchmark.py --rows 50000         # plan_parser row throughput on a synthetic plan
+    python benchmark.py --scaling            # extractor time vs. synthetic input size (see synthetic.py)
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import resource
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BACKEND_DIR)
+CORPORA = ("programs", "plans")
+BENCHMARK_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "latest.json")
+
+# A stage is only reported as regressed if it is slower by this fraction AND this many seconds
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA = 0.05
+
+# Scaling runs: input sizes (table rows) and the growth exponent above which a case is flagged
+SCALING_SIZES = (1000, 2000, 4000, 8000, 16000)
+DEFAULT_MAX_EXPONENT = 1.3
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _timed(stages, name, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    stages[name] = {"wall_s": round(time.perf_counter() - started, 4), "peak_rss_mb": _peak_rss_mb()}
+    return result
+
+
+def _parse(path):
+    import file_parser
+    if path.endswith(".docx"):
+        return file_parser.parse_docx(path)
+    return file_parser.parse_pdf(path)
+
+
+def _bench_program(path, stages):
+    import data_extractor_v2
+
+    parsed = _timed(stages, "parse", _parse, path)
+    if parsed.get("error"):
+        raise RuntimeError(parsed["error"])
+    tables, text, pages = parsed.get("tables", []), parsed.get("content", ""), parsed.get("pages")
+
+    _timed(stages, "metadata", lambda: (data_extractor_v2.extract_general_info(tables, text),
+                                        data_extractor_v2.extract_outcomes_info(text)))
+    _timed(stages, "outcomes", data_extractor_v2.extract_detailed_outcomes, tables, pages)
+    # Full extraction, as served by /api/process-document (includes metadata and outcomes)
+    subjects = _timed(stages, "subjects", data_extractor_v2.extract_data_from_docx_v2, tables, text, pages)
+    return len(subjects) if isinstance(subjects, list) else 0
+
+
+def _bench_plan(path, stages):
+    import plan_parser
+
+    parsed = _timed(stages, "parse", _parse, path)
+    if parsed.get("error"):
+        raise RuntimeError(parsed["error"])
+
+    metadata = _timed(stages, "metadata", plan_parser.extract_plan_metadata, parsed.get("content", ""))
+    subjects = _timed(stages, "subjects", plan_parser.extract_plan_table,
+                      plan_parser._plan_pages(parsed), metadata)
+    if len(subjects) < plan_parser.MIN_SUBJECTS_THRESHOLD and path.endswith(".pdf"):
+        subjects = _timed(stages, "adaptive", plan_parser.adaptive_reparse, path, parsed, metadata, subjects)
+    return len(subjects)
+
+
+def bench_file(corpus, path):
+    """Runs in a fresh child process; returns the per-stage measurements for one file."""
+    os.environ["PARSE_CACHE"] = "0"
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    logging.disable(logging.WARNING)
+
+    stages = {}
+    entry = {"corpus": corpus, "size_bytes": os.path.getsize(path), "stages": stages}
+    try:
+        entry["subjects"] = (_bench_plan if corpus == "plans" else _bench_program)(path, stages)
+    except Exception as e:
+        entry["error"] = str(e)
+    entry["peak_rss_mb"] = _peak_rss_mb()
+    return entry
+
+
+def _merge_best(runs):
+    """Keeps the fastest wall time (and lowest peak RSS) of repeated runs per stage."""
+    best = runs[0]
+    for run in runs[1:]:
+        for stage, m in run["stages"].items():
+            b = best["stages"].setdefault(stage, m)
+            b["wall_s"] = min(b["wall_s"], m["wall_s"])
+            b["peak_rss_mb"] = min(b["peak_rss_mb"], m["peak_rss_mb"])
+        best["peak_rss_mb"] = min(best["peak_rss_mb"], run["peak_rss_mb"])
+    return best
+
+
+def collect_files(name_filter=None):
+    files = []
+    for corpus in CORPORA:
+        corpus_dir = os.path.join(ROOT_DIR, corpus)
+        if not os.path.isdir(corpus_dir):
+            continue
+        for name in sorted(os.listdir(corpus_dir)):
+            if not name.endswith((".pdf", ".docx")):
+                continue
+            if name_filter and name_filter not in name:
+                continue
+            files.append((corpus, os.path.join(corpus_dir, name)))
+    return files
+
+
+def run(files, repeat=1):
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for corpus, path in files:
+        key = f"{corpus}/{os.path.basename(path)}"
+        runs = []
+        for _ in range(repeat):
+            # One process per run, so peak RSS and import state never leak between files
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                runs.append(pool.submit(bench_file, corpus, path).result())
+        results[key] = _merge_best(runs)
+        entry = results[key]
+        timings = "  ".join(f"{s}={m['wall_s']:.2f}s" for s, m in entry["stages"].items())
+        status = entry.get("error") or f"{entry.get('subjects', 0)} subjects"
+        print(f"{key}: {timings}  rss={entry['peak_rss_mb']}MB  {status}", flush=True)
+
+    totals = {}
+    for entry in results.values():
+        for stage, m in entry["stages"].items():
+            totals[stage] = round(totals.get(stage, 0.0) + m["wall_s"], 4)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "totals": totals,
+        "files": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Returns (regressions, notes). A stage regresses when its wall time or peak RSS grows
+    by more than `threshold` (fraction) and, for time, by more than `min_delta` seconds.
+    """
+    regressions, notes = [], []
+    machine_keys = ("platform", "cpu_count", "python")
+    before, now = baseline.get("meta", {}), current.get("meta", {})
+    if any(before.get(k) != now.get(k) for k in machine_keys):
+        notes.append("baseline recorded on another machine ("
+                     + ", ".join(f"{k} {before.get(k)}" for k in machine_keys)
+                     + "); re-record it here with --save-baseline")
+
+    def check(label, now, before, unit, floor):
+        if before is None or now is None:
+            return
+        if now > before * (1 + threshold) and now - before > floor:
+            regressions.append(f"{label}: {before:g}{unit} -> {now:g}{unit} (+{(now / before - 1) * 100 if before else 100:.0f}%)")
+
+    for key, entry in current["files"].items():
+        base = baseline.get("files", {}).get(key)
+        if base is None:
+            notes.append(f"{key}: not in baseline")
+            continue
+        if entry.get("error") and not base.get("error"):
+            regressions.append(f"{key}: failed ({entry['error']})")
+            continue
+        if entry.get("subjects") != base.get("subjects"):
+            notes.append(f"{key}: subjects {base.get('subjects')} -> {entry.get('subjects')}")
+        for stage, m in entry["stages"].items():
+            b = base.get("stages", {}).get(stage)
+            if b is None:
+                notes.append(f"{key}: new stage {stage}")
+                continue
+            check(f"{key} [{stage}] time", m["wall_s"], b["wall_s"], "s", min_delta)
+        check(f"{key} peak RSS", entry.get("peak_rss_mb"), base.get("peak_rss_mb"), "MB", 1.0)
+
+    for stage, total in current["totals"].items():
+        check(f"total [{stage}] time", total, baseline.get("totals", {}).get(stage), "s", min_delta)
+    return regressions, notes
+
+
+def microbench_rows(n_rows=50000, repeat=3):
+    """Rows/second of plan_parser.extract_plan_subjects on a synthetic plan (best of `repeat`)."""
+    sys.path.insert(0, BACKEND_DIR)
+    import plan_parser
+    import synthetic
+
+    pages = synthetic.plan_pages(n_rows)
+    metadata = {"tryb": "NS", "poziom": "studia pierwszego stopnia"}
+    best, subjects = None, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subjects = len(plan_parser.extract_plan_subjects(pages, metadata))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {"rows": n_rows, "subjects": subjects, "best_s": round(best, 4), "rows_per_s": round(n_rows / best)}
+
+
+def _scaling_cases():
+    """(name, build(size), extract(input)) per extractor; size is the number of table rows."""
+    sys.path.insert(0, BACKEND_DIR)
+    import plan_parser
+    import synthetic
+    import data_extractor_v2
+
+    metadata = {"tryb": "S", "poziom": "studia pierwszego stopnia"}
+    cases = [
+        (f"plan[{layout}]",
+         lambda size, layout=layout: synthetic.plan_pages(size, layout),
+         lambda pages: len(plan_parser.extract_plan_table(pages, metadata)))
+        for layout in ("mixed_17", "width_14_numbered", "width_11", "compressed_11")
+    ]
+    # Programs grow in both dimensions: 2/3 of the rows are subjects, 1/3 outcomes
+    cases.append((
+        "program",
+        lambda size: synthetic.program_pages(size * 2 // 3, size // 3),
+        lambda program: len(data_extractor_v2.extract_data_from_docx_v2(
+            program["tables"], program["content"], program["pages"])),
+    ))
+    return cases
+
+
+def _growth_exponent(sizes, times):
+    """Least-squares slope of log(time) over log(size): ~1 for linear, ~2 for quadratic."""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    return (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+            / sum((x - mean_x) ** 2 for x in xs))
+
+
+def scaling(sizes=SCALING_SIZES, repeat=3, max_exponent=DEFAULT_MAX_EXPONENT, name_filter=None):
+    """
+    Runs every extractor on synthetic inputs of growing size (best of `repeat`)
+    and fits how the time grows with the size. Returns a list of
+    {"case", "sizes", "times_s", "exponent", "super_linear"}.
+    """
+    results = []
+    for name, build, extract in _scaling_cases():
+        if name_filter and name_filter not in name:
+            continue
+        times = []
+        for size in sizes:
+            data = build(size)
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                extract(data)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            times.append(round(best, 5))
+        exponent = _growth_exponent(sizes, times)
+        results.append({"case": name, "sizes": list(sizes), "times_s": times, "exponent": round(exponent, 2),
+                        "super_linear": exponent > max_exponent})
+    return results
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Per-stage benchmark of the program/plan parsers.")
+    arg_parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="allowed relative slowdown per stage (default 0.25 = 25%%)")
+    arg_parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+                            help="ignore slowdowns smaller than this many seconds")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="runs per file; the fastest is kept")
+    arg_parser.add_argument("--filter", help="only files whose name contains this text")
+    arg_parser.add_argument("--rows", type=int,
+                            help="instead of the corpus, measure plan row throughput on a synthetic plan of N rows")
+    arg_parser.add_argument("--scaling", action="store_true",
+                            help="instead of the corpus, time the extractors on growing synthetic inputs "
+                                 "and flag super-linear growth")
+    arg_parser.add_argument("--sizes", type=lambda v: tuple(int(s) for s in v.split(",")), default=SCALING_SIZES,
+                            help="comma-separated input sizes for --scaling")
+    arg_parser.add_argument("--max-exponent", type=float, default=DEFAULT_MAX_EXPONENT,
+                            help="growth exponent above which --scaling reports a case (default 1.3)")
+    args = arg_parser.parse_args(argv)
+
+    if args.scaling:
+        results = scaling(args.sizes, max(3, args.repeat), args.max_exponent, args.filter)
+        print(f"{'case':28}" + "".join(f"{size:>10}" for size in args.sizes) + "  exponent")
+        for r in results:
+            flag = "  SUPER-LINEAR" if r["super_linear"] else ""
+            print(f"{r['case']:28}" + "".join(f"{t:10.4f}" for t in r["times_s"]) + f"  {r['exponent']:8.2f}{flag}")
+        flagged = [r["case"] for r in results if r["super_linear"]]
+        if flagged:
+            print(f"\n{len(flagged)} case(s) grow faster than size^{args.max_exponent}: {', '.join(flagged)}")
+            return 1
+        return 0
+
+    if args.rows:
+        result = microbench_rows(args.rows, max(3, args.repeat))
+        print(f"{result['rows']} rows, {result['subjects']} subjects: "
+              f"{result['best_s']:.3f}s ({result['rows_per_s']} rows/s)")
+        return 0
+
+    files = collect_files(args.filter)
+    if not files:
+        print("No files to benchmark.")
+        return 1
+
+    current = run(files, max(1, args.repeat))
+    _write_json(args.output, current)
+    print("\nTotals: " + "  ".join(f"{s}={t:.2f}s" for s, t in current["totals"].items()))
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        _write_json(args.baseline, current)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if args.filter:
+        # Partial runs: compare totals only over the files that were benchmarked
+        baseline = dict(baseline, totals={})
+    regressions, notes = compare(current, baseline, args.threshold, args.min_delta)
+    for note in notes:
+        print(f"NOTE {note}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}")
+        return 1
+    print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Searchable catalog of the subjects stored by ingest.py.
+
+Every ingested program and plan subject gets a catalog row with its normalized
+name, field of study, level, mode and semester (see models.CatalogEntry). An
+FTS5 table (catalog_fts) indexes the normalized Polish and English names, so a
+lookup is a single indexed query instead of parsing the document again.
+Names and queries are normalized the same way (plan_diff.normalize_name), which
+makes matching diacritic-insensitive, including letters such as "ł".
+
+    python catalog.py --rebuild          # fill the catalog from already ingested files
+    python catalog.py mykolog --tryb NS  # search from the command line
+"""
+import re
+import sys
+import json
+import time
+import argparse
+
+from sqlalchemy import select, text, column, table as sql_table
+
+import models
+from database import SessionLocal, engine
+from plan_diff import normalize_name
+from data_extractor_v2 import normalize_level
+
+MAX_LIMIT = 100
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_fts = sql_table("catalog_fts", column("rowid"))
+
+models.Base.metadata.create_all(bind=engine, tables=[models.CatalogEntry.__table__])
+with engine.begin() as _conn:
+    # External-content FTS5 table kept in sync with the catalog table by triggers
+    _conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5("
+        "name_norm, name_en_norm, content='catalog', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    _conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS catalog_ai AFTER INSERT ON catalog BEGIN "
+        "INSERT INTO catalog_fts(rowid, name_norm, name_en_norm) VALUES (new.id, new.name_norm, new.name_en_norm); "
+        "END"
+    ))
+    _conn.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS catalog_ad AFTER DELETE ON catalog BEGIN "
+        "INSERT INTO catalog_fts(catalog_fts, rowid, name_norm, name_en_norm) "
+        "VALUES ('delete', old.id, old.name_norm, old.name_en_norm); "
+        "END"
+    ))
+
+
+def _mode(text_value):
+    """"S" / "NS" from a plan's tryb or a program's forma; "" when both or unknown."""
+    value = (text_value or "").lower()
+    if value in ("s", "ns"):
+        return value.upper()
+    part_time = "niestacjonarn" in value
+    full_time = "stacjonarn" in value.replace("niestacjonarn", "")
+    if part_time != full_time:
+        return "NS" if part_time else "S"
+    return ""
+
+
+def index_file(db, rel_path, kind, subjects, plan_metadata=None):
+    """Replaces the catalog rows of one ingested file (the caller commits)."""
+    db.query(models.CatalogEntry).filter(models.CatalogEntry.file_path == rel_path).delete()
+    plan_metadata = plan_metadata or {}
+    for position, subject in enumerate(subjects):
+        if kind == "plan":
+            field, level, mode = plan_metadata.get("kierunek"), plan_metadata.get("poziom"), plan_metadata.get("tryb")
+            hours = {k: v for k, v in subject.items() if k.startswith("num") and v}
+        else:
+            field, level, mode = subject.get("kierunek"), subject.get("poziom"), subject.get("forma")
+            hours = None
+        name = subject.get("nazwa_przedmiotu") or ""
+        name_en = subject.get("nazwa_angielska") or ""
+        db.add(models.CatalogEntry(
+            file_path=rel_path,
+            position=position,
+            kind=kind,
+            name=name,
+            name_en=name_en,
+            name_norm=normalize_name(name),
+            name_en_norm=normalize_name(name_en),
+            field_of_study=field or "",
+            field_norm=normalize_name(field),
+            level=normalize_level(level),
+            mode=_mode(mode),
+            semester=subject.get("semestr") or "",
+            ects=subject.get("ects") or "",
+            unit=subject.get("jednostka") or "",
+            hours=hours,
+        ))
+
+
+def remove_files(db, rel_paths):
+    db.query(models.CatalogEntry).filter(models.CatalogEntry.file_path.in_(rel_paths)).delete(
+        synchronize_session=False)
+
+
+def rebuild():
+    """Re-creates the whole catalog from the ingested_files / ingested_subjects tables."""
+    with SessionLocal() as db:
+        db.query(models.CatalogEntry).delete()
+        files = {f.path: f for f in db.query(models.IngestedFile).filter(models.IngestedFile.status == "ok")}
+        count = 0
+        for path, ingested in files.items():
+            rows = (db.query(models.IngestedSubject.data)
+                    .filter(models.IngestedSubject.file_path == path)
+                    .order_by(models.IngestedSubject.position))
+            subjects = [data for (data,) in rows]
+            index_file(db, path, ingested.kind, subjects, ingested.plan_metadata)
+            count += len(subjects)
+        db.commit()
+        db.execute(text("INSERT INTO catalog_fts(catalog_fts) VALUES ('rebuild')"))
+        db.commit()
+        return count
+
+
+def _match_expression(query):
+    """FTS5 query: every word of the normalized query as a prefix term."""
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(normalize_name(query)))
+
+
+def search(query="", kierunek=None, poziom=None, tryb=None, semestr=None, kind=None, limit=20):
+    """
+    Catalog lookup. `query` matches word prefixes of the Polish or English name;
+    kierunek matches the start of the field of study; poziom accepts I/II (or 1/2)
+    or the full level; tryb S/NS also matches programs run in both modes.
+    Returns {"results": [...], "count": int, "took_ms": float}.
+    """
+    started = time.perf_counter()
+    limit = max(1, min(int(limit or 20), MAX_LIMIT))
+    statement = select(models.CatalogEntry)
+
+    match = _match_expression(query) if query else ""
+    if match:
+        statement = (statement
+                     .join(_fts, _fts.c.rowid == models.CatalogEntry.id)
+                     .where(text("catalog_fts MATCH :match"))
+                     .order_by(text("bm25(catalog_fts)")))
+    else:
+        statement = statement.order_by(models.CatalogEntry.name_norm)
+
+    if kierunek:
+        prefix = normalize_name(kierunek)
+        # Range instead of LIKE so the lookup index is used
+        statement = statement.where(models.CatalogEntry.field_norm >= prefix,
+                                    models.CatalogEntry.field_norm < prefix + "\U0010ffff")
+    if poziom:
+        statement = statement.where(models.CatalogEntry.level == normalize_level(poziom))
+    if tryb:
+        statement = statement.where(models.CatalogEntry.mode.in_((_mode(tryb), "")))
+    if semestr:
+        statement = statement.where(models.CatalogEntry.semester == str(semestr))
+    if kind:
+        statement = statement.where(models.CatalogEntry.kind == kind)
+
+    with SessionLocal() as db:
+        params = {"match": match} if match else {}
+        rows = db.execute(statement.limit(limit), params).scalars().all()
+        results = [row.to_dict() for row in rows]
+    return {"results": results, "count": len(results), "took_ms": round(1000 * (time.perf_counter() - started), 2)}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Searches (or rebuilds) the subject catalog.")
+    arg_parser.add_argument("query", nargs="?", default="")
+    arg_parser.add_argument("--rebuild", action="store_true", help="rebuild the catalog from ingested files")
+    arg_parser.add_argument("--kierunek")
+    arg_parser.add_argument("--poziom")
+    arg_parser.add_argument("--tryb")
+    arg_parser.add_argument("--semestr")
+    arg_parser.add_argument("--kind", choices=("program", "plan"))
+    arg_parser.add_argument("--limit", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    if args.rebuild:
+        print(f"Catalog rebuilt with {rebuild()} subjects")
+    if args.query or not args.rebuild:
+        found = search(args.query, args.kierunek, args.poziom, args.tryb, args.semestr, args.kind, args.limit)
+        json.dump(found, sys.stdout, ensure_ascii=False, indent=2)
+        print()
@@ -0,0 +1,16 @@
+"""
+Test session setup: the database and the parse cache live in a temporary
+directory, so running the tests never writes to the app's data/syllabus.db
+(or /app/data in Docker). Set before any test module imports database.
+"""
+import os
+import shutil
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="syllabus-tests-")
+os.environ["DB_DIR"] = _DATA_DIR
+os.environ["PARSE_CACHE_DIR"] = os.path.join(_DATA_DIR, "parse_cache")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
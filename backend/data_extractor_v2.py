@@ -1,45 +1,156 @@
 import re
+from typing import NamedTuple, Optional
 
-def extract_general_info(tables, text):
+# General info labels in the document text
+_FIELD_RE = re.compile(r"Nazwa kierunku studiów:\s*(.*)")
+_FIELD_FALLBACK_RE = re.compile(r"Kierunek:\s*(.*?)(?=\n|Klasyfikacja|Dziedzina)")
+_LEVEL_RE = re.compile(r"Poziom kształcenia:\s*(.*?)(?=\n|Klasyfikacja|Tytuł)")
+_PROFILE_RE = re.compile(r"Profil kształcenia:\s*(.*?)(?=\n|Klasyfikacja|Tytuł)")
+_FORM_RE = re.compile(r"Forma studiów:\s*(.*?)(?=\n|Klasyfikacja|Dyscyplina|Tytuł|Liczba)")
+# The same labels inside a table cell of the first table
+_CELL_INFO_RES = (
+    ("poziom", re.compile(r"Poziom kształcenia:\s*(.*)")),
+    ("profil", re.compile(r"Profil kształcenia:\s*(.*)")),
+    ("forma", re.compile(r"Forma studiów:\s*(.*)")),
+)
+# Degree level marker on a page or in a table cell, any case
+_LEVEL_MARKER_RE = re.compile(r"(?i)poziom kształcenia:\s*(.*)")
+# Degree level as a program or plan writes it: "I", "2", "II°", "studia I", "I stopnia", "drugiego stopnia"
+_DEGREE_RE = re.compile(
+    r"^(I{1,2}|[12])[°o]?$"
+    r"|\bstudi(?:a|ów)\s+(I{1,2})(?:[°o]|\b)"
+    r"|\b(pierwszego|drugiego|I{1,2})\s*[°o]?\s*stopnia\b",
+    re.IGNORECASE,
+)
+FIRST_DEGREE = "studia pierwszego stopnia"
+SECOND_DEGREE = "studia drugiego stopnia"
+
+_REF_KIERUNKOWE_RE = re.compile(r"(?i)Kierunkowe efekty uczenia się.*?(?=\n\n|\n\d+\.|\nSposoby)", re.DOTALL)
+_REF_WERYFIKACJA_RE = re.compile(r"(?i)Sposoby weryfikacji i oceny.*?(?=\n\n|\n\d+\.)", re.DOTALL)
+
+_SEMESTER_RE = re.compile(r"(\d)\.")
+_OUTCOME_SYMBOL_RE = re.compile(r"\b[A-Z0-9_]+_[WUK]\d{1,2}\b")
+_ENGLISH_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ ")
+_SUBJECT_STOP_WORDS = ("sposoby weryfikacji", "rozliczenie godzin", "kierunkowe efekty uczenia", "kryteria oceny")
+
+
+class _TableEntry(NamedTuple):
+    table: list
+    level: Optional[str]  # last degree level marker before this table; None if there was none yet
+    new_level: bool  # a level marker appeared since the previous table
+
+
+class DocumentWalk(NamedTuple):
+    """Result of walk_document: the document's tables in order, tagged with their degree level."""
+    tables: list  # of _TableEntry
+    cell_info: dict  # general info labels found in the first table's cells
+    paged: bool  # walked PDF pages (page text carries the level) rather than DOCX tables
+
+
+def normalize_level(value):
+    """
+    "studia pierwszego stopnia" / "studia drugiego stopnia" for any way of writing
+    the degree level (I/II, 1/2, "I stopnia", "studia II°"...); other values only stripped.
+    """
+    value = (value or "").strip()
+    match = _DEGREE_RE.search(value)
+    if not match:
+        return value
+    degree = match.group(match.lastindex).lower()
+    return SECOND_DEGREE if degree in ("ii", "2", "drugiego") else FIRST_DEGREE
+
+
+def _level_from(match):
+    return match.group(1).split("Klasyfikacja")[0].split("Profil")[0].strip()
+
+
+def _cell_info(table):
+    """First value of each general info label in the table's cells, in order of discovery."""
+    info = {}
+    for row in table:
+        for cell in row:
+            if not cell:
+                continue
+            for key, pattern in _CELL_INFO_RES:
+                if key not in info:
+                    match = pattern.search(str(cell))
+                    if match:
+                        info[key] = match.group(1).strip()
+    return info
+
+
+def walk_document(tables, pages=None):
+    """
+    Single pass over a parsed program. `pages` (a list from file_parser.parse_pdf
+    or a page stream from file_parser.iter_pdf_pages) is consumed once; without
+    pages the DOCX tables are walked and level markers are read from their cells.
+    """
+    entries = list(_page_entries(pages) if pages else _table_entries(tables))
+    cell_info = _cell_info(tables[0]) if tables and tables[0] else {}
+    return DocumentWalk(entries, cell_info, bool(pages))
+
+
+def _page_entries(pages, texts=None):
+    """walk_document's PDF pass as a generator; each page's text is appended to `texts` if given."""
+    level, new_level = None, False
+    for page_data in pages:
+        page_text = page_data.get("text", "")
+        if texts is not None:
+            texts.append(page_text)
+        match = _LEVEL_MARKER_RE.search(page_text)
+        if match:
+            level, new_level = _level_from(match), True
+        for table in page_data.get("tables", []):
+            yield _TableEntry(table, level, new_level)
+            new_level = False
+
+
+def _table_entries(tables):
+    """walk_document's DOCX pass as a generator."""
+    level, new_level = None, False
+    for table in tables:
+        # Poziom kształcenia can sit in any cell of an info table
+        for row in table or ():
+            for cell in row:
+                if cell:
+                    match = _LEVEL_MARKER_RE.search(str(cell))
+                    if match:
+                        level, new_level = _level_from(match), True
+        yield _TableEntry(table, level, new_level)
+        new_level = False
+
+
+def extract_general_info(tables, text, cell_info=None):
     """Extracts general information from the text and tables."""
     info = {}
 
     # Extract from text (Since PDF plumer often misses invisible-border tables)
-    field_of_study_match = re.search(r"Nazwa kierunku studiów:\s*(.*)", text)
+    field_of_study_match = _FIELD_RE.search(text)
     if field_of_study_match:
         info["kierunek"] = field_of_study_match.group(1).strip()
     else:
-        kierunek_match = re.search(r"Kierunek:\s*(.*?)(?=\n|Klasyfikacja|Dziedzina)", text)
+        kierunek_match = _FIELD_FALLBACK_RE.search(text)
         if kierunek_match:
             info["kierunek"] = kierunek_match.group(1).strip()
 
-    level_match = re.search(r"Poziom kształcenia:\s*(.*?)(?=\n|Klasyfikacja|Tytuł)", text)
+    level_match = _LEVEL_RE.search(text)
     if level_match:
         info["poziom"] = level_match.group(1).strip()
         
-    profile_match = re.search(r"Profil kształcenia:\s*(.*?)(?=\n|Klasyfikacja|Tytuł)", text)
+    profile_match = _PROFILE_RE.search(text)
     if profile_match:
         info["profil"] = profile_match.group(1).strip()
         
-    forma_match = re.search(r"Forma studiów:\s*(.*?)(?=\n|Klasyfikacja|Dyscyplina|Tytuł|Liczba)", text)
+    forma_match = _FORM_RE.search(text)
     if forma_match:
         info["forma"] = forma_match.group(1).strip()
 
     # Fallback to tables just in case a traditional docx table holds it
-    if len(tables) > 0 and len(tables[0]) > 0:
-        table1 = tables[0]
-        for row in table1:
-            for cell in row:
-                if not cell: continue
-                if "poziom" not in info:
-                    lm = re.search(r"Poziom kształcenia:\s*(.*)", str(cell))
-                    if lm: info["poziom"] = lm.group(1).strip()
-                if "profil" not in info:
-                    pm = re.search(r"Profil kształcenia:\s*(.*)", str(cell))
-                    if pm: info["profil"] = pm.group(1).strip()
-                if "forma" not in info:
-                    fm = re.search(r"Forma studiów:\s*(.*)", str(cell))
-                    if fm: info["forma"] = fm.group(1).strip()
+    if cell_info is None:
+        cell_info = _cell_info(tables[0]) if tables and tables[0] else {}
+    for key, value in cell_info.items():
+        if key not in info:
+            info[key] = value
 
     return info
 
@@ -53,11 +164,11 @@ def extract_outcomes_info(text):
     }
     
     # Extract reference sections for UI help
-    kierunkowe_match = re.search(r"(?i)Kierunkowe efekty uczenia się.*?(?=\n\n|\n\d+\.|\nSposoby)", text, re.DOTALL)
+    kierunkowe_match = _REF_KIERUNKOWE_RE.search(text)
     if kierunkowe_match:
         info["ref_kierunkowe"] = kierunkowe_match.group(0).strip()
         
-    weryfikacja_match = re.search(r"(?i)Sposoby weryfikacji i oceny.*?(?=\n\n|\n\d+\.)", text, re.DOTALL)
+    weryfikacja_match = _REF_WERYFIKACJA_RE.search(text)
     if weryfikacja_match:
         info["ref_weryfikacja"] = weryfikacja_match.group(0).strip()
     
@@ -137,9 +248,13 @@ def _parse_outcomes_table(table):
     return outcomes
 
 
-def extract_detailed_outcomes(tables, pages=None):
+def extract_detailed_outcomes(tables, pages=None, walk=None):
     """
     Extracts detailed (Symbol, Description) pairs per degree level.
+
+    `pages` may be a list from file_parser.parse_pdf or a page stream from
+    file_parser.iter_pdf_pages; it is consumed in a single pass. A walk_document
+    result can be passed as `walk` instead, to share one traversal.
     
     Returns dict keyed by normalized level string:
       {
@@ -148,96 +263,86 @@ def extract_detailed_outcomes(tables, pages=None):
         "": {"W": [...], ...}  # fallback when no level detected
       }
     """
+    if walk is None:
+        walk = walk_document(tables, pages)
     outcomes_by_level = {}
     
-    if pages:
+    if walk.paged:
         # PDF path: track level per page
         current_poziom = ""
         in_outcomes_section = False  # True when we found an outcomes table and are expecting continuations
         current_category = None  # Track W/U/K across page breaks
         
-        for page_data in pages:
-            page_text = page_data.get("text", "")
-            poziom_match = re.search(r"(?i)poziom kształcenia:\s*(.*?)(?:\n|Klasyfikacja|$)", page_text)
-            if poziom_match:
-                found = poziom_match.group(1).split("Klasyfikacja")[0].split("Profil")[0].strip()
-                current_poziom = found
+        for table, level, new_level in walk.tables:
+            if new_level:
+                current_poziom = level
                 in_outcomes_section = False  # New level section resets
                 current_category = None
             
-            for table in page_data.get("tables", []):
-                if not table or len(table) < 2:
-                    continue
-                parsed = _parse_outcomes_table(table)
-                if parsed:
-                    in_outcomes_section = True
-                    current_category = None
-                    if current_poziom not in outcomes_by_level:
-                        outcomes_by_level[current_poziom] = {"W": [], "U": [], "K": []}
-                    for cat in ["W", "U", "K"]:
-                        outcomes_by_level[current_poziom][cat].extend(parsed[cat])
-                        # Track last category
-                        if parsed[cat]:
-                            current_category = cat
-                elif in_outcomes_section:
-                    # This might be a continuation table (no header row, split by PDF page)
-                    # Check if first row looks like outcomes data (short symbol + longer text)
-                    first_row = table[0]
-                    if len(first_row) >= 2:
-                        first_cell = str(first_row[0]).strip() if first_row[0] else ""
-                        # Continuation rows: either a symbol or a section header
-                        if first_cell and (len(first_cell) < 20 or not first_cell):
-                            if current_poziom not in outcomes_by_level:
-                                outcomes_by_level[current_poziom] = {"W": [], "U": [], "K": []}
+            if not table or len(table) < 2:
+                continue
+            parsed = _parse_outcomes_table(table)
+            if parsed:
+                in_outcomes_section = True
+                current_category = None
+                if current_poziom not in outcomes_by_level:
+                    outcomes_by_level[current_poziom] = {"W": [], "U": [], "K": []}
+                for cat in ["W", "U", "K"]:
+                    outcomes_by_level[current_poziom][cat].extend(parsed[cat])
+                    # Track last category
+                    if parsed[cat]:
+                        current_category = cat
+            elif in_outcomes_section:
+                # This might be a continuation table (no header row, split by PDF page)
+                # Check if first row looks like outcomes data (short symbol + longer text)
+                first_row = table[0]
+                if len(first_row) >= 2:
+                    first_cell = str(first_row[0]).strip() if first_row[0] else ""
+                    # Continuation rows: either a symbol or a section header
+                    if first_cell and (len(first_cell) < 20 or not first_cell):
+                        if current_poziom not in outcomes_by_level:
+                            outcomes_by_level[current_poziom] = {"W": [], "U": [], "K": []}
+                        
+                        for row in table:
+                            sym_raw = str(row[0]).strip() if row[0] else ""
+                            row_text = " ".join([str(c) for c in row if c]).lower()
                             
-                            for row in table:
-                                sym_raw = str(row[0]).strip() if row[0] else ""
-                                row_text = " ".join([str(c) for c in row if c]).lower()
-                                
-                                # Check for section headers FIRST (may appear in col 0 in PDF)
-                                is_header = False
-                                if "wiedza" in row_text and ("zna" in row_text or "rozumie" in row_text):
-                                    current_category = "W"
-                                    is_header = True
-                                elif ("umiejętności" in row_text or "umiejetnosci" in row_text) and "potrafi" in row_text:
-                                    current_category = "U"
-                                    is_header = True
-                                elif ("kompetencje" in row_text) and ("gotów" in row_text or "gotow" in row_text):
-                                    current_category = "K"
-                                    is_header = True
-                                
-                                if is_header or not sym_raw:
-                                    continue
-                                
-                                desc = str(row[1]).strip() if len(row) > 1 and row[1] else ""
-                                sym = sym_raw.replace(" ", "")
+                            # Check for section headers FIRST (may appear in col 0 in PDF)
+                            is_header = False
+                            if "wiedza" in row_text and ("zna" in row_text or "rozumie" in row_text):
+                                current_category = "W"
+                                is_header = True
+                            elif ("umiejętności" in row_text or "umiejetnosci" in row_text) and "potrafi" in row_text:
+                                current_category = "U"
+                                is_header = True
+                            elif ("kompetencje" in row_text) and ("gotów" in row_text or "gotow" in row_text):
+                                current_category = "K"
+                                is_header = True
+                            
+                            if is_header or not sym_raw:
+                                continue
+                            
+                            desc = str(row[1]).strip() if len(row) > 1 and row[1] else ""
+                            sym = sym_raw.replace(" ", "")
+                            
+                            if sym and len(sym) < 20:
+                                cat = current_category
+                                if not cat:
+                                    if "_W" in sym: cat = "W"
+                                    elif "_U" in sym: cat = "U"
+                                    elif "_K" in sym: cat = "K"
                                 
-                                if sym and len(sym) < 20:
-                                    cat = current_category
-                                    if not cat:
-                                        if "_W" in sym: cat = "W"
-                                        elif "_U" in sym: cat = "U"
-                                        elif "_K" in sym: cat = "K"
-                                    
-                                    if cat:
-                                        current_category = cat
-                                        outcomes_by_level[current_poziom][cat].append({"symbol": sym, "description": desc})
-                        else:
-                            in_outcomes_section = False  # Not a continuation, stop
+                                if cat:
+                                    current_category = cat
+                                    outcomes_by_level[current_poziom][cat].append({"symbol": sym, "description": desc})
+                    else:
+                        in_outcomes_section = False  # Not a continuation, stop
     else:
-        # DOCX path: scan all tables, detect level from info tables
-        current_poziom = ""
-        for table in tables:
+        # DOCX path: level from info tables (see walk_document)
+        for table, level, _ in walk.tables:
             if not table or len(table) < 1:
                 continue
-            
-            # Check if this table contains a "Poziom kształcenia" marker
-            for row in table:
-                for cell in row:
-                    if cell:
-                        pm = re.search(r"(?i)poziom kształcenia:\s*(.*)", str(cell))
-                        if pm:
-                            current_poziom = pm.group(1).split("Klasyfikacja")[0].split("Profil")[0].strip()
+            current_poziom = level if level is not None else ""
             
             # Try to parse as outcomes table
             if len(table) >= 2:
@@ -252,40 +357,49 @@ def extract_detailed_outcomes(tables, pages=None):
     return outcomes_by_level
 
 
+def verification_lookup(outcomes):
+    """symbol → verification text of one level's {"W": [...], "U": [...], "K": [...]} outcomes."""
+    lookup = {}
+    for cat in ["W", "U", "K"]:
+        for o in outcomes.get(cat, []):
+            if o.get("verification"):
+                lookup[o["symbol"]] = o["verification"]
+    return lookup
+
+
 def extract_data_from_docx_v2(tables, text, pages=None):
     """
     Extracts subject data from a list of tables and text from a DOCX file.
+    The document is walked once (walk_document); the outcome parser and the
+    subject state machine below both consume that walk.
     """
-    general_info = extract_general_info(tables, text)
+    walk = walk_document(tables, pages)
+    general_info = extract_general_info(tables, text, walk.cell_info)
     outcomes_info = extract_outcomes_info(text)
-    detailed_outcomes_by_level = extract_detailed_outcomes(tables, pages)
+    detailed_outcomes_by_level = extract_detailed_outcomes(tables, walk=walk)
+    # symbol→verification per level, built once instead of for every subject row
+    verif_lookups = {level: verification_lookup(outcomes) for level, outcomes in detailed_outcomes_by_level.items()}
+    default_poziom = general_info.get("poziom", "")
+
     subjects = []
-    
-    tables_with_poziom = []
-    if pages:
-        current_poziom = general_info.get("poziom", "")
-        for page_data in pages:
-            page_text = page_data.get("text", "")
-            poziom_match = re.search(r"(?i)poziom kształcenia:\s*(.*)", page_text)
-            if poziom_match:
-                found_poziom = poziom_match.group(1).split("Klasyfikacja")[0].split("Profil")[0].strip()
-                current_poziom = found_poziom
-            for t in page_data.get("tables", []):
-                tables_with_poziom.append((t, current_poziom))
-    else:
-        # DOCX: track level per table from info tables (e.g. Table 0)
-        current_poziom = general_info.get("poziom", "")
-        for t in tables:
-            # Check if this table contains a "Poziom kształcenia" marker
-            if t:
-                for row in t:
-                    for cell in row:
-                        if cell:
-                            pm = re.search(r"(?i)poziom kształcenia:\s*(.*)", str(cell))
-                            if pm:
-                                current_poziom = pm.group(1).split("Klasyfikacja")[0].split("Profil")[0].strip()
-            tables_with_poziom.append((t, current_poziom))
+    for level, subject_info, symbols in _subject_rows(walk.tables):
+        subjects.append(_complete_subject(subject_info, symbols, level if level is not None else default_poziom,
+                                          general_info, outcomes_info, detailed_outcomes_by_level, verif_lookups))
+
+    if not subjects:
+        import text_parser
+        return text_parser.extract_subjects_from_text(text)
+
+    return subjects
 
+
+def _subject_rows(entries):
+    """
+    The subject table state machine over walk_document entries. Yields
+    (level, subject_info, symbols) per subject row as soon as its table is reached;
+    subject_info holds the row's own fields and _complete_subject adds the parts
+    that depend on the whole document.
+    """
     # State machine variables
     name_col = -1
     ects_col = -1
@@ -294,7 +408,7 @@ def extract_data_from_docx_v2(tables, text, pages=None):
     unit_col = -1
     extracting = False
     
-    for table, current_poziom in tables_with_poziom:
+    for table, level, _ in entries:
         for row_idx, row in enumerate(table):
             # Safe string join for the row to check if it's a header
             header_text = " ".join([str(c) for c in row if c is not None]).lower()
@@ -324,8 +438,7 @@ def extract_data_from_docx_v2(tables, text, pages=None):
             # Jeśli przechodzimy do nowej tabeli (row_idx == 0),
             # musimy sprawdzić, czy nie jest to przypadkiem "tabela innego typu"
             if row_idx == 0 and extracting:
-                stop_words = ["sposoby weryfikacji", "rozliczenie godzin", "kierunkowe efekty uczenia", "kryteria oceny"]
-                if any(sw in header_text for sw in stop_words):
+                if any(sw in header_text for sw in _SUBJECT_STOP_WORDS):
                     extracting = False
                     continue
 
@@ -342,14 +455,14 @@ def extract_data_from_docx_v2(tables, text, pages=None):
                     subject_name = ""
                     semester = ""
                     if len(name_and_sem) > 0:
-                        match = re.match(r"(\d)\.", name_and_sem[0])
+                        match = _SEMESTER_RE.match(name_and_sem[0])
                         if match:
                             semester = match.group(1)
                         subject_name = " ".join(name_and_sem)
 
                     english_name = ""
                     if len(name_and_sem) > 1:
-                        if all(c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ " for c in name_and_sem[1]):
+                        if _ENGLISH_CHARS.issuperset(name_and_sem[1]):
                             english_name = name_and_sem[1]
 
                     tresci_val = str(row[content_col]) if content_col != -1 and len(row) > content_col and row[content_col] else ""
@@ -362,36 +475,12 @@ def extract_data_from_docx_v2(tables, text, pages=None):
                     
                     unit_val = str(row[unit_col]) if unit_col != -1 and len(row) > unit_col and row[unit_col] else ""
 
-                    # Match available_outcomes to this subject's degree level
-                    available_outcomes = detailed_outcomes_by_level.get(current_poziom, {"W": [], "U": [], "K": []})
-                    # Fallback: if no match by level and only one level exists, use that
-                    if not any(available_outcomes[c] for c in ["W", "U", "K"]) and len(detailed_outcomes_by_level) == 1:
-                        available_outcomes = list(detailed_outcomes_by_level.values())[0]
-
                     # Extract this subject's specific outcomes from its 'efekty' cell
-                    subject_symbols = re.findall(r"\b[A-Z0-9_]+_[WUK]\d{1,2}\b", efekty_val)
+                    subject_symbols = _OUTCOME_SYMBOL_RE.findall(efekty_val)
                     subj_w = sorted(list(set([s for s in subject_symbols if "_W" in s])))
                     subj_u = sorted(list(set([s for s in subject_symbols if "_U" in s])))
                     subj_k = sorted(list(set([s for s in subject_symbols if "_K" in s])))
 
-                    # Build symbol→verification lookup from available_outcomes
-                    verif_lookup = {}
-                    for cat in ["W", "U", "K"]:
-                        for o in available_outcomes.get(cat, []):
-                            if o.get("verification"):
-                                verif_lookup[o["symbol"]] = o["verification"]
-                    
-                    # Pre-fill metody_weryfikacji from this subject's symbols
-                    all_subj_symbols = subj_w + subj_u + subj_k
-                    verif_texts = []
-                    seen_verif = set()
-                    for sym in all_subj_symbols:
-                        vt = verif_lookup.get(sym, "")
-                        if vt and vt not in seen_verif:
-                            seen_verif.add(vt)
-                            verif_texts.append(f"{sym}: {vt}")
-                    metody_weryfikacji_val = "\n".join(verif_texts)
-
                     subject_info = {
                         "nazwa_przedmiotu": subject_name.strip(),
                         "nazwa_angielska": english_name.strip(),
@@ -403,7 +492,7 @@ def extract_data_from_docx_v2(tables, text, pages=None):
                         "cel_przedmiotu": "",
                         "zalozenia": "",
                         "metody_dydaktyczne": "",
-                        "metody_weryfikacji": metody_weryfikacji_val,
+                        "metody_weryfikacji": "",
                         "literatura": "",
                         "wiedza": "",
                         "umiejetnosci": "",
@@ -412,15 +501,198 @@ def extract_data_from_docx_v2(tables, text, pages=None):
                         "learning_outcomesU": ", ".join(subj_u),
                         "learning_outcomesK": ", ".join(subj_k),
                     }
-                    subject_info.update(general_info)
-                    subject_info.update(outcomes_info)
-                    subject_info["available_outcomes"] = available_outcomes
-                    if current_poziom:
-                        subject_info["poziom"] = current_poziom
-                    subjects.append(subject_info)
+                    yield level, subject_info, subj_w + subj_u + subj_k
 
-    if not subjects:
-        import text_parser
-        return text_parser.extract_subjects_from_text(text)
 
+def _complete_subject(subject_info, symbols, current_poziom, general_info, outcomes_info,
+                      detailed_outcomes_by_level, verif_lookups):
+    """Adds the document-level fields, the level's outcome catalogue and the verification methods to a subject row."""
+    # Match available_outcomes to this subject's degree level
+    available_outcomes = detailed_outcomes_by_level.get(current_poziom, {"W": [], "U": [], "K": []})
+    verif_lookup = verif_lookups.get(current_poziom, {})
+    # Fallback: if no match by level and only one level exists, use that
+    if not any(available_outcomes[c] for c in ["W", "U", "K"]) and len(detailed_outcomes_by_level) == 1:
+        available_outcomes = list(detailed_outcomes_by_level.values())[0]
+        verif_lookup = list(verif_lookups.values())[0]
+
+    # Pre-fill metody_weryfikacji from this subject's symbols
+    verif_texts = []
+    seen_verif = set()
+    for sym in symbols:
+        vt = verif_lookup.get(sym, "")
+        if vt and vt not in seen_verif:
+            seen_verif.add(vt)
+            verif_texts.append(f"{sym}: {vt}")
+    subject_info["metody_weryfikacji"] = "\n".join(verif_texts)
+
+    subject_info.update(general_info)
+    subject_info.update(outcomes_info)
+    subject_info["available_outcomes"] = available_outcomes
+    if current_poziom:
+        subject_info["poziom"] = current_poziom
+    return subject_info
+
+
+# Per-subject copies of document-level values, sent once in the normalized format
+_DOCUMENT_FIELDS = ("kierunek", "profil", "forma", "ref_kierunkowe", "ref_weryfikacja")
+
+
+def normalize_subjects(subjects):
+    """
+    Normalized form of extract_data_from_docx_v2's result (?format=normalized).
+
+    The document-level fields (_DOCUMENT_FIELDS) go to "document" once; a subject
+    keeps such a field only where its value differs. Each distinct
+    available_outcomes catalogue goes to "levels" once, keyed by the level of the
+    first subject using it, and subjects refer to it with "outcomes_level".
+    denormalize_subjects() reverses this.
+    """
+    document = {}
+    if subjects:
+        document = {field: subjects[0][field] for field in _DOCUMENT_FIELDS if field in subjects[0]}
+
+    levels = {}
+    level_keys = {}  # id(available_outcomes) -> key in levels
+    normalized = []
+    for subject in subjects:
+        entry = {k: v for k, v in subject.items()
+                 if k != "available_outcomes" and not (k in document and v == document[k])}
+        if "available_outcomes" in subject:
+            outcomes = subject["available_outcomes"]
+            key = level_keys.get(id(outcomes))
+            if key is None:
+                # Subjects of one level share a single catalogue object; equal copies are merged too
+                key = next((k for k, v in levels.items() if v == outcomes), None)
+            if key is None:
+                key = base = subject.get("poziom", "")
+                suffix = 2
+                while key in levels:
+                    key = f"{base} ({suffix})"
+                    suffix += 1
+                levels[key] = outcomes
+            level_keys[id(outcomes)] = key
+            entry["outcomes_level"] = key
+        normalized.append(entry)
+
+    return {"format": "normalized", "document": document, "levels": levels, "subjects": normalized}
+
+
+def denormalize_subjects(normalized):
+    """Rebuilds the per-subject list from normalize_subjects' output."""
+    document, levels = normalized["document"], normalized["levels"]
+    subjects = []
+    for entry in normalized["subjects"]:
+        subject = dict(entry)
+        for field, value in document.items():
+            subject.setdefault(field, value)
+        key = subject.pop("outcomes_level", None)
+        if key is not None:
+            subject["available_outcomes"] = levels[key]
+        subjects.append(subject)
     return subjects
+
+
+def iter_extraction(tables, text, pages=None):
+    """
+    Streaming form of extract_data_from_docx_v2 (NDJSON responses). Yields one
+    dict ("line") at a time:
+
+      {"type": "metadata", "document": {...}}  general info found before the first subject
+      {"type": "subject", "index": i, "subject": {...}}  as soon as the subject's table is read
+      {"type": "done", "count", "document", "levels", "outcomes_level", "metody_weryfikacji"}
+
+    A subject line carries the row's own fields; its "poziom" is the level marker
+    read before its table, absent when there was none yet (the document's level
+    applies). The parts that need the whole document - the document-level fields,
+    the outcome catalogues (once per level, keyed as in normalize_subjects) and
+    each subject's outcomes_level and metody_weryfikacji, by index - follow in
+    the "done" line. When the tables hold no subjects, the text parser's subjects
+    are streamed as complete subjects and "done" has "fallback": true.
+    collect_stream() rebuilds the extract_data_from_docx_v2 result.
+
+    With `pages` (e.g. a file_parser.stream_pdf page stream) the tables and text
+    are collected from the pages as they are consumed; otherwise they are the
+    DOCX `tables` and `text`.
+    """
+    page_texts = [] if pages else None
+    entries = []
+
+    def walked():
+        for entry in _page_entries(pages, page_texts) if pages else _table_entries(tables):
+            entries.append(entry)
+            yield entry
+
+    def text_so_far():
+        return "\n".join(t for t in page_texts if t) if pages else text
+
+    def cell_info():
+        first = entries[0].table if entries else None
+        return _cell_info(first) if first else {}
+
+    rows = []
+    for level, subject_info, symbols in _subject_rows(walked()):
+        if not rows:
+            yield {"type": "metadata", "document": extract_general_info(None, text_so_far(), cell_info())}
+        line = dict(subject_info)
+        if level:
+            line["poziom"] = level
+        rows.append((level, subject_info, symbols))
+        yield {"type": "subject", "index": len(rows) - 1, "subject": line}
+
+    text = text_so_far()
+    walk = DocumentWalk(entries, cell_info(), bool(pages))
+    general_info = extract_general_info(None, text, walk.cell_info)
+    outcomes_info = extract_outcomes_info(text)
+
+    if not rows:
+        import text_parser
+        subjects = text_parser.extract_subjects_from_text(text)
+        yield {"type": "metadata", "document": general_info}
+        for index, subject in enumerate(subjects):
+            yield {"type": "subject", "index": index, "subject": subject}
+        yield {"type": "done", "count": len(subjects), "fallback": True}
+        return
+
+    detailed_outcomes_by_level = extract_detailed_outcomes(None, walk=walk)
+    verif_lookups = {level: verification_lookup(outcomes) for level, outcomes in detailed_outcomes_by_level.items()}
+    default_poziom = general_info.get("poziom", "")
+    subjects = [
+        _complete_subject(subject_info, symbols, level if level is not None else default_poziom,
+                          general_info, outcomes_info, detailed_outcomes_by_level, verif_lookups)
+        for level, subject_info, symbols in rows
+    ]
+    normalized = normalize_subjects(subjects)
+    yield {
+        "type": "done",
+        "count": len(subjects),
+        "document": {**general_info, **outcomes_info},
+        "levels": normalized["levels"],
+        "outcomes_level": [entry.get("outcomes_level") for entry in normalized["subjects"]],
+        "metody_weryfikacji": [subject["metody_weryfikacji"] for subject in subjects],
+    }
+
+
+def collect_stream(lines):
+    """Rebuilds the extract_data_from_docx_v2 result from iter_extraction's lines."""
+    subjects, done = [], None
+    for line in lines:
+        if line["type"] == "subject":
+            subjects.append(line["subject"])
+        elif line["type"] == "done":
+            done = line
+        elif line["type"] == "error":
+            return {"error": line["error"]}
+    if done is None or done.get("fallback"):
+        return subjects
+
+    result = []
+    for index, line_subject in enumerate(subjects):
+        subject = dict(line_subject)
+        level = subject.pop("poziom", None)
+        subject["metody_weryfikacji"] = done["metody_weryfikacji"][index]
+        subject.update(done["document"])
+        subject["available_outcomes"] = done["levels"][done["outcomes_level"][index]]
+        if level:
+            subject["poziom"] = level
+        result.append(subject)
+    return result
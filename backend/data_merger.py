@@ -1,5 +1,8 @@
 import re
 
+from data_extractor_v2 import normalize_level
+
+
 def merge_subjects(programs_subjects, plans_subjects):
     """
     Merges subject data from two sources: programs and plans.
@@ -24,3 +27,70 @@ def merge_subjects(programs_subjects, plans_subjects):
             merged_subjects[normalized_name] = subject
 
     return list(merged_subjects.values())
+
+
+# Plan hour tags copied onto program subjects (both modes)
+PLAN_HOUR_KEYS = ("numWS", "numWNS", "numCS", "numCNS", "numPS", "numPNS", "numLS", "numLNS",
+                  "numKS", "numKNS", "numPwS", "numPwNS", "numInS", "numInNS", "numTS", "numTNS")
+# Program fields filled from the plan only when the program left them empty
+_PLAN_FILL_FIELDS = ("ects", "semestr", "jednostka", "nazwa_angielska")
+
+_NUMBERING_RE = re.compile(r"^(?:\d+\.)+(?:\d+[a-z]?\.?)?\s*")
+_SHORT_NUMBERING_RE = re.compile(r"^\d+[a-z]?\.\s*")
+_ELECTIVE_RE = re.compile(r"\(\s*do wyboru\s*\)|do wyboru")
+_FAKULTET_RE = re.compile(r"^fakultet\s+[xvi]+\s*")
+_TRAILING_RE = re.compile(r"[\s\-]+$")
+
+
+def normalize_subject_name(name):
+    """
+    Matching key for program and plan subject names (same rules as the wizard's
+    cleanSubjectName): no numbering, "(do wyboru)" or "fakultet X" prefix.
+    """
+    s = (name or "").strip().lower()
+    s = _SHORT_NUMBERING_RE.sub("", _NUMBERING_RE.sub("", s))
+    s = _FAKULTET_RE.sub("", _ELECTIVE_RE.sub("", s))
+    s = _SHORT_NUMBERING_RE.sub("", _NUMBERING_RE.sub("", s))
+    return _TRAILING_RE.sub("", s).strip()
+
+
+def merge_plan_hours(program_subjects, plans):
+    """
+    Joins plan hours onto program subjects.
+
+    plans is a list of extract_full_plan results ({"metadata", "subjects"}). Each
+    program subject takes, from every plan of its level (all plans when either
+    level is unknown), the hour tags and the empty fields it is missing. Plan
+    subjects are looked up in a dict keyed by normalize_subject_name; only names
+    with no exact match fall back to the wizard's substring match.
+
+    Returns (merged subjects, per-plan count of matched program subjects).
+    """
+    indexes = []
+    for plan in plans:
+        by_name = {}
+        for subject in plan.get("subjects", []):
+            by_name.setdefault(normalize_subject_name(subject.get("nazwa_przedmiotu")), subject)
+        by_name.pop("", None)
+        indexes.append((normalize_level(plan.get("metadata", {}).get("poziom")), by_name))
+
+    matched = [0] * len(plans)
+    merged_subjects = []
+    for subject in program_subjects:
+        merged = dict(subject)
+        name = normalize_subject_name(subject.get("nazwa_przedmiotu"))
+        level = normalize_level(subject.get("poziom"))
+        for i, (plan_level, by_name) in enumerate(indexes):
+            if not name or (level and plan_level and level != plan_level):
+                continue
+            match = by_name.get(name)
+            if match is None:
+                match = next((s for n, s in by_name.items() if name in n or n in name), None)
+            if match is None:
+                continue
+            matched[i] += 1
+            for key in PLAN_HOUR_KEYS + _PLAN_FILL_FIELDS:
+                if match.get(key) and not merged.get(key):
+                    merged[key] = match[key]
+        merged_subjects.append(merged)
+    return merged_subjects, matched
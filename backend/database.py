@@ -16,8 +16,9 @@ DB_PATH = os.path.join(DB_DIR, "syllabus.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
+# timeout: job workers in other processes write to the same file; wait for their locks instead of failing
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
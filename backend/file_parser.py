@@ -1,10 +1,70 @@
+import io
+import os
+import re
+import hashlib
+import logging
 import docx
+from docx.oxml.ns import qn
 import pdfplumber
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import parse_cache
 
-def parse_docx(file_path: str):
-    """Parses a .docx file and extracts text and tables."""
+logger = logging.getLogger(__name__)
+
+# Server setting: processes used to parse PDF pages in parallel (1 = serial)
+PDF_PARSE_WORKERS = max(1, int(os.environ.get("PDF_PARSE_WORKERS", "1")))
+# Each worker should get at least this many pages, otherwise we parse serially
+MIN_PAGES_PER_WORKER = 4
+# Server setting: skip pdfplumber table extraction on pages a cheap pypdfium2 pass deems irrelevant
+PDF_PAGE_PREFILTER = os.environ.get("PDF_PAGE_PREFILTER", "1").strip().lower() not in ("0", "false", "no", "off")
+
+# Text markers of the tables the extractors care about: program subject tables,
+# outcome tables, plan tables, level markers, and the headers of tables that end
+# a subject section in data_extractor_v2.
+PAGE_RELEVANCE_MARKERS = re.compile(
+    r"nazwa\s+przedmiotu|ects|symbol|sposoby\s+weryfikacji|poziom\s+kształcenia"
+    r"|nazwa\s+modułu|liczba\s+godzin|semestr|rozliczenie\s+godzin|kierunkowe\s+efekty"
+    r"|kryteria\s+oceny|_[WUK][A-Z]?\d",
+    re.IGNORECASE
+)
+
+_pool = None
+_pool_workers = 0
+
+# WordprocessingML tags used by the direct XML table walker
+_W_TBL = qn("w:tbl")
+_W_TR = qn("w:tr")
+_W_TC = qn("w:tc")
+_W_P = qn("w:p")
+_W_TCPR = qn("w:tcPr")
+_W_GRID_SPAN = qn("w:gridSpan")
+_W_VMERGE = qn("w:vMerge")
+_W_TRPR_GRID_BEFORE = f"{qn('w:trPr')}/{qn('w:gridBefore')}"
+_W_VAL = qn("w:val")
+
+
+def _open_target(source):
+    """Path sources are opened by name; in-memory bytes through a BytesIO stream."""
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+
+def _source_name(source):
+    return source if isinstance(source, str) else None
+
+
+def parse_docx(source):
+    """
+    Parses a .docx file and extracts text and tables (served from the parse cache when possible).
+    `source` may be a path, bytes or a binary file-like object (e.g. an upload buffer).
+    """
+    return parse_cache.get_or_parse(source, "docx", _parse_docx)
+
+
+def _parse_docx(source):
     try:
-        doc = docx.Document(file_path)
+        doc = docx.Document(_open_target(source))
         
         # Extract text from paragraphs
         full_text = []
@@ -13,66 +73,471 @@ def parse_docx(file_path: str):
         
         # Extract tables and add their text to full_text for better parsing
         tables = []
-        for table in doc.tables:
-            table_data = []
-            for row in table.rows:
-                row_data = []
-                for cell in row.cells:
-                    row_data.append(cell.text)
-                    # Add cell text to full_text so extractors can see it
-                    full_text.append(cell.text)
-                table_data.append(row_data)
+        table_spans = []
+        for tbl in doc.element.body.iterchildren(_W_TBL):
+            table_data, spans, cell_texts = _read_docx_table(tbl)
             tables.append(table_data)
+            table_spans.append(spans)
+            # Add each logical cell once so extractors can see it (merged cells are not repeated)
+            full_text.extend(cell_texts)
             
         return {
-            "filename": file_path,
+            "filename": _source_name(source),
             "content": '\n'.join(full_text),
-            "tables": tables
+            "tables": tables,
+            "table_spans": table_spans
         }
     except Exception as e:
         return {"error": str(e)}
 
-def parse_pdf(file_path: str):
+
+def _read_docx_table(tbl):
+    """
+    Walks w:tbl/w:tr/w:tc once, resolving gridSpan and vMerge as it goes.
+
+    Returns (rows, spans, cell_texts):
+      rows       - grid-expanded cell texts per row, identical to python-docx
+                   `row.cells` (a merged cell's text repeats across its span)
+      spans      - per row, one [index, colspan, rowspan] entry per w:tc, where
+                   index points into that row's list; rowspan is 0 for a vMerge
+                   continuation (its text belongs to the cell above)
+      cell_texts - text of each logical cell, once, in reading order
+    """
+    rows = []
+    spans = []
+    cell_texts = []
+    # grid column -> [text, span entry] of the cell that owns it, for vMerge="continue"
+    column_owner = {}
+
+    for tr in tbl.iterchildren(_W_TR):
+        row = []
+        row_spans = []
+        grid_col = _docx_int_val(tr.find(_W_TRPR_GRID_BEFORE), 0)
+
+        for tc in tr.iterchildren(_W_TC):
+            tc_pr = tc.find(_W_TCPR)
+            colspan = 1
+            vmerge = None
+            if tc_pr is not None:
+                colspan = _docx_int_val(tc_pr.find(_W_GRID_SPAN), 1)
+                vmerge_el = tc_pr.find(_W_VMERGE)
+                if vmerge_el is not None:
+                    vmerge = vmerge_el.get(_W_VAL, "continue")
+
+            owner = column_owner.get(grid_col) if vmerge == "continue" else None
+            if owner is not None:
+                # Continuation of a vertical merge: reuse the text of the cell above
+                text = owner[0]
+                owner[1][2] += 1
+                row_spans.append([len(row), colspan, 0])
+            else:
+                text = "\n".join(p.text for p in tc.iterchildren(_W_P))
+                entry = [len(row), colspan, 1]
+                row_spans.append(entry)
+                cell_texts.append(text)
+                owner = [text, entry]
+
+            for col in range(grid_col, grid_col + colspan):
+                column_owner.pop(col, None)
+            column_owner[grid_col] = owner
+            row.extend([text] * colspan)
+            grid_col += colspan
+
+        rows.append(row)
+        spans.append(row_spans)
+
+    return rows, spans, cell_texts
+
+
+def _docx_int_val(el, default):
+    if el is None:
+        return default
+    try:
+        return int(el.get(_W_VAL))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_pdf(source, workers: int = None, prefilter: bool = None, progress=None):
     """Parses a .pdf file and extracts text and tables."""
-    return parse_pdf_with_settings(file_path, table_settings=None)
+    return parse_pdf_with_settings(source, table_settings=None, workers=workers, prefilter=prefilter,
+                                   progress=progress)
 
 
-def parse_pdf_with_settings(file_path: str, table_settings: dict = None):
+def parse_pdf_with_settings(source, table_settings: dict = None, workers: int = None,
+                            prefilter: bool = None, progress=None):
     """Parses a .pdf file with optional custom pdfplumber table_settings.
     
+    Results are cached on disk by file content and table_settings (see parse_cache).
+    Pages are cached on their own as well (iter_pdf_pages' page_cache), so a
+    revised document only re-parses the pages whose page_digest changed.
+
     Args:
-        file_path: Path to the PDF file.
+        source: Path to the PDF file, its bytes, or a binary file-like object
+                (e.g. an upload buffer, read once and parsed from memory).
         table_settings: Optional dict of pdfplumber table extraction settings,
                         e.g. {"snap_x_tolerance": 6, "snap_y_tolerance": 6}
+        workers: Number of processes to split the pages across. Defaults to the
+                 PDF_PARSE_WORKERS server setting; 1 parses serially.
+        prefilter: Run table extraction only on pages classified as relevant by
+                   classify_table_pages. Defaults to the PDF_PAGE_PREFILTER setting.
+        progress: Optional callback progress(pages_parsed, pages_total), called as
+                  pages are parsed. Not called when the result comes from the cache.
     """
+    if workers is None:
+        workers = PDF_PARSE_WORKERS
+    if prefilter is None:
+        prefilter = PDF_PAGE_PREFILTER
+    prefilter = prefilter and _uses_ruling_lines(table_settings)
+    return parse_cache.get_or_parse(
+        source, "pdf+prefilter" if prefilter else "pdf",
+        lambda data: _parse_pdf(data, table_settings, workers, prefilter, progress),
+        table_settings=table_settings
+    )
+
+
+def cached_pdf(digest, table_settings=None, prefilter=None):
+    """The parse_pdf_with_settings result cached for the document with this digest, or None."""
+    if not parse_cache.CACHE_ENABLED:
+        return None
+    if prefilter is None:
+        prefilter = PDF_PAGE_PREFILTER
+    prefilter = prefilter and _uses_ruling_lines(table_settings)
+    return parse_cache.load(parse_cache.make_key(digest, "pdf+prefilter" if prefilter else "pdf", table_settings))
+
+
+def _uses_ruling_lines(table_settings):
+    """True when pdfplumber can only find tables from drawn lines (its default strategy)."""
+    settings = table_settings or {}
+    strategies = (settings.get("vertical_strategy", "lines"), settings.get("horizontal_strategy", "lines"))
+    return all(s in ("lines", "lines_strict") for s in strategies)
+
+
+def classify_table_pages(source):
+    """
+    Cheap first pass over a PDF with pypdfium2 deciding, per page, whether
+    pdfplumber table extraction is worth running.
+
+    A page is relevant when it draws vector paths (without ruling lines the
+    default pdfplumber strategy cannot find a table) and either contains one of
+    PAGE_RELEVANCE_MARKERS or directly follows a relevant page, since subject and
+    outcome tables continue across page breaks without repeating their headers.
+
+    Returns a list of bools (one per page), or None if pypdfium2 cannot read the file.
+    """
+    try:
+        import pypdfium2 as pdfium
+        import pypdfium2.raw as pdfium_c
+    except ImportError:
+        return None
+
+    try:
+        pdf = pdfium.PdfDocument(source)
+    except Exception:
+        return None
+
+    relevant = []
+    previous = False
     try:
-        with pdfplumber.open(file_path) as pdf:
-            full_text = []
-            tables = []
-            pages_data = []
-            for page in pdf.pages:
-                text = page.extract_text()
-                if table_settings:
-                    page_tables = page.extract_tables(table_settings=table_settings)
+        for i in range(len(pdf)):
+            page = pdf[i]
+            has_paths = next(iter(page.get_objects(filter=(pdfium_c.FPDF_PAGEOBJ_PATH,))), None) is not None
+            is_relevant = False
+            if has_paths:
+                if previous:
+                    is_relevant = True
                 else:
-                    page_tables = page.extract_tables()
-                
-                if text:
-                    full_text.append(text)
-                if page_tables:
-                    tables.extend(page_tables)
-                
-                pages_data.append({
-                    "text": text or "",
-                    "tables": page_tables or []
-                })
-
-            return {
-                "filename": file_path,
-                "content": '\n'.join(full_text),
-                "tables": tables,
-                "pages": pages_data
-            }
+                    textpage = page.get_textpage()
+                    is_relevant = bool(PAGE_RELEVANCE_MARKERS.search(textpage.get_text_range()))
+                    textpage.close()
+            page.close()
+            relevant.append(is_relevant)
+            previous = is_relevant
+    except Exception:
+        return None
+    finally:
+        pdf.close()
+    return relevant
+
+
+def _extract_page(page, table_settings=None, extract_tables=True):
+    """Extracts {"text", "tables"} from a single pdfplumber page."""
+    text = page.extract_text()
+    if not extract_tables:
+        page_tables = []
+    elif table_settings:
+        page_tables = page.extract_tables(table_settings=table_settings)
+    else:
+        page_tables = page.extract_tables()
+    return {
+        "text": text or "",
+        "tables": page_tables or []
+    }
+
+
+def page_digest(page, memo=None):
+    """
+    SHA-256 of everything a pdfplumber page's parse depends on: its content
+    streams (decoded), its resources (fonts, images, forms - resolved
+    recursively), boxes and rotation. Pages with equal digests parse to the same
+    result, whatever else changed in the file.
+
+    memo (a dict, one per open document) keeps the digests of shared objects
+    such as fonts, so they are hashed once.
+    """
+    page_obj = page.page_obj
+    h = hashlib.sha256()
+    _digest_object([page_obj.contents, page_obj.resources, page_obj.mediabox, page_obj.cropbox, page_obj.rotate],
+                   h, {} if memo is None else memo)
+    return h.hexdigest()
+
+
+# Stream attributes describing the encoding only; the decoded data is hashed instead
+_STREAM_ENCODING_KEYS = ("Length", "Filter", "DecodeParms")
+
+
+def _digest_object(obj, h, memo):
+    if isinstance(obj, PDFObjRef):
+        digest = memo.get(obj.objid)
+        if digest is None:
+            memo[obj.objid] = b"cycle"  # a reference back into an object being hashed
+            sub = hashlib.sha256()
+            _digest_object(obj.resolve(), sub, memo)
+            digest = memo[obj.objid] = sub.digest()
+        h.update(digest)
+    elif isinstance(obj, PDFStream):
+        _digest_object({k: v for k, v in obj.attrs.items() if k not in _STREAM_ENCODING_KEYS}, h, memo)
+        h.update(b"stream")
+        h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for key in sorted(obj):
+            if key != "Parent":  # the page tree, not the page
+                h.update(str(key).encode())
+                _digest_object(obj[key], h, memo)
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for item in obj:
+            _digest_object(item, h, memo)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode())
+        h.update(b",")
+
+
+def _cached_page(page, table_settings, extract_tables, memo):
+    """_extract_page through the page-level parse cache, keyed by page_digest."""
+    try:
+        digest = page_digest(page, memo)
+    except Exception:
+        # Unhashable (e.g. a broken object reference): parse it without the cache
+        return _extract_page(page, table_settings, extract_tables)
+    key = parse_cache.make_key(digest, "pdf-page" if extract_tables else "pdf-page-text", table_settings)
+    page_data = parse_cache.load(key)
+    if page_data is None:
+        page_data = _extract_page(page, table_settings, extract_tables)
+        parse_cache.store(key, page_data)
+    return page_data
+
+
+def iter_pdf_pages(source, table_settings: dict = None, start: int = 0, stop: int = None,
+                   table_pages=None, progress=None, page_cache: bool = False):
+    """
+    Yields one {"text", "tables"} dict per page without materializing the document.
+
+    Each page's pdfplumber caches (parsed objects, layout, text map) are flushed
+    as soon as the page has been extracted, so peak memory is bounded by the
+    largest page rather than the document length. The stream can be passed
+    directly to plan_parser.extract_plan_subjects or
+    data_extractor_v2.extract_detailed_outcomes.
+
+    table_pages, if given, is the per-page output of classify_table_pages;
+    tables are only extracted on pages marked True.
+    progress, if given, is called as progress(pages_parsed, pages_total) after each page.
+    With page_cache, pages already parsed in any document (same page_digest and
+    settings) are served from parse_cache and only the others are extracted.
+    `source` may be a path or the PDF bytes.
+    """
+    with pdfplumber.open(_open_target(source)) as pdf:
+        pages = pdf.pages[start:stop]
+        memo = {}
+        for done, page in enumerate(pages, 1):
+            try:
+                extract_tables = table_pages is None or table_pages[page.page_number - 1]
+                if page_cache:
+                    yield _cached_page(page, table_settings, extract_tables, memo)
+                else:
+                    yield _extract_page(page, table_settings, extract_tables)
+            finally:
+                page.close()
+            if progress:
+                progress(done, len(pages))
+
+
+def _parse_page_range(source, table_settings, start, stop, table_pages=None):
+    """Process-pool task: opens the PDF independently and parses pages [start, stop)."""
+    return list(iter_pdf_pages(source, table_settings, start, stop, table_pages,
+                               page_cache=parse_cache.PAGE_CACHE_ENABLED))
+
+
+def get_pool(workers):
+    """
+    Returns the shared parse pool, growing it if a caller asks for more workers.
+    Also used by plan_parser to evaluate adaptive reparse candidates concurrently.
+    """
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers < workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def reset_pool(broken):
+    """Discards the shared parse pool if it is still `broken`; the next get_pool starts a fresh one."""
+    global _pool, _pool_workers
+    if _pool is broken:
+        _pool = None
+        _pool_workers = 0
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_pages_parallel(source, table_settings, workers, table_pages=None, progress=None):
+    with pdfplumber.open(_open_target(source)) as pdf:
+        num_pages = len(pdf.pages)
+
+    # Don't pay process overhead for short documents
+    workers = min(workers, num_pages // MIN_PAGES_PER_WORKER)
+    if workers <= 1:
+        return None
+
+    # Contiguous page ranges, one per worker, reassembled in page order
+    step = -(-num_pages // workers)
+    ranges = [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+    pool = get_pool(workers)
+    pages_data = []
+    try:
+        futures = [
+            pool.submit(_parse_page_range, source, table_settings, start, stop, table_pages)
+            for start, stop in ranges
+        ]
+        for future in futures:
+            pages_data.extend(future.result())
+            if progress:
+                progress(len(pages_data), num_pages)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); drop the pool and parse this document serially
+        logger.error("Parse pool broken, restarting it and parsing serially")
+        reset_pool(pool)
+        return None
+    return pages_data
+
+
+def assemble_pdf_result(source, pages_data):
+    """The parse_pdf result ({"filename", "content", "tables", "pages"}) of parsed page dicts."""
+    full_text = [p["text"] for p in pages_data if p["text"]]
+    tables = [t for p in pages_data for t in p["tables"]]
+    return {
+        "filename": _source_name(source),
+        "content": '\n'.join(full_text),
+        "tables": tables,
+        "pages": pages_data
+    }
+
+
+def _parse_pdf(source, table_settings: dict = None, workers: int = 1, prefilter: bool = False,
+               progress=None):
+    try:
+        table_pages = classify_table_pages(source) if prefilter else None
+        pages_data = None
+        if workers and workers > 1:
+            pages_data = _parse_pages_parallel(source, table_settings, workers, table_pages, progress)
+        if pages_data is None:
+            pages_data = list(iter_pdf_pages(source, table_settings, table_pages=table_pages,
+                                             progress=progress, page_cache=parse_cache.PAGE_CACHE_ENABLED))
+        return assemble_pdf_result(source, pages_data)
     except Exception as e:
         return {"error": str(e)}
 
+
+def stream_pdf(source, table_settings: dict = None, prefilter: bool = None):
+    """
+    Streaming counterpart of parse_pdf_with_settings: yields the page dicts in
+    order as they are parsed, so extraction can start on the first pages.
+
+    A document already in the parse cache is served from it. Otherwise the pages
+    are parsed serially and, once the stream has been consumed to the end, the
+    result is stored in the cache under the key parse_pdf_with_settings uses.
+    assemble_pdf_result() turns the collected pages into the parse_pdf result.
+    """
+    if prefilter is None:
+        prefilter = PDF_PAGE_PREFILTER
+    prefilter = prefilter and _uses_ruling_lines(table_settings)
+    source, digest = parse_cache.read_source(source)
+    key = None
+    if parse_cache.CACHE_ENABLED:
+        key = parse_cache.make_key(digest, "pdf+prefilter" if prefilter else "pdf", table_settings)
+        cached = parse_cache.load(key)
+        if cached is not None:
+            yield from cached.get("pages", [])
+            return
+
+    table_pages = classify_table_pages(source) if prefilter else None
+    pages_data = []
+    for page_data in iter_pdf_pages(source, table_settings, table_pages=table_pages,
+                                    page_cache=parse_cache.PAGE_CACHE_ENABLED):
+        pages_data.append(page_data)
+        yield page_data
+    if key:
+        parse_cache.store(key, assemble_pdf_result(source, pages_data))
+
+
+def parse_pdf_candidates(source, candidate_settings, page_texts=None):
+    """
+    Yields (table_settings, parsed) for each candidate settings dict, in order.
+
+    Unlike calling parse_pdf_with_settings once per candidate, the PDF is opened
+    a single time: pdfplumber keeps each page's parsed characters, lines and rects
+    after the first candidate, so later candidates only re-run table finding.
+    Page text does not depend on table_settings, so it is taken from page_texts
+    (e.g. the texts of an earlier default parse) or extracted once.
+
+    Candidates already in the parse cache are served from it without opening the
+    file. The PDF is closed when the generator is exhausted or closed early.
+    `source` may be a path, bytes or a binary file-like object.
+    """
+    pdf = None
+    try:
+        source, key_digest = parse_cache.read_source(source)
+        if not parse_cache.CACHE_ENABLED:
+            key_digest = None
+
+        for settings in candidate_settings:
+            key = parse_cache.make_key(key_digest, "pdf", settings) if key_digest else None
+            cached = parse_cache.load(key) if key else None
+            if cached is not None:
+                yield settings, {"filename": _source_name(source), **cached}
+                continue
+
+            try:
+                if pdf is None:
+                    pdf = pdfplumber.open(_open_target(source))
+                    if page_texts is None or len(page_texts) != len(pdf.pages):
+                        page_texts = [page.extract_text() or "" for page in pdf.pages]
+
+                pages_data = [
+                    {"text": text, "tables": page.extract_tables(table_settings=settings) or []}
+                    for page, text in zip(pdf.pages, page_texts)
+                ]
+                result = assemble_pdf_result(source, pages_data)
+            except Exception as e:
+                result = {"error": str(e)}
+
+            if key and not result.get("error"):
+                parse_cache.store(key, result)
+            yield settings, result
+    finally:
+        if pdf is not None:
+            pdf.close()
@@ -0,0 +1,226 @@
+"""
+Bulk ingestion of the programs/ and plans/ directories into the database.
+
+    python ingest.py                          # ../programs and ../plans, one process per CPU
+    python ingest.py --processes 2 --force    # re-ingest everything
+    python ingest.py --root /data/corpus --only plan
+
+Each file's extracted subjects (program fields, or plan hours) go to
+ingested_subjects, and the subjects are indexed in the search catalog (see
+catalog) and, for programs, in the outcome index (see outcome_index), which
+also holds the programs' learning outcomes. Files whose SHA-256 and parser
+version match the last run are skipped, so a run over an unchanged corpus only
+hashes the files. Files that disappeared from the directories are removed from
+the database.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import models
+import catalog
+import outcome_index
+import parse_cache
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+KIND_DIRS = {"program": "programs", "plan": "plans"}
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+models.Base.metadata.create_all(bind=engine, tables=[
+    models.IngestedFile.__table__, models.IngestedSubject.__table__,
+])
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def scan(root, kinds=tuple(KIND_DIRS)):
+    """Returns [(relative path, kind, sha256)] of the .pdf/.docx files under root/programs and root/plans."""
+    files = []
+    for kind in kinds:
+        directory = os.path.join(root, KIND_DIRS[kind])
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".pdf") or filename.endswith(".docx"):
+                rel_path = f"{KIND_DIRS[kind]}/{filename}"
+                files.append((rel_path, kind, parse_cache.file_digest(os.path.join(directory, filename))))
+    return files
+
+
+def _process_file(root, rel_path, kind):
+    """
+    Process-pool task: parses and extracts one file.
+    Returns (result, error, parse_s, extract_s).
+    """
+    import pipeline
+
+    path = os.path.join(root, rel_path)
+    filename = os.path.basename(path)
+    marks = {}
+
+    def progress(**fields):
+        # The pipeline reports stage="extracting" between parsing and extraction
+        if fields.get("stage") == "extracting":
+            marks.setdefault("extracting", time.perf_counter())
+
+    started = time.perf_counter()
+    if kind == "plan":
+        result = pipeline.extract_plan(path, filename, progress=progress)
+        error = result.get("error")
+    else:
+        result, _ = pipeline.process_document(path, filename, progress=progress)
+        error = result.get("error") if isinstance(result, dict) else None
+    finished = time.perf_counter()
+    split = marks.get("extracting", finished)
+    return result, error, split - started, finished - split
+
+
+def _store(db, rel_path, kind, digest, result, error, parse_s, extract_s):
+    """Replaces the file's rows with a fresh result. Returns the number of subjects stored."""
+    db.query(models.IngestedSubject).filter(models.IngestedSubject.file_path == rel_path).delete()
+
+    subjects = []
+    if not error:
+        subjects = result.get("subjects", []) if kind == "plan" else result
+
+    for position, subject in enumerate(subjects):
+        # The outcome catalogues are stored once per file by outcome_index
+        data = {k: v for k, v in subject.items() if k != "available_outcomes"}
+        db.add(models.IngestedSubject(
+            file_path=rel_path,
+            kind=kind,
+            position=position,
+            name=data.get("nazwa_przedmiotu", ""),
+            name_en=data.get("nazwa_angielska", ""),
+            semester=data.get("semestr", ""),
+            ects=data.get("ects", ""),
+            data=data,
+        ))
+
+    plan_metadata = result.get("metadata") if kind == "plan" and not error else None
+    catalog.index_file(db, rel_path, kind, subjects, plan_metadata)
+    outcome_index.index_file(db, rel_path, kind, subjects)
+
+    db.merge(models.IngestedFile(
+        path=rel_path,
+        kind=kind,
+        digest=digest,
+        parser_version=parse_cache.PARSER_VERSION,
+        status="error" if error else "ok",
+        error=error,
+        plan_metadata=plan_metadata,
+        subjects=len(subjects),
+        parse_s=parse_s,
+        extract_s=extract_s,
+        ingested_at=_now(),
+    ))
+    db.commit()
+    return len(subjects)
+
+
+def _remove(db, rel_paths):
+    catalog.remove_files(db, rel_paths)
+    outcome_index.remove_files(db, rel_paths)
+    for model, column in ((models.IngestedSubject, models.IngestedSubject.file_path),
+                          (models.IngestedFile, models.IngestedFile.path)):
+        db.query(model).filter(column.in_(rel_paths)).delete(synchronize_session=False)
+    db.commit()
+
+
+def ingest(root=DEFAULT_ROOT, kinds=tuple(KIND_DIRS), processes=None, force=False, retry_failed=False,
+           on_file=None):
+    """
+    Ingests every changed file under root. Returns a list of per-file reports
+    ({"path", "kind", "status", "subjects", "parse_s", "extract_s", "wall_s", "error"});
+    status is "ok", "error" or "skipped". on_file, if given, receives each report as it completes.
+    """
+    files = scan(root, kinds)
+    reports = []
+
+    def report(entry):
+        reports.append(entry)
+        if on_file:
+            on_file(entry)
+
+    with SessionLocal() as db:
+        known = {f.path: f for f in db.query(models.IngestedFile).filter(models.IngestedFile.kind.in_(kinds))}
+        gone = [path for path in known if path not in {rel_path for rel_path, _, _ in files}]
+        if gone:
+            _remove(db, gone)
+            logger.info(f"Removed {len(gone)} files no longer on disk")
+
+        todo = []
+        for rel_path, kind, digest in files:
+            previous = known.get(rel_path)
+            unchanged = (previous is not None and previous.digest == digest
+                         and previous.parser_version == parse_cache.PARSER_VERSION
+                         and not (retry_failed and previous.status == "error"))
+            if unchanged and not force:
+                report({"path": rel_path, "kind": kind, "status": "skipped", "subjects": previous.subjects,
+                        "parse_s": None, "extract_s": None, "wall_s": 0.0, "error": previous.error})
+            else:
+                todo.append((rel_path, kind, digest))
+
+        if not todo:
+            return reports
+
+        processes = max(1, min(processes or os.cpu_count() or 1, len(todo)))
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            submitted = time.perf_counter()
+            futures = {pool.submit(_process_file, root, rel_path, kind): (rel_path, kind, digest)
+                       for rel_path, kind, digest in todo}
+            for future in as_completed(futures):
+                rel_path, kind, digest = futures[future]
+                try:
+                    result, error, parse_s, extract_s = future.result()
+                except Exception as e:
+                    logger.exception(f"Ingesting {rel_path} failed")
+                    result, error, parse_s, extract_s = None, str(e), None, None
+                subjects = _store(db, rel_path, kind, digest, result, error, parse_s, extract_s)
+                report({"path": rel_path, "kind": kind, "status": "error" if error else "ok",
+                        "subjects": subjects, "parse_s": parse_s, "extract_s": extract_s,
+                        "wall_s": time.perf_counter() - submitted, "error": error})
+        finally:
+            pool.shutdown(cancel_futures=True)
+    return reports
+
+
+def _print_report(entry):
+    if entry["status"] == "skipped":
+        print(f"skipped  {'':>27}  {entry['subjects'] or 0:4d} subjects  {entry['path']}")
+        return
+    timings = (f"parse {entry['parse_s']:6.2f}s extract {entry['extract_s']:5.2f}s"
+               if entry["parse_s"] is not None else f"{'':27}")
+    line = f"{entry['status']:8} {timings}  {entry['subjects']:4d} subjects  {entry['path']}"
+    if entry["error"]:
+        line += f"  ({entry['error']})"
+    print(line, flush=True)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parses every program and plan and stores the results.")
+    arg_parser.add_argument("--root", default=DEFAULT_ROOT, help="directory containing programs/ and plans/")
+    arg_parser.add_argument("--only", choices=sorted(KIND_DIRS), help="ingest only programs or only plans")
+    arg_parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    arg_parser.add_argument("--force", action="store_true", help="re-ingest unchanged files too")
+    arg_parser.add_argument("--retry-failed", action="store_true", help="re-ingest unchanged files that failed")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    started = time.perf_counter()
+    reports = ingest(args.root, (args.only,) if args.only else tuple(KIND_DIRS), args.processes,
+                     args.force, args.retry_failed, on_file=_print_report)
+    counts = {status: sum(r["status"] == status for r in reports) for status in ("ok", "skipped", "error")}
+    print(f"{len(reports)} files: {counts['ok']} ingested, {counts['skipped']} skipped, "
+          f"{counts['error']} failed in {time.perf_counter() - started:.1f}s")
+    sys.exit(1 if counts["error"] else 0)
@@ -0,0 +1,171 @@
+"""
+SQLite-backed queue of background ingestion jobs.
+
+The API process only inserts rows (enqueue) and reads them (get_job); job_worker
+processes claim and run them. Everything goes through the shared database file,
+so workers can run in the API container, in separate containers, or on other
+hosts that mount the same volume.
+"""
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+
+import models
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("program", "plan")
+FINISHED = ("done", "failed")
+
+# A running job whose worker stopped sending heartbeats for this long is handed to another worker
+STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", "120"))
+MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+
+models.Base.metadata.create_all(bind=engine, tables=[models.Job.__table__])
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(kind, filename, data, options=None):
+    """Stores an upload as a queued job and returns its id."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = uuid.uuid4().hex
+    with SessionLocal() as db:
+        db.add(models.Job(
+            id=job_id,
+            kind=kind,
+            filename=filename,
+            options=options or {},
+            status="queued",
+            progress={"stage": "queued"},
+            input_data=data,
+            attempts=0,
+            created_at=_now(),
+        ))
+        db.commit()
+    return job_id
+
+
+def get_job(job_id):
+    """Returns the job's status dict, or None if it does not exist."""
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        return job.to_dict() if job else None
+
+
+def get_result(job_id):
+    """Returns (job_dict, result, result_status), or None if the job does not exist."""
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        if not job:
+            return None
+        return job.to_dict(), job.result, job.result_status
+
+
+def claim_next(worker):
+    """
+    Atomically moves the oldest queued job to "running" for this worker.
+
+    Returns (job_id, kind, filename, options, data), or None if the queue is empty.
+    The conditional UPDATE makes sure only one worker wins a given job.
+    """
+    with SessionLocal() as db:
+        while True:
+            job_id = (db.query(models.Job.id)
+                      .filter(models.Job.status == "queued")
+                      .order_by(models.Job.created_at)
+                      .limit(1).scalar())
+            if job_id is None:
+                return None
+            now = _now()
+            claimed = (db.query(models.Job)
+                       .filter(models.Job.id == job_id, models.Job.status == "queued")
+                       .update({
+                           models.Job.status: "running",
+                           models.Job.worker: worker,
+                           models.Job.attempts: models.Job.attempts + 1,
+                           models.Job.started_at: now,
+                           models.Job.heartbeat_at: now,
+                           models.Job.progress: {"stage": "started"},
+                       }, synchronize_session=False))
+            db.commit()
+            if claimed:
+                job = db.get(models.Job, job_id)
+                return job.id, job.kind, job.filename, job.options or {}, job.input_data
+
+
+def update_progress(job_id, worker, progress):
+    """Stores the progress dict and refreshes the heartbeat. Returns False if the job was taken away."""
+    with SessionLocal() as db:
+        updated = (db.query(models.Job)
+                   .filter(models.Job.id == job_id, models.Job.worker == worker,
+                           models.Job.status == "running")
+                   .update({models.Job.progress: progress, models.Job.heartbeat_at: _now()},
+                           synchronize_session=False))
+        db.commit()
+        return bool(updated)
+
+
+def heartbeat(job_id, worker):
+    with SessionLocal() as db:
+        (db.query(models.Job)
+         .filter(models.Job.id == job_id, models.Job.worker == worker, models.Job.status == "running")
+         .update({models.Job.heartbeat_at: _now()}, synchronize_session=False))
+        db.commit()
+
+
+def finish(job_id, worker, result, result_status, progress=None):
+    """Stores the result and drops the upload bytes."""
+    _complete(job_id, worker, {
+        models.Job.status: "done",
+        models.Job.result: result,
+        models.Job.result_status: result_status,
+        **({models.Job.progress: progress} if progress is not None else {}),
+    })
+
+
+def fail(job_id, worker, error):
+    _complete(job_id, worker, {
+        models.Job.status: "failed",
+        models.Job.error: error,
+    })
+
+
+def _complete(job_id, worker, values):
+    with SessionLocal() as db:
+        (db.query(models.Job)
+         .filter(models.Job.id == job_id, models.Job.worker == worker, models.Job.status == "running")
+         .update({**values, models.Job.input_data: None, models.Job.finished_at: _now()},
+                 synchronize_session=False))
+        db.commit()
+
+
+def requeue_stale(stale_after=None):
+    """
+    Returns jobs of workers that stopped heartbeating to the queue, or fails them
+    after MAX_ATTEMPTS (e.g. an upload that crashes the worker every time).
+    """
+    cutoff = _now() - timedelta(seconds=STALE_AFTER if stale_after is None else stale_after)
+    with SessionLocal() as db:
+        stale = (db.query(models.Job)
+                 .filter(models.Job.status == "running", models.Job.heartbeat_at < cutoff)
+                 .all())
+        for job in stale:
+            if (job.attempts or 0) >= MAX_ATTEMPTS:
+                logger.warning(f"Job {job.id} failed after {job.attempts} attempts")
+                job.status = "failed"
+                job.error = "Worker przestał odpowiadać podczas przetwarzania pliku."
+                job.input_data = None
+                job.finished_at = _now()
+            else:
+                logger.warning(f"Requeueing job {job.id} abandoned by worker {job.worker}")
+                job.status = "queued"
+                job.worker = None
+                job.progress = {"stage": "queued"}
+        db.commit()
+        return len(stale)
@@ -0,0 +1,149 @@
+"""
+Worker process for the background job queue (see job_queue).
+
+Run one or more next to the API, on any host that shares the data volume:
+
+    python job_worker.py --processes 2
+
+The API server also starts JOB_WORKERS of these itself (default 1); set
+JOB_WORKERS=0 when workers run elsewhere.
+"""
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+
+import job_queue
+import pipeline
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1.0"))
+HEARTBEAT_INTERVAL = max(1.0, job_queue.STALE_AFTER / 4)
+# Minimum delay between progress writes, so page-by-page updates don't hammer the database
+PROGRESS_INTERVAL = 0.5
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Progress:
+    """Collects progress fields from the pipeline and writes them to the job row, throttled."""
+
+    def __init__(self, job_id, worker):
+        self.job_id = job_id
+        self.worker = worker
+        self.state = {"stage": "started", "pages_parsed": 0, "pages_total": None, "subjects_found": 0}
+        self._last_write = 0.0
+
+    def __call__(self, **fields):
+        stage_changed = fields.get("stage", self.state["stage"]) != self.state["stage"]
+        self.state.update(fields)
+        now = time.monotonic()
+        if stage_changed or "subjects_found" in fields or now - self._last_write >= PROGRESS_INTERVAL:
+            self._last_write = now
+            job_queue.update_progress(self.job_id, self.worker, dict(self.state))
+
+
+def _heartbeat_loop(job_id, worker, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            job_queue.heartbeat(job_id, worker)
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+
+def run_job(job_id, kind, filename, options, data, worker):
+    """Runs one claimed job and records its result or error."""
+    progress = _Progress(job_id, worker)
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(job_id, worker, stop), daemon=True)
+    beat.start()
+    started = time.time()
+    try:
+        if kind == "plan":
+            content, status_code = pipeline.process_plan(data, filename, options.get("tryb"), progress=progress)
+        else:
+            content, status_code = pipeline.process_document(data, filename, progress=progress)
+        if status_code >= 400:
+            job_queue.fail(job_id, worker, (content or {}).get("error") or "Nie udało się przetworzyć pliku.")
+            logger.info(f"Job {job_id} ({kind}, {filename}) failed: {content}")
+            return
+        progress.state["stage"] = "done"
+        job_queue.finish(job_id, worker, content, status_code, dict(progress.state))
+        logger.info(f"Job {job_id} ({kind}, {filename}) done in {time.time() - started:.1f}s")
+    except Exception as e:
+        logger.exception(f"Job {job_id} ({kind}, {filename}) failed")
+        job_queue.fail(job_id, worker, str(e))
+    finally:
+        stop.set()
+        beat.join()
+
+
+def run_worker(stop_event=None, once=False):
+    """
+    Claims and runs jobs until stop_event is set (or, with once=True, until the queue is empty).
+    """
+    worker = _worker_name()
+    logger.info(f"Job worker {worker} started")
+    while not (stop_event and stop_event.is_set()):
+        try:
+            job_queue.requeue_stale()
+            claimed = job_queue.claim_next(worker)
+        except Exception as e:
+            logger.error(f"Job worker {worker} could not poll the queue: {e}")
+            claimed = None
+        if claimed:
+            run_job(*claimed, worker)
+            continue
+        if once:
+            break
+        if stop_event:
+            stop_event.wait(POLL_INTERVAL)
+        else:
+            time.sleep(POLL_INTERVAL)
+
+
+def start_workers(count, stop_event=None):
+    """Starts `count` worker processes (spawned, so they don't inherit the caller's threads)."""
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = stop_event or ctx.Event()
+    processes = []
+    for _ in range(count):
+        # Not daemonic: a worker may start its own parse pool (PDF_PARSE_WORKERS > 1)
+        process = ctx.Process(target=run_worker, args=(stop_event,))
+        process.start()
+        processes.append(process)
+    return processes, stop_event
+
+
+def stop_workers(processes, stop_event, timeout=5.0):
+    """Asks workers to stop after their current job; terminates those that don't within timeout."""
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Runs background ingestion jobs from the job queue.")
+    arg_parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    arg_parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    if args.processes <= 1 or args.once:
+        run_worker(once=args.once)
+    else:
+        workers, stop = start_workers(args.processes)
+        try:
+            for w in workers:
+                w.join()
+        except KeyboardInterrupt:
+            stop_workers(workers, stop)
@@ -0,0 +1,162 @@
+"""
+Registry of plan PDF layout profiles.
+
+Plans exported from the same template (same generator, page size and table
+header) need the same pdfplumber table_settings. After a plan has been
+extracted, the settings that worked are stored under the document's
+fingerprint; the next plan with that fingerprint is parsed with them right
+away instead of going through the default parse and the adaptive reparse.
+Fingerprints are kept in parse_cache under the document's content digest, so a
+repeated upload does not open the PDF again.
+"""
+import io
+import os
+import re
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+import pdfplumber
+
+import models
+import parse_cache
+import file_parser
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("LAYOUT_PROFILES", "1").strip().lower() not in ("0", "false", "no", "off")
+
+# Pages searched for the first table, and header rows of that table hashed into the fingerprint
+_FIRST_TABLE_PAGES = 3
+_HEADER_ROWS = 2
+
+# Digits and punctuation vary between otherwise identical headers ("(4+5+6+7 +8)", footnote marks)
+_HEADER_NOISE_RE = re.compile(r"[\W\d_]+")
+
+models.Base.metadata.create_all(bind=engine, tables=[models.LayoutProfile.__table__])
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def fingerprint(source, pages=None):
+    """
+    Cheap fingerprint of a plan PDF: producer metadata, first page size, and the
+    column count and header text of the first table (found with default settings
+    on the first pages only).
+
+    `source` is a path or the PDF bytes. pages, if given, are the page dicts of a
+    default-settings parse of the document; the first table is then read from
+    them instead of running table finding again. Without pages, a cached default
+    parse is used the same way when there is one. Returns a dict with "key" and
+    its parts, or None if the file cannot be read.
+    """
+    try:
+        source, digest = parse_cache.read_source(source)
+    except OSError as e:
+        logger.warning(f"Could not fingerprint PDF: {e}")
+        return None
+    key = parse_cache.make_key(digest, "layout-fingerprint")
+    cached = parse_cache.load(key) if parse_cache.CACHE_ENABLED else None
+    if cached is not None:
+        return cached["fingerprint"]
+
+    if pages is None:
+        parsed = file_parser.cached_pdf(digest)
+        pages = parsed["pages"] if parsed else None
+    fp = _fingerprint(source, pages)
+    if fp and parse_cache.CACHE_ENABLED:
+        parse_cache.store(key, {"fingerprint": fp})
+    return fp
+
+
+def _fingerprint(source, pages):
+    target = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    try:
+        with pdfplumber.open(target) as pdf:
+            info = pdf.metadata or {}
+            producer = str(info.get("Producer") or info.get("Creator") or "").strip()
+            if not pdf.pages:
+                return None
+            first = pdf.pages[0]
+            page_size = f"{round(first.width)}x{round(first.height)}"
+
+            if pages is not None:
+                first_tables = (page["tables"] for page in pages[:_FIRST_TABLE_PAGES])
+            else:
+                first_tables = ([t.extract() for t in page.find_tables()[:1]]
+                                for page in pdf.pages[:_FIRST_TABLE_PAGES])
+            columns = 0
+            header = ""
+            for tables in first_tables:
+                if tables:
+                    table = tables[0]
+                    columns = len(table[0]) if table else 0
+                    header = " ".join(cell for row in table[:_HEADER_ROWS] for cell in row if cell)
+                    break
+    except Exception as e:
+        logger.warning(f"Could not fingerprint PDF: {e}")
+        return None
+
+    header_hash = hashlib.sha1(_HEADER_NOISE_RE.sub("", header.lower()).encode("utf-8")).hexdigest()[:16]
+    raw = f"{producer}|{page_size}|{columns}|{header_hash}"
+    return {
+        "key": hashlib.sha256(raw.encode("utf-8")).hexdigest(),
+        "producer": producer,
+        "page_size": page_size,
+        "columns": columns,
+        "header_hash": header_hash,
+    }
+
+
+def has_settings():
+    """True when some stored profile has its own table_settings; otherwise a lookup changes nothing."""
+    with SessionLocal() as db:
+        return any(settings for (settings,) in db.query(models.LayoutProfile.table_settings))
+
+
+def lookup(key):
+    """Returns the stored profile dict for a fingerprint key, or None."""
+    with SessionLocal() as db:
+        profile = db.get(models.LayoutProfile, key)
+        return profile.to_dict() if profile else None
+
+
+def record(fp, table_settings, subjects, layouts=None):
+    """Stores (or replaces) the settings that gave the best extraction for this fingerprint."""
+    now = _now()
+    with SessionLocal() as db:
+        profile = db.get(models.LayoutProfile, fp["key"])
+        if profile is None:
+            profile = models.LayoutProfile(fingerprint=fp["key"], hits=0, misses=0, created_at=now)
+            db.add(profile)
+        profile.producer = fp.get("producer")
+        profile.page_size = fp.get("page_size")
+        profile.columns = fp.get("columns")
+        profile.header_hash = fp.get("header_hash")
+        profile.table_settings = table_settings or None
+        profile.layouts = layouts or {}
+        profile.subjects = subjects
+        profile.updated_at = now
+        db.commit()
+    logger.info(f"Layout profile {fp['key'][:12]} ({fp.get('producer') or 'unknown producer'}, "
+                f"{fp.get('columns')} cols): table_settings={table_settings}, {subjects} subjects")
+
+
+def record_use(key, success):
+    """Counts a first-attempt parse with the profile's settings that did (hit) or did not (miss) work."""
+    column = models.LayoutProfile.hits if success else models.LayoutProfile.misses
+    with SessionLocal() as db:
+        (db.query(models.LayoutProfile)
+         .filter(models.LayoutProfile.fingerprint == key)
+         .update({column: column + 1}, synchronize_session=False))
+        db.commit()
+
+
+def list_profiles():
+    """All stored profiles, most recently updated first."""
+    with SessionLocal() as db:
+        profiles = db.query(models.LayoutProfile).order_by(models.LayoutProfile.updated_at.desc()).all()
+        return [p.to_dict() for p in profiles]
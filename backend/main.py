@@ -1,17 +1,23 @@
 import os
+import json
 import uuid
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse, FileResponse
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, Request, Query
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional, List
-import shutil
-import file_parser
-import data_extractor_v2
-import plan_extractor
-import plan_parser
 import document_generator
-import data_merger
 import bielik_service
+import pipeline
+import worker_pool
+import job_queue
+import job_worker
+import layout_profiles
+import catalog
+import outcome_index
+import data_merger
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, Dict
 BACKEND_VERSION = "1.3.1"
@@ -33,7 +39,20 @@ class AIGenerateRequest(BaseModel):
     language: Optional[str] = "pl"
     field_value: Optional[str] = ""
 
-app = FastAPI()
+# Background job workers started with the server; 0 when they run as separate services
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+# How often the SSE stream checks the job row for progress
+JOB_EVENTS_INTERVAL = 0.5
+
+@asynccontextmanager
+async def lifespan(app):
+    job_workers, job_stop = job_worker.start_workers(JOB_WORKERS) if JOB_WORKERS > 0 else ([], None)
+    yield
+    if job_workers:
+        await run_in_threadpool(job_worker.stop_workers, job_workers, job_stop)
+    worker_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -43,56 +62,154 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(worker_pool.QueueFull)
+async def worker_queue_full_handler(request: Request, exc: worker_pool.QueueFull):
+    return JSONResponse(
+        content={"error": "Serwer jest przeciążony, spróbuj ponownie za chwilę."},
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.get("/api/worker-pool")
+async def get_worker_pool_stats():
+    """Queue depth and wait/run times of the CPU worker pool (for sizing WORKER_POOL_SIZE)."""
+    return JSONResponse(content=worker_pool.stats(), status_code=200)
+
+@app.get("/api/layout-profiles")
+async def get_layout_profiles():
+    """Plan layout profiles learned so far (fingerprint -> table_settings that worked)."""
+    profiles = await run_in_threadpool(layout_profiles.list_profiles)
+    return JSONResponse(content=profiles, status_code=200)
+
 @app.get("/api/version")
 async def get_version():
     return JSONResponse(content={"version": BACKEND_VERSION}, status_code=200)
 
-@app.post("/api/process-document")
-async def process_document(file: UploadFile = File(None), url: Optional[str] = Form(None)):
-    if file:
-        file_location = f"temp_{file.filename}"
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        parsed_data = None
-        if file.filename.endswith(".docx"):
-            parsed_data = file_parser.parse_docx(file_location)
-        elif file.filename.endswith(".pdf"):
-            parsed_data = file_parser.parse_pdf(file_location)
-        else:
-            os.remove(file_location)
-            return JSONResponse(content={"error": "Unsupported file format"}, status_code=400)
-
-        os.remove(file_location)
+# Response shapes of /api/process-document and /api/process-plan (?format=...)
+DOCUMENT_FORMATS = ("subjects", "normalized", "ndjson")
+PLAN_FORMATS = ("json", "ndjson")
 
-        if not parsed_data or parsed_data.get("error"):
-            return JSONResponse(content={"error": parsed_data.get("error") if parsed_data else "Failed to parse document"}, status_code=500)
+def _ndjson_response(lines):
+    """Streams the worker_pool.stream items as NDJSON, one JSON object per line."""
+    async def encode():
+        async for line in lines:
+            yield json.dumps(line, ensure_ascii=False) + "\n"
 
-        tables = parsed_data.get("tables", [])
-        text_content = parsed_data.get("content", "")
-        pages_content = parsed_data.get("pages", None)
-        
-        # Używamy uniwersalnego ekstraktora z Phase 3 (obsługującego V2 Tables + Text Fallback)
-        subject_data = data_extractor_v2.extract_data_from_docx_v2(tables, text_content, pages_content)
+    return StreamingResponse(
+        encode(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        if subject_data and isinstance(subject_data, dict) and "error" in subject_data:
-            return JSONResponse(content=subject_data, status_code=500)
-        
-        # Nawet gdyby nie znaleziono żadnej tabeli (tables = []),
-        # parser tekstowy uruchomiłby się na text_content we wnetrzu extract_data_from_docx_v2.
-        return JSONResponse(content=subject_data, status_code=200)
+@app.post("/api/process-document")
+async def process_document(file: UploadFile = File(None), url: Optional[str] = Form(None),
+                           response_format: str = Query("subjects", alias="format")):
+    """
+    Extracts a program's subjects. ?format=normalized sends the outcome catalogues and
+    document-level fields once instead of in every subject (see data_extractor_v2.normalize_subjects).
+    ?format=ndjson streams the subjects while the document is parsed (see data_extractor_v2.iter_extraction).
+    """
+    if response_format not in DOCUMENT_FORMATS:
+        return JSONResponse(content={"error": f"Nieznany format odpowiedzi: {response_format}"}, status_code=400)
+    if file and response_format == "ndjson":
+        if not (file.filename.endswith(".pdf") or file.filename.endswith(".docx")):
+            return JSONResponse(content={"error": "Unsupported file format"}, status_code=400)
+        file_bytes = await file.read()
+        return _ndjson_response(worker_pool.stream(pipeline.stream_document, file_bytes, file.filename))
+    if file:
+        # Parsing and extraction run in the worker pool so other requests stay responsive
+        file_bytes = await file.read()
+        content, status_code = await worker_pool.run(pipeline.process_document, file_bytes, file.filename,
+                                                     normalized=response_format == "normalized")
+        return JSONResponse(content=content, status_code=status_code)
 
     elif url:
         return JSONResponse(content={"message": "URL processed successfully", "url": url}, status_code=200)
     else:
         return JSONResponse(content={"error": "No file or URL provided"}, status_code=400)
 
+# --- Background Jobs ---
+
+@app.post("/api/jobs")
+async def create_job(file: UploadFile = File(...), kind: str = Form("program"), tryb: Optional[str] = Form(None)):
+    """Queues a program or plan upload for background processing and returns its job id."""
+    if kind not in job_queue.KINDS:
+        return JSONResponse(content={"error": f"Nieznany rodzaj zadania: {kind}"}, status_code=400)
+    if not (file.filename.endswith(".pdf") or file.filename.endswith(".docx")):
+        return JSONResponse(content={"error": "Plik musi być w formacie PDF lub DOCX."}, status_code=400)
+
+    file_bytes = await file.read()
+    options = {"tryb": tryb} if tryb else {}
+    job_id = await run_in_threadpool(job_queue.enqueue, kind, file.filename, file_bytes, options)
+    return JSONResponse(
+        content={"job_id": job_id, "status": "queued"},
+        status_code=202,
+        headers={"Location": f"/api/jobs/{job_id}"}
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await run_in_threadpool(job_queue.get_job, job_id)
+    if not job:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return JSONResponse(content=job, status_code=200)
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events stream of the job's progress; ends with a "done" or "failed" event."""
+    job = await run_in_threadpool(job_queue.get_job, job_id)
+    if not job:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+
+    async def stream():
+        last = None
+        idle = 0.0
+        while True:
+            current = await run_in_threadpool(job_queue.get_job, job_id)
+            if current is None:
+                return
+            snapshot = {"status": current["status"], **current["progress"]}
+            if snapshot != last:
+                last = snapshot
+                idle = 0.0
+                yield f"event: progress\ndata: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if current["status"] in job_queue.FINISHED:
+                yield f"event: {current['status']}\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+                return
+            idle += JOB_EVENTS_INTERVAL
+            if idle >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                idle = 0.0
+                yield ": keepalive\n\n"
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """The job's result, with the status code the synchronous endpoint would have returned."""
+    found = await run_in_threadpool(job_queue.get_result, job_id)
+    if not found:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    job, result, result_status = found
+    if job["status"] == "failed":
+        return JSONResponse(content={"error": job["error"]}, status_code=500)
+    if job["status"] != "done":
+        return JSONResponse(content=job, status_code=202)
+    return JSONResponse(content=result, status_code=result_status or 200)
+
 # In-memory store for generated files (file_id -> {path, filename})
 _generated_files = {}
 
 @app.post("/api/ai-generate")
 async def ai_generate(request: AIGenerateRequest):
-    result = bielik_service.generate_content(
+    # Blocking HTTP call to the LLM provider - keep it off the event loop
+    result = await run_in_threadpool(
+        bielik_service.generate_content,
         subject_name=request.subject_name,
         field_type=request.field_type,
         context=request.context_info,
@@ -108,33 +225,79 @@ async def ai_generate(request: AIGenerateRequest):
 
 
 @app.post("/api/process-plan")
-async def process_plan(file: UploadFile = File(...), tryb: str = None):
-    """Process a study plan PDF to extract per-subject hour data."""
+async def process_plan(file: UploadFile = File(...), tryb: str = None,
+                       response_format: str = Query("json", alias="format")):
+    """
+    Process a study plan PDF to extract per-subject hour data.
+    ?format=ndjson streams the subjects page by page (see pipeline.stream_plan).
+    """
+    if response_format not in PLAN_FORMATS:
+        return JSONResponse(content={"error": f"Nieznany format odpowiedzi: {response_format}"}, status_code=400)
     if not (file.filename.endswith(".pdf") or file.filename.endswith(".docx")):
         return JSONResponse(content={"error": "Plan studiów musi być w formacie PDF lub DOCX."}, status_code=400)
 
-    file_location = f"temp_plan_{file.filename}"
-    try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        if file.filename.endswith(".docx"):
-            parsed_data = file_parser.parse_docx(file_location)
-        else:
-            parsed_data = file_parser.parse_pdf(file_location)
-            
-        if not parsed_data or parsed_data.get("error"):
-            return JSONResponse(
-                content={"error": parsed_data.get("error") if parsed_data else "Nie udało się sparsować pliku."},
-                status_code=500
-            )
-        # Pass file_path for PDFs to enable adaptive reparsing if initial parse yields few subjects
-        pdf_path = file_location if file.filename.endswith(".pdf") else None
-        result = plan_parser.extract_full_plan(parsed_data, override_tryb=tryb, file_path=pdf_path)
-        return JSONResponse(content=result, status_code=200)
-    finally:
-        if os.path.exists(file_location):
-            os.remove(file_location)
+    # Read the upload once; the same bytes are hashed, parsed and reused for adaptive reparsing
+    file_bytes = await file.read()
+    if response_format == "ndjson":
+        return _ndjson_response(worker_pool.stream(pipeline.stream_plan, file_bytes, file.filename, tryb))
+    content, status_code = await worker_pool.run(pipeline.process_plan, file_bytes, file.filename, tryb)
+    return JSONResponse(content=content, status_code=status_code)
+
+
+@app.post("/api/process-program-with-plans")
+async def process_program_with_plans(program: UploadFile = File(...), plans: List[UploadFile] = File([]),
+                                     plan_tryb: List[str] = Form([])):
+    """
+    Parses a program and any number of its study plans at the same time and returns
+    the program subjects with the plan hours joined on (data_merger.merge_plan_hours).
+    plan_tryb optionally gives S / NS for each plan, in upload order.
+    """
+    for upload in (program, *plans):
+        if not (upload.filename.endswith(".pdf") or upload.filename.endswith(".docx")):
+            return JSONResponse(content={"error": f"Plik {upload.filename} musi być w formacie PDF lub DOCX."},
+                                status_code=400)
+
+    program_bytes = await program.read()
+    plan_files = [(upload.filename, await upload.read(), plan_tryb[i] if i < len(plan_tryb) and plan_tryb[i] else None)
+                  for i, upload in enumerate(plans)]
+
+    # All files go to the worker pool at once: wall time is the slowest file, not the sum
+    results = await worker_pool.run_batch(
+        [(pipeline.process_document, program_bytes, program.filename)]
+        + [(pipeline.process_plan, data, filename, tryb) for filename, data, tryb in plan_files]
+    )
+    (program_subjects, status_code), plan_results = results[0], results[1:]
+    if status_code != 200:
+        return JSONResponse(content=program_subjects, status_code=status_code)
+
+    plans_summary = []
+    parsed_plans = []
+    for (filename, _, _), (content, plan_status) in zip(plan_files, plan_results):
+        if plan_status != 200:
+            plans_summary.append({"filename": filename, "error": content.get("error")})
+            continue
+        parsed_plans.append(content)
+        plans_summary.append({"filename": filename, "metadata": content.get("metadata", {}),
+                              "subjects": len(content.get("subjects", []))})
+
+    merged, matched = data_merger.merge_plan_hours(program_subjects, parsed_plans)
+    for summary, count in zip((p for p in plans_summary if "error" not in p), matched):
+        summary["matched"] = count
+    return JSONResponse(content={"subjects": merged, "plans": plans_summary}, status_code=200)
+
+
+@app.post("/api/plan-diff")
+async def plan_diff(old: UploadFile = File(...), new: UploadFile = File(...), tryb: str = None):
+    """Compares two versions of a study plan: added, removed and changed subjects."""
+    for upload in (old, new):
+        if not (upload.filename.endswith(".pdf") or upload.filename.endswith(".docx")):
+            return JSONResponse(content={"error": "Plan studiów musi być w formacie PDF lub DOCX."}, status_code=400)
+
+    old_bytes = await old.read()
+    new_bytes = await new.read()
+    content, status_code = await worker_pool.run(
+        pipeline.diff_plans, old_bytes, old.filename, new_bytes, new.filename, tryb)
+    return JSONResponse(content=content, status_code=status_code)
 
 
 @app.post("/api/generate-syllabus")
@@ -144,7 +307,7 @@ async def generate_syllabus(data: dict):
     template_name = "template_en.docx" if language == "en" else "template_pl.docx"
     template_path = os.path.join(os.path.dirname(__file__), "..", template_name)
     
-    result = document_generator.generate_docx(data, template_path=template_path)
+    result = await worker_pool.run(document_generator.generate_docx, data, template_path=template_path)
     if "error" in result:
         return JSONResponse(content=result, status_code=500)
     
@@ -189,46 +352,33 @@ async def download_file(file_id: str, filename: str):
 
 @app.get("/api/get-all-subjects")
 async def get_all_subjects():
-    programs_subjects = []
-    script_dir = os.path.dirname(__file__)
-    
-    # Process programs
-    programs_path = os.path.join(script_dir, "..", "programs")
-    if os.path.exists(programs_path):
-        for filename in os.listdir(programs_path):
-            file_path = os.path.join(programs_path, filename)
-            if filename.endswith(".docx"):
-                parsed_data = file_parser.parse_docx(file_path)
-                if parsed_data and not parsed_data.get("error"):
-                    subjects = data_extractor_v2.extract_data_from_docx_v2(parsed_data.get("tables"), parsed_data.get("content"))
-                    programs_subjects.extend(subjects)
-            elif filename.endswith(".pdf"):
-                # I need to implement the pdf extractor for programs
-                pass
-
-    plans_subjects = []
-    # Process plans
-    plans_path = os.path.join(script_dir, "..", "plans")
-    if os.path.exists(plans_path):
-        for filename in os.listdir(plans_path):
-            file_path = os.path.join(plans_path, filename)
-            if filename.endswith(".pdf") or filename.endswith(".docx"):
-                file_path = os.path.join(plans_path, filename)
-                if filename.endswith(".docx"):
-                    parsed_data = file_parser.parse_docx(file_path)
-                else:
-                    parsed_data = file_parser.parse_pdf(file_path)
-                    
-                if parsed_data and not parsed_data.get("error"):
-                    pdf_path = file_path if filename.endswith(".pdf") else None
-                    subjects = plan_parser.extract_full_plan(parsed_data, file_path=pdf_path).get("subjects", [])
-                    plans_subjects.extend(subjects)
-
-    merged_subjects = data_merger.merge_subjects(programs_subjects, plans_subjects)
-    return merged_subjects
+    return await worker_pool.run(pipeline.get_all_subjects)
 
 # --- Archival Module Endpoints ---
 
+@app.get("/api/catalog/search")
+async def search_catalog(q: str = "", kierunek: Optional[str] = None, poziom: Optional[str] = None,
+                         tryb: Optional[str] = None, semestr: Optional[str] = None,
+                         kind: Optional[str] = None, limit: int = 20):
+    """Looks up ingested subjects by name prefix (diacritic-insensitive) and plan attributes."""
+    found = await run_in_threadpool(catalog.search, q, kierunek, poziom, tryb, semestr, kind, limit)
+    return JSONResponse(content=found, status_code=200)
+
+@app.get("/api/outcomes")
+async def get_outcomes(symbol: Optional[str] = None, subject: Optional[str] = None,
+                       program: Optional[str] = None, poziom: Optional[str] = None):
+    """
+    Learning outcome index of the ingested programs: ?symbol=K_U05 returns the outcome
+    with its verification and the subjects covering it; ?subject=... the outcomes a subject covers.
+    """
+    if subject:
+        found = await run_in_threadpool(outcome_index.subject_outcomes, subject, program, poziom)
+    elif symbol:
+        found = await run_in_threadpool(outcome_index.lookup, symbol, program, poziom)
+    else:
+        return JSONResponse(content={"error": "Podaj symbol efektu lub nazwę przedmiotu."}, status_code=400)
+    return JSONResponse(content=found, status_code=200)
+
 @app.get("/api/syllabuses")
 async def list_syllabuses(db: Session = Depends(get_db)):
     syllabuses = db.query(models.Syllabus).order_by(models.Syllabus.updated_at.desc()).all()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime
+from sqlalchemy import Column, Integer, Float, String, JSON, DateTime, LargeBinary, Text, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -27,3 +27,203 @@ class Syllabus(Base):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "data": self.data
         }
+
+
+class Job(Base):
+    """Background ingestion job (see job_queue / job_worker)."""
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String)  # "program" | "plan"
+    filename = Column(String)
+    options = Column(JSON)  # e.g. {"tryb": "stacjonarne"}
+    status = Column(String, index=True)  # queued | running | done | failed
+    progress = Column(JSON)
+    input_data = Column(LargeBinary)  # upload bytes, dropped once the job finishes
+    result = Column(JSON)
+    result_status = Column(Integer)
+    error = Column(Text)
+    worker = Column(String)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, index=True)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": self.progress or {},
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class LayoutProfile(Base):
+    """Best known table_settings for a family of plan PDFs (see layout_profiles)."""
+    __tablename__ = "layout_profiles"
+
+    fingerprint = Column(String, primary_key=True)
+    producer = Column(String)
+    page_size = Column(String)  # e.g. "842x595"
+    columns = Column(Integer)  # column count of the first table (default settings)
+    header_hash = Column(String)
+    table_settings = Column(JSON)  # None = pdfplumber defaults
+    layouts = Column(JSON)  # rows read with each column layout, e.g. {"compressed_11": 52}
+    subjects = Column(Integer)
+    hits = Column(Integer, default=0)
+    misses = Column(Integer, default=0)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            "fingerprint": self.fingerprint,
+            "producer": self.producer,
+            "page_size": self.page_size,
+            "columns": self.columns,
+            "table_settings": self.table_settings,
+            "layouts": self.layouts or {},
+            "subjects": self.subjects,
+            "hits": self.hits or 0,
+            "misses": self.misses or 0,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class IngestedFile(Base):
+    """A program or plan file processed by ingest.py, with the digest used to skip unchanged files."""
+    __tablename__ = "ingested_files"
+
+    path = Column(String, primary_key=True)  # relative to the ingested root, e.g. "plans/is_i_st_s_2024_2025.pdf"
+    kind = Column(String, index=True)  # "program" | "plan"
+    digest = Column(String)
+    parser_version = Column(String)
+    status = Column(String)  # ok | error
+    error = Column(Text)
+    plan_metadata = Column(JSON)  # plans: tryb, poziom, kierunek
+    subjects = Column(Integer)
+    parse_s = Column(Float)
+    extract_s = Column(Float)
+    ingested_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "metadata": self.plan_metadata or {},
+            "subjects": self.subjects,
+            "parse_s": self.parse_s,
+            "extract_s": self.extract_s,
+            "ingested_at": self.ingested_at.isoformat() if self.ingested_at else None,
+        }
+
+
+class IngestedSubject(Base):
+    """One subject extracted from an ingested file (program fields or plan hours)."""
+    __tablename__ = "ingested_subjects"
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, index=True)
+    kind = Column(String)
+    position = Column(Integer)  # order within the file
+    name = Column(String)
+    name_en = Column(String)
+    semester = Column(String)
+    ects = Column(String)
+    data = Column(JSON)  # the extracted subject dict, without available_outcomes (see outcome_index)
+
+
+class CatalogEntry(Base):
+    """Searchable subject from an ingested program or plan (see catalog; full-text index in catalog_fts)."""
+    __tablename__ = "catalog"
+    __table_args__ = (
+        Index("ix_catalog_lookup", "field_norm", "level", "mode", "semester"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, index=True)  # IngestedFile.path
+    position = Column(Integer)  # IngestedSubject.position
+    kind = Column(String)  # "program" | "plan"
+    name = Column(String)
+    name_en = Column(String)
+    name_norm = Column(String, index=True)  # plan_diff.normalize_name(name)
+    name_en_norm = Column(String)
+    field_of_study = Column(String)
+    field_norm = Column(String)
+    level = Column(String)  # "studia pierwszego stopnia" | "studia drugiego stopnia" | ""
+    mode = Column(String)  # "S" | "NS" | "" (program covering both)
+    semester = Column(String)
+    ects = Column(String)
+    unit = Column(String)
+    hours = Column(JSON)  # plans: non-empty hour template tags, e.g. {"numTS": "60", "numWS": "30"}
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "file": self.file_path,
+            "nazwa_przedmiotu": self.name,
+            "nazwa_angielska": self.name_en,
+            "kierunek": self.field_of_study,
+            "poziom": self.level,
+            "tryb": self.mode,
+            "semestr": self.semester,
+            "ects": self.ects,
+            "jednostka": self.unit,
+            "hours": self.hours or {},
+        }
+
+
+class OutcomeSymbol(Base):
+    """A learning outcome of an ingested program in the outcome index (see outcome_index)."""
+    __tablename__ = "outcome_symbols"
+    __table_args__ = (
+        Index("ix_outcome_symbols_lookup", "symbol", "file_path", "level"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, index=True)  # IngestedFile.path
+    symbol = Column(String)
+    category = Column(String)  # W | U | K
+    level = Column(String)  # degree level of the outcome catalogue
+    field_of_study = Column(String)
+    description = Column(Text)
+    verification = Column(Text)
+
+    def to_dict(self):
+        return {
+            "symbol": self.symbol,
+            "category": self.category,
+            "description": self.description,
+            "verification": self.verification,
+            "poziom": self.level,
+            "kierunek": self.field_of_study,
+            "file": self.file_path,
+        }
+
+
+class OutcomeReference(Base):
+    """A program subject referring to an outcome symbol (its learning_outcomesW/U/K)."""
+    __tablename__ = "outcome_refs"
+    __table_args__ = (
+        Index("ix_outcome_refs_symbol", "symbol", "file_path", "level"),
+        Index("ix_outcome_refs_subject", "name_norm", "file_path"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, index=True)
+    position = Column(Integer)  # IngestedSubject.position
+    name = Column(String)
+    name_norm = Column(String)  # plan_diff.normalize_name(name)
+    semester = Column(String)
+    level = Column(String)  # level of the catalogue the subject's symbols resolve against
+    symbol = Column(String)
+    category = Column(String)
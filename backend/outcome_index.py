@@ -0,0 +1,183 @@
+"""
+Index of program learning outcomes across every ingested program.
+
+ingest.py stores each program's outcome catalogues here (symbol, description,
+verification, degree level, field of study), plus every subject's reference to
+a symbol (its learning_outcomesW/U/K). Both tables are indexed on the symbol and
+the subject name, so "which subjects cover K_U05, and how is it verified?" and
+"which outcomes does this subject cover?" are single indexed queries instead
+of re-parsing the programs.
+
+    python outcome_index.py LA1_W12                  # symbol lookup
+    python outcome_index.py --subject "Ekologia lasu" --poziom I
+"""
+import re
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import or_
+
+import models
+from database import SessionLocal, engine
+from data_extractor_v2 import normalize_subjects, normalize_level
+from plan_diff import normalize_name
+
+models.Base.metadata.create_all(bind=engine, tables=[
+    models.OutcomeSymbol.__table__, models.OutcomeReference.__table__,
+])
+
+# normalize_subjects tells apart catalogues of the same level with " (2)", " (3)"...
+_CATALOGUE_SUFFIX_RE = re.compile(r"^(.*?)( \(\d+\))?$")
+
+
+def normalize_symbol(symbol):
+    """Symbols are stored as the extractor reads them: upper case, no spaces."""
+    return (symbol or "").replace(" ", "").upper()
+
+
+def _stored_level(key):
+    """A normalize_subjects level key with its level normalized and the catalogue suffix kept."""
+    base, suffix = _CATALOGUE_SUFFIX_RE.match(key or "").groups()
+    return normalize_level(base) + (suffix or "")
+
+
+def index_file(db, rel_path, kind, subjects):
+    """Replaces the index rows of one ingested file (the caller commits). Only programs have outcomes."""
+    remove_files(db, [rel_path])
+    if kind != "program" or not subjects:
+        return
+
+    normalized = normalize_subjects(subjects)
+    field = normalized["document"].get("kierunek", "")
+    for key, outcomes in normalized["levels"].items():
+        level = _stored_level(key)
+        db.add_all(
+            models.OutcomeSymbol(
+                file_path=rel_path, symbol=item.get("symbol", ""), category=category, level=level,
+                field_of_study=field, description=item.get("description", ""),
+                verification=item.get("verification", ""),
+            )
+            for category, items in outcomes.items() for item in items or []
+        )
+
+    for position, subject in enumerate(normalized["subjects"]):
+        name = subject.get("nazwa_przedmiotu", "")
+        for category in ("W", "U", "K"):
+            symbols = subject.get(f"learning_outcomes{category}") or ""
+            db.add_all(
+                models.OutcomeReference(
+                    file_path=rel_path, position=position, name=name, name_norm=normalize_name(name),
+                    semester=subject.get("semestr", ""), level=_stored_level(subject.get("outcomes_level")),
+                    symbol=symbol, category=category,
+                )
+                for symbol in symbols.split(", ") if symbol
+            )
+
+
+def remove_files(db, rel_paths):
+    for model in (models.OutcomeSymbol, models.OutcomeReference):
+        db.query(model).filter(model.file_path.in_(rel_paths)).delete(synchronize_session=False)
+
+
+def _filtered(query, model, program, poziom):
+    if program:
+        query = query.filter(model.file_path == program)
+    if poziom:
+        # Every catalogue of the level, including the " (2)" ones
+        level = normalize_level(poziom)
+        query = query.filter(or_(model.level == level, model.level.startswith(level + " (", autoescape=True)))
+    return query
+
+
+def lookup(symbol, program=None, poziom=None):
+    """
+    Every program outcome with this symbol, with the subjects referring to it.
+    program is an ingested file path (e.g. "programs/331.pdf"); poziom accepts I/II
+    or the full level. Returns {"results": [...], "count": int, "took_ms": float}.
+    """
+    started = time.perf_counter()
+    symbol = normalize_symbol(symbol)
+    with SessionLocal() as db:
+        outcomes = _filtered(db.query(models.OutcomeSymbol).filter(models.OutcomeSymbol.symbol == symbol),
+                             models.OutcomeSymbol, program, poziom).all()
+        refs = _filtered(db.query(models.OutcomeReference).filter(models.OutcomeReference.symbol == symbol),
+                         models.OutcomeReference, program, poziom).order_by(models.OutcomeReference.position).all()
+
+        subjects = defaultdict(list)
+        categories = {}
+        for ref in refs:
+            categories[(ref.file_path, ref.level)] = ref.category
+            subjects[(ref.file_path, ref.level)].append(
+                {"nazwa_przedmiotu": ref.name, "semestr": ref.semester, "position": ref.position})
+
+        results = []
+        for outcome in outcomes:
+            entry = outcome.to_dict()
+            entry["subjects"] = subjects.pop((outcome.file_path, outcome.level), [])
+            results.append(entry)
+        # References to a symbol missing from their program's catalogue (e.g. a typo in the program)
+        for (file_path, level), refs_without_outcome in subjects.items():
+            results.append({"symbol": symbol, "category": categories[(file_path, level)], "description": None,
+                            "verification": None, "poziom": level, "kierunek": None, "file": file_path,
+                            "subjects": refs_without_outcome})
+    return {"results": results, "count": len(results), "took_ms": round(1000 * (time.perf_counter() - started), 2)}
+
+
+def subject_outcomes(subject, program=None, poziom=None):
+    """
+    Reverse lookup: the outcomes each program subject with this name refers to
+    (names compared normalized, see plan_diff.normalize_name).
+    Returns {"results": [...], "count": int, "took_ms": float}.
+    """
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        refs = _filtered(
+            db.query(models.OutcomeReference).filter(models.OutcomeReference.name_norm == normalize_name(subject)),
+            models.OutcomeReference, program, poziom,
+        ).order_by(models.OutcomeReference.file_path, models.OutcomeReference.position).all()
+
+        outcomes = {}
+        if refs:
+            rows = (db.query(models.OutcomeSymbol)
+                    .filter(models.OutcomeSymbol.symbol.in_({ref.symbol for ref in refs}),
+                            models.OutcomeSymbol.file_path.in_({ref.file_path for ref in refs})))
+            outcomes = {(row.file_path, row.level, row.symbol): row for row in rows}
+
+        results = {}
+        for ref in refs:
+            entry = results.get((ref.file_path, ref.position))
+            if entry is None:
+                entry = results[(ref.file_path, ref.position)] = {
+                    "file": ref.file_path, "nazwa_przedmiotu": ref.name, "semestr": ref.semester,
+                    "poziom": ref.level, "outcomes": [],
+                }
+            outcome = outcomes.get((ref.file_path, ref.level, ref.symbol))
+            entry["outcomes"].append({
+                "symbol": ref.symbol,
+                "category": ref.category,
+                "description": outcome.description if outcome else None,
+                "verification": outcome.verification if outcome else None,
+            })
+    results = list(results.values())
+    return {"results": results, "count": len(results), "took_ms": round(1000 * (time.perf_counter() - started), 2)}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Looks up program learning outcomes.")
+    arg_parser.add_argument("symbol", nargs="?", help="outcome symbol, e.g. K_U05")
+    arg_parser.add_argument("--subject", help="reverse lookup: outcomes of the subjects with this name")
+    arg_parser.add_argument("--program", help="ingested file path, e.g. programs/331.pdf")
+    arg_parser.add_argument("--poziom")
+    args = arg_parser.parse_args()
+
+    if args.subject:
+        found = subject_outcomes(args.subject, args.program, args.poziom)
+    elif args.symbol:
+        found = lookup(args.symbol, args.program, args.poziom)
+    else:
+        arg_parser.error("give a symbol or --subject")
+    json.dump(found, sys.stdout, ensure_ascii=False, indent=2)
+    print()
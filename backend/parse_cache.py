@@ -0,0 +1,237 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - coalescing falls back to in-process locks only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever file_parser output changes shape or content, so stale entries
+# written by an older parser are never served.
+PARSER_VERSION = "2"
+
+# Cache directory lives next to the SQLite database by default (same volume in Docker/Portainer).
+_DEFAULT_BASE_DIR = os.environ.get("DB_DIR") or (
+    "/app/data" if os.path.exists("/app/data") and os.access("/app/data", os.W_OK)
+    else os.path.join(os.getcwd(), "data")
+)
+CACHE_DIR = os.environ.get("PARSE_CACHE_DIR") or os.path.join(_DEFAULT_BASE_DIR, "parse_cache")
+CACHE_MAX_BYTES = int(float(os.environ.get("PARSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+CACHE_ENABLED = os.environ.get("PARSE_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+# Also cache each PDF page by its content digest, so a revised document only re-parses the changed pages
+PAGE_CACHE_ENABLED = CACHE_ENABLED and (
+    os.environ.get("PARSE_CACHE_PAGES", "1").strip().lower() not in ("0", "false", "no", "off"))
+
+_ENTRY_SUFFIX = ".json.z"
+_LOCK_SUFFIX = ".lock"
+# Document entries, "text" + "tables" of page entries, and layout_profiles fingerprints
+_CACHED_FIELDS = ("content", "tables", "pages", "table_spans", "text", "fingerprint")
+
+# Striped locks: identical uploads handled by different threads map to the same lock, and
+# different processes to the same stripe file (a fixed set, so lock files never pile up).
+_thread_locks = [threading.Lock() for _ in range(64)]
+
+# Every entry (documents and pages alike) counts toward CACHE_MAX_BYTES. The limit is
+# enforced once this process has written another 1/64 of it, so per-page stores don't
+# each scan the cache directory.
+_EVICT_EVERY_BYTES = max(CACHE_MAX_BYTES // 64, 1)
+_unchecked_bytes = 0
+_unchecked_lock = threading.Lock()
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file's bytes."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_source(source, chunk_size=1024 * 1024):
+    """
+    Normalizes a parse source and hashes it in the same read.
+
+    `source` may be a file path, bytes, or a binary file-like object such as an
+    upload's spooled buffer. Paths are returned unchanged and hashed from disk;
+    file-like objects are read once into bytes. Returns (path_or_bytes, sha256_hex).
+    """
+    if isinstance(source, str):
+        return source, file_digest(source, chunk_size)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+        return data, hashlib.sha256(data).hexdigest()
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    h = hashlib.sha256()
+    chunks = []
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        h.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), h.hexdigest()
+
+
+def make_key(digest, kind, table_settings=None):
+    """Builds the cache key from the file digest, parser kind, table_settings and PARSER_VERSION."""
+    settings = json.dumps(table_settings or {}, sort_keys=True, default=str)
+    raw = f"{PARSER_VERSION}|{kind}|{digest}|{settings}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, key + _ENTRY_SUFFIX)
+
+
+def load(key):
+    """Returns the cached parse result for `key`, or None on a miss."""
+    path = _entry_path(key)
+    try:
+        with open(path, "rb") as f:
+            entry = json.loads(zlib.decompress(f.read()).decode("utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Dropping unreadable parse cache entry {path}: {e}")
+        _remove(path)
+        return None
+
+    if entry.get("version") != PARSER_VERSION:
+        _remove(path)
+        return None
+
+    # Touch the entry so eviction treats it as recently used
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return entry.get("data")
+
+
+def store(key, result):
+    """Writes the parse result for `key` atomically; the size limit is enforced every _EVICT_EVERY_BYTES written."""
+    global _unchecked_bytes
+    entry = {
+        "version": PARSER_VERSION,
+        "data": {k: result[k] for k in _CACHED_FIELDS if k in result},
+    }
+    payload = zlib.compress(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    if len(payload) > CACHE_MAX_BYTES:
+        return
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _entry_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write parse cache entry {path}: {e}")
+        _remove(tmp_path)
+        return
+    with _unchecked_lock:
+        _unchecked_bytes += len(payload)
+        due = _unchecked_bytes >= _EVICT_EVERY_BYTES
+        if due:
+            _unchecked_bytes = 0
+    if due:
+        evict()
+
+
+def evict(max_bytes=None):
+    """Removes least recently used entries until the cache fits in max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+
+    entries = []
+    total = 0
+    for name in names:
+        if not name.endswith(_ENTRY_SUFFIX):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        _remove(path)
+        total -= size
+
+
+def clear():
+    """Removes every cache entry."""
+    evict(max_bytes=0)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _key_lock(key):
+    """Exclusive lock for one cache key, held across threads and (where fcntl exists) processes."""
+    stripe = int(key[:8], 16) % len(_thread_locks)
+    with _thread_locks[stripe]:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(os.path.join(CACHE_DIR, f"stripe-{stripe:02d}{_LOCK_SUFFIX}"), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def get_or_parse(source, kind, parse_fn, table_settings=None):
+    """
+    Returns the parse result for `source` (path, bytes or file-like object),
+    served from the cache when the same bytes were already parsed with the same
+    settings. parse_fn receives the path, or the bytes read from the source.
+
+    Concurrent calls for identical content are coalesced: the first caller runs
+    parse_fn while the others wait on the key lock and then read the freshly
+    stored entry. Error results are never cached. An unreadable source raises OSError.
+    """
+    source, digest = read_source(source)
+    if not CACHE_ENABLED:
+        return parse_fn(source)
+
+    key = make_key(digest, kind, table_settings)
+    cached = load(key)
+    if cached is None:
+        with _key_lock(key):
+            cached = load(key)
+            if cached is None:
+                result = parse_fn(source)
+                if result and not result.get("error"):
+                    store(key, result)
+                return result
+
+    filename = source if isinstance(source, str) else None
+    logger.debug(f"Parse cache hit for {filename or 'upload'} ({kind})")
+    return {"filename": filename, **cached}
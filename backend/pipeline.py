@@ -0,0 +1,291 @@
+"""
+CPU-heavy request stages (parsing + extraction).
+
+Kept as plain module-level functions taking and returning picklable values,
+so main.py can dispatch them to the worker_pool processes instead of running
+them on the asyncio event loop.
+"""
+import os
+import logging
+import itertools
+import file_parser
+import data_extractor_v2
+import plan_parser
+import data_merger
+import layout_profiles
+import plan_diff
+
+logger = logging.getLogger(__name__)
+
+
+def _page_progress(progress):
+    """Adapts a job progress callback to file_parser's progress(pages_parsed, pages_total)."""
+    if progress is None:
+        return None
+    return lambda done, total: progress(stage="parsing", pages_parsed=done, pages_total=total)
+
+
+def process_document(file_bytes, filename, progress=None, normalized=False):
+    """
+    Parses a program upload and extracts its subjects. Returns (content, status_code);
+    with normalized=True the subjects come in data_extractor_v2.normalize_subjects form.
+
+    progress, if given, is called with keyword fields describing the current stage
+    (stage, pages_parsed, pages_total, subjects_found) - used by job_worker.
+    """
+    parsed_data = None
+    if filename.endswith(".docx"):
+        parsed_data = file_parser.parse_docx(file_bytes)
+    elif filename.endswith(".pdf"):
+        parsed_data = file_parser.parse_pdf(file_bytes, progress=_page_progress(progress))
+    else:
+        return {"error": "Unsupported file format"}, 400
+
+    if not parsed_data or parsed_data.get("error"):
+        return {"error": parsed_data.get("error") if parsed_data else "Failed to parse document"}, 500
+
+    tables = parsed_data.get("tables", [])
+    text_content = parsed_data.get("content", "")
+    pages_content = parsed_data.get("pages", None)
+    if progress:
+        progress(stage="extracting")
+
+    # Używamy uniwersalnego ekstraktora z Phase 3 (obsługującego V2 Tables + Text Fallback)
+    subject_data = data_extractor_v2.extract_data_from_docx_v2(tables, text_content, pages_content)
+
+    if subject_data and isinstance(subject_data, dict) and "error" in subject_data:
+        return subject_data, 500
+
+    # Nawet gdyby nie znaleziono żadnej tabeli (tables = []),
+    # parser tekstowy uruchomiłby się na text_content we wnetrzu extract_data_from_docx_v2.
+    if progress:
+        progress(subjects_found=len(subject_data) if isinstance(subject_data, list) else 0)
+    if normalized and isinstance(subject_data, list):
+        # Normalized here, in the worker: the pool ships the small form back to the server
+        return data_extractor_v2.normalize_subjects(subject_data), 200
+    return subject_data, 200
+
+
+def _plan_profile(source):
+    """
+    (fingerprint, layout profile) of a plan PDF; either may be None. Both are None
+    when no stored profile has its own table_settings: the plan gets the default
+    parse either way, and _extract_plan_pdf fingerprints it from that parse.
+    """
+    if not layout_profiles.ENABLED or not layout_profiles.has_settings():
+        return None, None
+    fp = layout_profiles.fingerprint(source)
+    return fp, layout_profiles.lookup(fp["key"]) if fp else None
+
+
+def _extract_plan_pdf(source, tryb=None, progress=None, columnar=False, first_parse=None):
+    """
+    Parses a plan PDF (path or bytes) and extracts it. Returns the extract_full_plan
+    result, or the parser's error dict.
+
+    A plan whose fingerprint has a layout profile with its own table_settings is
+    parsed with them first; if that no longer finds enough subjects, or the plan
+    is unknown, the default parse + adaptive reparse run and the settings that
+    worked are recorded for the next plan with this fingerprint.
+
+    first_parse, if given, is (fp, profile, parsed): the _plan_profile lookup and
+    the document already parsed with the settings tried first (see stream_plan).
+    """
+    if first_parse:
+        fp, profile, parsed_first = first_parse
+    else:
+        (fp, profile), parsed_first = _plan_profile(source), None
+
+    if profile and profile["table_settings"]:
+        parsed_data = parsed_first or file_parser.parse_pdf_with_settings(source, profile["table_settings"],
+                                                                          progress=_page_progress(progress))
+        parsed_first = None
+        if parsed_data and not parsed_data.get("error"):
+            if progress:
+                progress(stage="extracting")
+            result = plan_parser.extract_full_plan(parsed_data, override_tryb=tryb, columnar=columnar)
+            success = len(result["subjects"]) >= plan_parser.MIN_SUBJECTS_THRESHOLD
+            layout_profiles.record_use(fp["key"], success)
+            if success:
+                return result
+        logger.info(f"Layout profile {fp['key'][:12]} did not fit, running the full search")
+
+    parsed_data = parsed_first or file_parser.parse_pdf(source, progress=_page_progress(progress))
+    if not parsed_data or parsed_data.get("error"):
+        return parsed_data or {"error": "Nie udało się sparsować pliku."}
+
+    if progress:
+        progress(stage="extracting")
+    # Pass the PDF source to enable adaptive reparsing if initial parse yields few subjects
+    stats = {}
+    result = plan_parser.extract_full_plan(parsed_data, override_tryb=tryb, file_path=source, stats=stats,
+                                           columnar=columnar)
+    if layout_profiles.ENABLED and len(result["subjects"]) >= plan_parser.MIN_SUBJECTS_THRESHOLD:
+        try:
+            fp = fp or layout_profiles.fingerprint(source, pages=parsed_data["pages"])
+            if fp:
+                layout_profiles.record(fp, stats.get("table_settings"), len(result["subjects"]),
+                                       stats.get("layouts"))
+        except Exception as e:
+            logger.warning(f"Could not record layout profile: {e}")
+    return result
+
+
+def extract_plan(source, filename, tryb=None, progress=None, columnar=False):
+    """
+    Parses and extracts a study plan (.docx, otherwise PDF) from a path or bytes.
+    Returns the extract_full_plan result, or an {"error": ...} dict.
+    """
+    if not filename.endswith(".docx"):
+        result = _extract_plan_pdf(source, tryb, progress, columnar)
+        return result or {"error": "Nie udało się sparsować pliku."}
+
+    parsed_data = file_parser.parse_docx(source)
+    if not parsed_data or parsed_data.get("error"):
+        return parsed_data or {"error": "Nie udało się sparsować pliku."}
+    if progress:
+        progress(stage="extracting")
+    return plan_parser.extract_full_plan(parsed_data, override_tryb=tryb, columnar=columnar)
+
+
+def process_plan(file_bytes, filename, tryb=None, progress=None):
+    """Parses a study plan upload and extracts per-subject hours. Returns (content, status_code)."""
+    result = extract_plan(file_bytes, filename, tryb, progress)
+    if result.get("error"):
+        return {"error": result["error"]}, 500
+
+    if progress:
+        progress(subjects_found=len(result.get("subjects", [])))
+    return result, 200
+
+
+def stream_document(file_bytes, filename):
+    """
+    Generator form of process_document for NDJSON responses: yields the
+    data_extractor_v2.iter_extraction lines, extracting each PDF page's subjects
+    as soon as the page is parsed. Errors end the stream with an "error" line.
+    """
+    try:
+        if filename.endswith(".docx"):
+            parsed_data = file_parser.parse_docx(file_bytes)
+            if not parsed_data or parsed_data.get("error"):
+                yield {"type": "error", "error": parsed_data.get("error") if parsed_data else "Failed to parse document"}
+                return
+            yield from data_extractor_v2.iter_extraction(parsed_data.get("tables", []), parsed_data.get("content", ""))
+        elif filename.endswith(".pdf"):
+            yield from data_extractor_v2.iter_extraction(None, None, file_parser.stream_pdf(file_bytes))
+        else:
+            yield {"type": "error", "error": "Unsupported file format"}
+    except Exception as e:
+        logger.exception(f"Streaming {filename} failed")
+        yield {"type": "error", "error": str(e)}
+
+
+def stream_plan(file_bytes, filename, tryb=None):
+    """
+    Generator form of process_plan for NDJSON responses. Yields
+    {"type": "metadata", "metadata"} read from the first page, then
+    {"type": "subject", "subject"} for each subject as soon as its page is
+    parsed, and {"type": "done", "count", "metadata"} with the final metadata.
+
+    The streamed subjects come from a single parse (with the plan's layout
+    profile settings, if it has one). The final result is the one process_plan
+    returns; when it differs - the adaptive reparse replaced the subjects, or
+    the full text changed the study mode - a {"type": "reset"} line is followed
+    by the final subjects. Errors end the stream with an "error" line.
+    """
+    if filename.endswith(".docx"):
+        result = extract_plan(file_bytes, filename, tryb)
+        if result.get("error"):
+            yield {"type": "error", "error": result["error"]}
+            return
+        yield {"type": "metadata", "metadata": result["metadata"]}
+        for subject in result["subjects"]:
+            yield {"type": "subject", "subject": subject}
+        yield {"type": "done", "count": len(result["subjects"]), "metadata": result["metadata"]}
+        return
+
+    pages, streamed = [], []
+    try:
+        fp, profile = _plan_profile(file_bytes)
+        settings = profile["table_settings"] if profile and profile["table_settings"] else None
+        page_stream = file_parser.stream_pdf(file_bytes, settings)
+        head = list(itertools.islice(page_stream, 1))
+        pages.extend(head)
+        metadata = plan_parser.extract_plan_metadata(" ".join(p.get("text", "") for p in head))
+        if tryb:
+            metadata["override_tryb"] = tryb
+        yield {"type": "metadata", "metadata": metadata}
+
+        def recorded():
+            for page_data in page_stream:
+                pages.append(page_data)
+                yield page_data
+
+        for subject in plan_parser.iter_plan_subjects(itertools.chain(head, recorded()), metadata):
+            streamed.append(subject)
+            yield {"type": "subject", "subject": subject}
+
+        parsed = file_parser.assemble_pdf_result(file_bytes, pages)
+        result = _extract_plan_pdf(file_bytes, tryb, first_parse=(fp, profile, parsed))
+    except Exception as e:
+        logger.exception(f"Streaming {filename} failed")
+        yield {"type": "error", "error": str(e)}
+        return
+    if not result or result.get("error"):
+        yield {"type": "error", "error": (result or {}).get("error") or "Nie udało się sparsować pliku."}
+        return
+
+    if result["subjects"] != streamed:
+        yield {"type": "reset"}
+        for subject in result["subjects"]:
+            yield {"type": "subject", "subject": subject}
+    yield {"type": "done", "count": len(result["subjects"]), "metadata": result["metadata"]}
+
+
+def get_all_subjects():
+    """Parses every bundled program and plan and merges their subjects."""
+    programs_subjects = []
+    script_dir = os.path.dirname(__file__)
+
+    # Process programs
+    programs_path = os.path.join(script_dir, "..", "programs")
+    if os.path.exists(programs_path):
+        for filename in os.listdir(programs_path):
+            file_path = os.path.join(programs_path, filename)
+            if filename.endswith(".docx"):
+                parsed_data = file_parser.parse_docx(file_path)
+                if parsed_data and not parsed_data.get("error"):
+                    subjects = data_extractor_v2.extract_data_from_docx_v2(parsed_data.get("tables"), parsed_data.get("content"))
+                    programs_subjects.extend(subjects)
+            elif filename.endswith(".pdf"):
+                # I need to implement the pdf extractor for programs
+                pass
+
+    plans_subjects = []
+    # Process plans
+    plans_path = os.path.join(script_dir, "..", "plans")
+    if os.path.exists(plans_path):
+        for filename in os.listdir(plans_path):
+            file_path = os.path.join(plans_path, filename)
+            if filename.endswith(".pdf") or filename.endswith(".docx"):
+                result = extract_plan(os.path.join(plans_path, filename), filename)
+                if not result.get("error"):
+                    plans_subjects.extend(result.get("subjects", []))
+
+    merged_subjects = data_merger.merge_subjects(programs_subjects, plans_subjects)
+    return merged_subjects
+
+
+def diff_plans(old_bytes, old_filename, new_bytes, new_filename, tryb=None):
+    """Extracts two versions of a study plan and diffs them (see plan_diff). Returns (content, status_code)."""
+    tables = []
+    for data, filename in ((old_bytes, old_filename), (new_bytes, new_filename)):
+        result = extract_plan(data, filename, tryb, columnar=True)
+        if result.get("error"):
+            return {"error": f"{filename}: {result['error']}"}, 500
+        tables.append(result["subjects"])
+    diff = plan_diff.diff_tables(*tables)
+    diff["old"] = old_filename
+    diff["new"] = new_filename
+    return diff, 200
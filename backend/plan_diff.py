@@ -0,0 +1,177 @@
+"""
+Diff of two study plan versions, e.g. last year's plan against the new one.
+
+Subjects are keyed by normalized name and semester; each side's ECTS + hour
+vector is hashed, and one pass over the new plan sorts subjects into added,
+removed, changed and unchanged.
+
+    python plan_diff.py old.pdf new.pdf [--tryb NS] [--json]
+    python plan_diff.py --all ../plans          # every pair of plans in a directory
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+import unicodedata
+
+from plan_table import HOUR_COLUMNS
+
+# Leading numbering of plan rows: "1. ", "3.1. ", "2.2A. "
+_NUMBERING_RE = re.compile(r"^\d+(?:\.\d+)*[a-z]?\.?\s+")
+_SPACES_RE = re.compile(r"\s+")
+# Letters NFKD does not decompose
+_TRANSLITERATE = str.maketrans({"ł": "l", "ß": "ss", "ø": "o"})
+
+_VECTOR_FIELDS = ("ects",) + HOUR_COLUMNS
+
+
+def normalize_name(name):
+    """Matching key for a subject name: no numbering, case, diacritics or extra spaces."""
+    name = _SPACES_RE.sub(" ", name or "").strip().lower()
+    name = _NUMBERING_RE.sub("", name).translate(_TRANSLITERATE)
+    name = "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c))
+    return name.strip(" .,;:-")
+
+
+def _keyed_rows(table):
+    """
+    Yields (key, index, vector_hash, vector) per subject. A name repeated within a
+    semester (e.g. a subject split over two rows) is told apart by its occurrence number.
+    """
+    vectors = [tuple(v) for v in zip(table.ects.tolist(), *table.hours.T.tolist())]
+    seen = {}
+    for index, (name, semester, vector) in enumerate(zip(table.name.tolist(), table.semester.tolist(), vectors)):
+        base = (normalize_name(name), semester)
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        yield base + (occurrence,), index, hash(vector), vector
+
+
+def _subject(table, index, vector):
+    return {
+        "nazwa_przedmiotu": table.name[index],
+        "semestr": table.semester[index],
+        "jednostka": table.unit[index],
+        **dict(zip(_VECTOR_FIELDS, vector)),
+    }
+
+
+def diff_tables(old, new):
+    """
+    Diffs two plan_table.PlanTable objects.
+
+    Returns {"added": [...], "removed": [...], "changed": [...], "unchanged": int,
+    "summary": {...}}. Changed entries list each differing field as {"old", "new"}.
+    """
+    old_rows = {key: (index, digest, vector) for key, index, digest, vector in _keyed_rows(old)}
+    added, changed = [], []
+    unchanged = 0
+
+    for key, index, digest, vector in _keyed_rows(new):
+        match = old_rows.pop(key, None)
+        if match is None:
+            added.append(_subject(new, index, vector))
+            continue
+        _, old_digest, old_vector = match
+        if old_digest == digest and old_vector == vector:
+            unchanged += 1
+            continue
+        changed.append({
+            "nazwa_przedmiotu": new.name[index],
+            "semestr": new.semester[index],
+            "changes": {
+                field: {"old": a, "new": b}
+                for field, a, b in zip(_VECTOR_FIELDS, old_vector, vector) if a != b
+            },
+        })
+
+    removed = [_subject(old, index, vector) for index, _, vector in old_rows.values()]
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": unchanged,
+        "summary": {
+            "added": len(added),
+            "removed": len(removed),
+            "changed": len(changed),
+            "unchanged": unchanged,
+        },
+    }
+
+
+def _extract(path, tryb=None):
+    import pipeline
+
+    result = pipeline.extract_plan(path, os.path.basename(path), tryb, columnar=True)
+    if result.get("error"):
+        raise RuntimeError(f"{path}: {result['error']}")
+    return result["subjects"]
+
+
+def diff_files(old_path, new_path, tryb=None):
+    """Extracts both plan files and diffs them."""
+    return diff_tables(_extract(old_path, tryb), _extract(new_path, tryb))
+
+
+def diff_directory(directory, tryb=None):
+    """
+    Diffs every pair of plans in a directory (each plan is extracted once).
+    Returns a list of {"old", "new", "summary"} dicts.
+    """
+    names = sorted(f for f in os.listdir(directory) if f.endswith(".pdf") or f.endswith(".docx"))
+    tables = {name: _extract(os.path.join(directory, name), tryb) for name in names}
+    return [
+        {"old": old, "new": new, "summary": diff_tables(tables[old], tables[new])["summary"]}
+        for old, new in itertools.combinations(names, 2)
+    ]
+
+
+def _format_vector(subject):
+    hours = ", ".join(f"{field} {subject[field]}" for field in HOUR_COLUMNS if subject[field])
+    return f"ECTS {subject['ects']}" + (f", {hours}" if hours else "")
+
+
+def _print_diff(diff):
+    for subject in diff["added"]:
+        print(f"+ {subject['nazwa_przedmiotu']} (sem. {subject['semestr'] or '-'}): {_format_vector(subject)}")
+    for subject in diff["removed"]:
+        print(f"- {subject['nazwa_przedmiotu']} (sem. {subject['semestr'] or '-'}): {_format_vector(subject)}")
+    for entry in diff["changed"]:
+        changes = ", ".join(f"{field} {c['old']} -> {c['new']}" for field, c in entry["changes"].items())
+        print(f"~ {entry['nazwa_przedmiotu']} (sem. {entry['semestr'] or '-'}): {changes}")
+    summary = diff["summary"]
+    print(f"{summary['added']} added, {summary['removed']} removed, "
+          f"{summary['changed']} changed, {summary['unchanged']} unchanged")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Compares two versions of a study plan.")
+    arg_parser.add_argument("old", nargs="?", help="previous plan (.pdf/.docx)")
+    arg_parser.add_argument("new", nargs="?", help="new plan (.pdf/.docx)")
+    arg_parser.add_argument("--all", metavar="DIR", help="diff every pair of plans in DIR")
+    arg_parser.add_argument("--tryb", help="override study mode (S/NS)")
+    arg_parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    args = arg_parser.parse_args()
+
+    started = time.time()
+    if args.all:
+        results = diff_directory(args.all, args.tryb)
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+        else:
+            for r in results:
+                s = r["summary"]
+                print(f"{r['old']}  ->  {r['new']}: +{s['added']} -{s['removed']} ~{s['changed']} ={s['unchanged']}")
+    elif args.old and args.new:
+        diff = diff_files(args.old, args.new, args.tryb)
+        if args.json:
+            print(json.dumps(diff, ensure_ascii=False, indent=2))
+        else:
+            _print_diff(diff)
+    else:
+        arg_parser.error("give two plan files, or --all DIR")
+    print(f"Done in {time.time() - started:.1f}s", file=sys.stderr)
@@ -1,11 +1,30 @@
+import os
 import re
+import time
 import logging
+import itertools
+from concurrent.futures import wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple, Optional
+
+from plan_table import PlanTable
+from data_extractor_v2 import normalize_level
 
 logger = logging.getLogger(__name__)
 
 # Minimum number of valid subjects to consider a parse successful
 MIN_SUBJECTS_THRESHOLD = 10
 
+# Snap tolerances tried, in order, when the default parse finds too few subjects:
+# 6 merges narrow phantom columns (17→11, 33→11), 10 is for very noisy PDFs,
+# 15 is the most aggressive merging.
+ADAPTIVE_SNAP_TOLERANCES = [
+    float(t) for t in os.environ.get("ADAPTIVE_SNAP_TOLERANCES", "6,10,15").split(",") if t.strip()
+]
+# Processes evaluating the candidates at the same time. 1 runs them one after
+# another over a single layout pass, which is cheapest when the first one succeeds.
+ADAPTIVE_REPARSE_WORKERS = max(1, int(os.environ.get("ADAPTIVE_REPARSE_WORKERS", "1")))
+
 
 def extract_plan_metadata(text):
     """
@@ -25,20 +44,12 @@ def extract_plan_metadata(text):
     # Detect degree level
     level_match = re.search(r"(?:studia|studiów)\s+(I+[°o]?|pierwszego stopnia|drugiego stopnia|II[°o]?)", text, re.IGNORECASE)
     if level_match:
-        raw = level_match.group(1).strip()
-        if "II" in raw or "drugiego" in raw.lower():
-            metadata["poziom"] = "studia drugiego stopnia"
-        else:
-            metadata["poziom"] = "studia pierwszego stopnia"
+        metadata["poziom"] = normalize_level(level_match.group(0))
     else:
         # Fallback: search for "I stopnia" / "II stopnia" pattern in title lines
         fallback = re.search(r"(I+)\s*stopnia", text, re.IGNORECASE)
         if fallback:
-            raw = fallback.group(1).strip()
-            if "II" in raw:
-                metadata["poziom"] = "studia drugiego stopnia"
-            else:
-                metadata["poziom"] = "studia pierwszego stopnia"
+            metadata["poziom"] = normalize_level(fallback.group(0))
 
     # Detect field of study
     kierunek_match = re.search(r"(?:kierunek|kierunku)[:\s]+([^\n]+)", text, re.IGNORECASE)
@@ -51,14 +62,88 @@ def extract_plan_metadata(text):
     return metadata
 
 
+_COLUMN_NUMBERS_RE = re.compile(r"^[\d\s]+$")
+_SEMESTER_RE = re.compile(r"semestr\s+\d+")
+_SEMESTER_NUMBER_RE = re.compile(r"semestr\s+(\d+)", re.IGNORECASE)
+_NON_DIGITS_RE = re.compile(r"[^0-9]")
+_LEADING_NUMBER_RE = re.compile(r"^\d+\.\s*")
+_WORD_RE = re.compile(r'[a-zA-ZąćęłńóśźżĄĆĘŁŃÓŚŹŻ]{2,}')
+_LETTER_RE = re.compile(r'[a-zA-ZąćęłńóśźżĄĆĘŁŃÓŚŹŻ]')
+_SUMMARY_PATTERNS = (
+    "semestr łącznie", "łącznie", "razem na studiach", "semestr razem",
+    "razem", "suma", "ogółem", "total"
+)
+
+
+class PlanRow:
+    """
+    A table row normalized once and shared by the row classifiers and the hour mapping.
+
+    cells: stripped cell strings ("" for empty cells); text/lower: the non-empty cells
+    joined with spaces; filled: number of non-empty cells. The per-cell isdigit()
+    flags (numeric), the compressed row (empty cells dropped, merged DOCX cells
+    counted once) and the parsed cell ints (int_at: _safe_int, so "30+10T" -> 40)
+    are computed on first use and cached, since most rows are classified before
+    they are needed.
+    """
+    __slots__ = ("cells", "text", "lower", "filled",
+                 "_spans", "_numeric", "_compressed", "_ints", "_compressed_ints")
+
+    def __init__(self, row, spans=None):
+        self.cells = cells = [str(c).strip() if c is not None else "" for c in row]
+        self.text = " ".join([str(c) for c in row if c]).strip()
+        self.lower = self.text.lower()
+        self.filled = len(cells) - cells.count("")
+        self._spans = spans
+        self._numeric = None
+        self._compressed = None
+        self._ints = None
+        self._compressed_ints = None
+
+    @property
+    def numeric(self):
+        if self._numeric is None:
+            self._numeric = [c.isdigit() for c in self.cells]
+        return self._numeric
+
+    @property
+    def compressed(self):
+        if self._compressed is None:
+            if self._spans:
+                # Merged DOCX cells count once, not once per grid column they span
+                self._compressed = [self.cells[i] for i, _, _ in self._spans if self.cells[i]]
+            else:
+                self._compressed = [c for c in self.cells if c]
+        return self._compressed
+
+    def int_at(self, i, compressed=False):
+        """Parsed int of cell i (of the compressed row if `compressed`); 0 for missing cells."""
+        if compressed:
+            cells = self.compressed
+            if self._compressed_ints is None:
+                self._compressed_ints = [None] * len(cells)
+            ints = self._compressed_ints
+        else:
+            cells = self.cells
+            if self._ints is None:
+                self._ints = [None] * len(cells)
+            ints = self._ints
+        if i is None or i >= len(cells):
+            return 0
+        value = ints[i]
+        if value is None:
+            c = cells[i]
+            value = ints[i] = (int(c) if c.isdigit() and c.isascii() else _safe_int(c)) if c else 0
+        return value
+
+
 def _is_header_row(row):
-    """Check if a row is a table header (contains column number markers like '1 2 3 4...')."""
-    row_text = " ".join([str(c) for c in row if c]).strip()
+    """Check if a PlanRow is a table header (contains column number markers like '1 2 3 4...')."""
     # Header rows with column numbers: "1 2 3 4 5 6 7 8 9 10 11"
-    if re.match(r"^[\d\s]+$", row_text) and len(row_text) > 5:
+    if _COLUMN_NUMBERS_RE.match(row.text) and len(row.text) > 5:
         return True
     # Rows with keywords like "Nazwa modułu", "ECTS", "Liczba godzin"
-    row_lower = row_text.lower()
+    row_lower = row.lower
     if "nazwa modułu" in row_lower or "liczba godzin" in row_lower or "łącznie" in row_lower:
         return True
     if "wykł" in row_lower or "zajęcia dydaktyczne" in row_lower:
@@ -71,28 +156,21 @@ def _is_summary_row(name):
     if not name:
         return True
     name_lower = name.lower().strip()
-    skip_patterns = [
-        "semestr łącznie", "łącznie", "razem na studiach", "semestr razem",
-        "razem", "suma", "ogółem", "total"
-    ]
-    return any(p in name_lower for p in skip_patterns)
+    return any(p in name_lower for p in _SUMMARY_PATTERNS)
 
 
 def _is_semester_marker(row):
-    """Check if a row marks a new semester."""
-    first_cell = str(row[0]).strip().lower() if row[0] else ""
-    row_text = " ".join([str(c) for c in row if c]).strip().lower()
-    if re.match(r"semestr\s+\d+", first_cell):
+    """Check if a PlanRow marks a new semester."""
+    if _SEMESTER_RE.match(row.cells[0].lower()):
         return True
-    if re.match(r"semestr\s+\d+", row_text) and sum(1 for c in row if c and str(c).strip()) <= 2:
+    if row.filled <= 2 and _SEMESTER_RE.match(row.lower):
         return True
     return False
 
 
 def _parse_semester_number(row):
-    """Extract semester number from a semester marker row."""
-    row_text = " ".join([str(c) for c in row if c]).strip()
-    match = re.search(r"semestr\s+(\d+)", row_text, re.IGNORECASE)
+    """Extract semester number from a semester marker PlanRow."""
+    match = _SEMESTER_NUMBER_RE.search(row.text)
     return match.group(1) if match else ""
 
 
@@ -103,11 +181,13 @@ def _safe_int(val):
     val = str(val).strip()
     if not val:
         return 0
+    if val.isascii() and val.isdigit():
+        return int(val)
     if '+' in val:
         parts = val.split('+')
         return sum(_safe_int(p) for p in parts)
     # Remove letter suffixes: "30A" -> "30", "15L" -> "15", "12P" -> "12"
-    digits = re.sub(r"[^0-9]", "", val)
+    digits = _NON_DIGITS_RE.sub("", val)
     return int(digits) if digits else 0
 
 
@@ -129,7 +209,7 @@ def _split_name(raw_name):
     if not raw_name:
         return "", ""
     # Remove leading number like "1. " or "12. "
-    name = re.sub(r"^\d+\.\s*", "", raw_name).strip()
+    name = _LEADING_NUMBER_RE.sub("", raw_name).strip()
     # Remove newlines
     name = name.replace("\n", " ").strip()
 
@@ -158,7 +238,7 @@ def _auto_detect_columns(row, compressed_row):
     for i, cell in enumerate(row):
         val = str(cell).strip() if cell else ""
         # Name: has letters and is reasonably long, or is a numbered item like "1. Name"
-        if re.search(r'[a-zA-ZąćęłńóśźżĄĆĘŁŃÓŚŹŻ]{2,}', val) and len(val) > 3:
+        if _WORD_RE.search(val) and len(val) > 3:
             name_idx = i
             break
     
@@ -171,10 +251,10 @@ def _auto_detect_columns(row, compressed_row):
     
     for i in range(name_idx + 1, len(row)):
         val = str(row[i]).strip() if row[i] else ""
-        digits = re.sub(r'[^0-9]', '', val)
+        digits = _NON_DIGITS_RE.sub('', val)
         if digits and digits.isdigit():
             numeric_cols.append((i, int(digits)))
-        elif val and re.search(r'[a-zA-ZąćęłńóśźżĄĆĘŁŃÓŚŹŻ]', val):
+        elif val and _LETTER_RE.search(val):
             text_cols.append((i, val))
     
     if len(numeric_cols) < 2:
@@ -213,41 +293,255 @@ def _auto_detect_columns(row, compressed_row):
     }
 
 
-def extract_plan_subjects(pages_data, metadata=None):
+class ColumnLayout(NamedTuple):
+    """
+    Immutable column positions of one plan table layout.
+
+    Positions index the pdfplumber row, or - when `compressed` is set - the row with
+    its empty cells dropped. None means the layout has no such column.
+    """
+    name: str
+    name_col: Optional[int]
+    ects_col: Optional[int]
+    total_col: Optional[int]
+    wyklad_col: Optional[int]
+    cwicz_col: Optional[int]
+    inne_col: Optional[int]
+    konsult_col: Optional[int]
+    praca_wlasna_col: Optional[int]
+    unit_col: Optional[int]
+    typ_col: Optional[int] = None
+    compressed: bool = False
+
+    def read(self, row):
+        """Returns (name, ects, hours, unit) of a PlanRow; hours are the six parsed hour columns."""
+        compressed = self.compressed
+        cells = row.compressed if compressed else row.cells
+        n = len(cells)
+        name_col, ects_col, unit_col = self.name_col, self.ects_col, self.unit_col
+        return (
+            cells[name_col] if name_col is not None and name_col < n else "",
+            cells[ects_col] if ects_col is not None and ects_col < n else "",
+            [row.int_at(i, compressed) for i in self[3:9]],
+            cells[unit_col] if unit_col is not None and unit_col < n else "",
+        )
+
+
+# Known layouts:          name  ects total wykł  ćw  inne kons  pw  unit  typ
+_LAYOUTS = {
+    # "OŚ I stopień" and similar: Name, ECTS, Total, Wykład, Ćwiczenia, Inne, Konsultacje,
+    # Praca własna, Egz/Zal, Typ, Jednostka (after dropping pdfplumber's empty joining columns)
+    "compressed_11": ColumnLayout("compressed_11", 0, 1, 2, 3, 4, 5, 6, 7, 10, 9, compressed=True),
+    # Facultative blocks, often missing formy_zaliczenia
+    "compressed_10": ColumnLayout("compressed_10", 0, 1, 2, 3, 4, 5, 6, 7, 9, 8, compressed=True),
+    # Niestacjonarne-style, wider table; exercise type embedded in the ćwiczenia value
+    "width_17": ColumnLayout("width_17", 0, 1, 2, 3, 6, 9, 12, 13, 16),
+    # Landscape: col0=nr, col1=name, col2=ECTS, col3=total, col4=wykł, col5=ćw, col6=typ,
+    # col7=inne1, col8=(empty), col9=konsult, col10=praca_własna, col11=forma, col12=typ_grupy, col13=jednostka
+    "width_14_numbered": ColumnLayout("width_14_numbered", 1, 2, 3, 4, 5, 7, 9, 10, 13, 6),
+    "width_14": ColumnLayout("width_14", 0, 2, 3, 4, 5, 7, 9, 10, 13, 6),
+    # II stopień portrait: col0=nr, col1=name, col2=ECTS, col3=total, col4=wykł, col5=ćw,
+    # col6=typ_ćw, col7=inne1(empty), col8=konsult, col9=praca_własna, col10=forma, col11=typ_grupy, col12=jednostka
+    "width_13_numbered": ColumnLayout("width_13_numbered", 1, 2, 3, 4, 5, 7, 8, 9, 12, 6),
+    "width_13": ColumnLayout("width_13", 0, 1, 2, 3, 4, 6, 7, 8, 11, 5),
+    # PDF-derived with a row number: col0=nr, col1=Name, col2=ECTS, col3=Total, col4=Lectures,
+    # col5=Classes, col6=Others, col7=SelfWork, col8=Assessment, col9=GroupType, col10=Unit
+    "width_11_numbered": ColumnLayout("width_11_numbered", 1, 2, 3, 4, 5, 6, None, 7, 10, 8),
+    # DOCX style (no row number)
+    "width_11": ColumnLayout("width_11", 0, 1, 2, 3, 4, 5, 6, 7, 10, 8),
+    # English-language plans like Geoinformation: Name, ECTS, Total, Lectures, PractClasses,
+    # Others, ContactHours, ESW/SelfWork, Assessment, Unit
+    "width_10": ColumnLayout("width_10", 0, 1, 2, 3, 4, 5, 6, 7, 9),
+}
+
+
+def _is_numbered_compressed_11(row):
+    compressed = row.compressed
+    return len(compressed) == 11 and compressed[0].split('.')[0].isdigit() and compressed[1].isdigit()
+
+
+def _is_fakultet_block_10(row):
+    compressed = row.compressed
+    return len(compressed) == 10 and "fakultet" in compressed[0].lower()
+
+
+def _starts_with_number(row):
+    return row.cells[0].replace(".", "").isdigit()
+
+
+def _is_numbered_11(row):
+    return row.cells[0].replace(".", "").isdigit() and not row.numeric[1] and row.numeric[2]
+
+
+# Row-level layouts recognised in any table, checked before the table's own layout
+# on rows with exactly that many non-empty cells: (compressed cell count, guard, layout)
+_ROW_OVERRIDES = (
+    (11, _is_numbered_compressed_11, "compressed_11"),
+    (10, _is_fakultet_block_10, "compressed_10"),
+)
+
+# Table layouts by table width, first match wins: (min cols, max cols or None, variants).
+# Each variant is (row guard or None, layout); a table with no match is auto-detected per row.
+_WIDTH_DISPATCH = (
+    (17, None, ((None, "width_17"),)),
+    (14, None, ((_starts_with_number, "width_14_numbered"), (None, "width_14"))),
+    (13, 13, ((_starts_with_number, "width_13_numbered"), (None, "width_13"))),
+    (11, 11, ((_is_numbered_11, "width_11_numbered"), (None, "width_11"))),
+    (10, 10, ((None, "width_10"),)),
+)
+
+
+class _TableLayout(NamedTuple):
+    """Layout of one table, compiled once before its rows are read."""
+    fixed: Optional[ColumnLayout]  # the table's own layout, when its width needs no row guard
+    overrides: dict  # compressed row width -> ((guard, layout), ...) row-level layouts possible in this table
+    variants: tuple  # (guard, layout) from the width dispatch; empty = auto-detect
+
+    def select(self, row):
+        """The layout of one row. Returns None for unrecognizable rows."""
+        if self.overrides:
+            for guard, layout in self.overrides.get(len(row.compressed), ()):
+                if guard(row):
+                    return layout
+        if self.fixed is not None:
+            return self.fixed
+        for guard, layout in self.variants:
+            if guard is None or guard(row):
+                return layout
+        # Unknown column count — try auto-detection based on content
+        detected = _auto_detect_columns(row.cells, row.compressed)
+        return ColumnLayout("auto", **detected) if detected else None
+
+
+def _compile_table_layout(table, num_cols):
+    """Selects the table's layout from its width; row-level checks are kept only where they can match."""
+    variants = ()
+    for min_cols, max_cols, candidates in _WIDTH_DISPATCH:
+        if num_cols >= min_cols and (max_cols is None or num_cols <= max_cols):
+            variants = tuple((guard, _LAYOUTS[name]) for guard, name in candidates)
+            break
+
+    # A row can only compress to N cells if the table has at least N columns; rows of any
+    # other compressed width go straight to the table's own layout
+    max_cells = max((len(row) for row in table if row), default=0)
+    overrides = {}
+    for cells, guard, name in _ROW_OVERRIDES:
+        if cells <= max_cells:
+            overrides[cells] = overrides.get(cells, ()) + ((guard, _LAYOUTS[name]),)
+
+    fixed = variants[0][1] if len(variants) == 1 and variants[0][0] is None else None
+    return _TableLayout(fixed, overrides, variants)
+
+
+_SUBJECT_MARKER_RE = re.compile(r"(\d+[\.\w]+[\.\s]+)")
+
+
+def _get_subject_names(full_name):
+    """Splits combined subject names into a list of separate subject strings."""
+    # Use regex to find markers like "1.3.1. ", "2.2A. ", "2. Fakultet"
+    markers = list(_SUBJECT_MARKER_RE.finditer(full_name))
+    if len(markers) <= 1:
+        return [full_name]
+
+    # Shared prefix check
+    prefix = ""
+    if markers[0].start() > 0:
+        prefix = full_name[:markers[0].start()].strip()
+
+    results = []
+    for i in range(len(markers)):
+        start_idx = markers[i].start()
+        end_idx = markers[i+1].start() if i+1 < len(markers) else len(full_name)
+        item = full_name[start_idx:end_idx].strip()
+        if prefix:
+            results.append(f"{prefix} {item}".strip())
+        else:
+            results.append(item)
+    return results
+
+
+def extract_plan_subjects(pages_data, metadata=None, layout_counts=None):
     """
     Extracts per-subject hour data from plan PDF tables.
     
     Args:
-        pages_data: list of {"text": str, "tables": list} from file_parser.parse_pdf
+        pages_data: list of {"text": str, "tables": list} from file_parser.parse_pdf,
+                    or a page stream from file_parser.iter_pdf_pages
         metadata: optional pre-computed metadata dict
+        layout_counts: optional dict, incremented per subject row with the
+                       name of the column layout it was read with
     
     Returns: list of subject dicts with hour fields mapped to template tags.
     """
+    return extract_plan_table(pages_data, metadata, layout_counts).to_subjects()
+
+
+def extract_plan_table(pages_data, metadata=None, layout_counts=None):
+    """Same as extract_plan_subjects, but returns the columnar PlanTable."""
     if metadata is None:
-        # Try to get metadata from first page text
-        all_text = " ".join([p.get("text", "") for p in pages_data[:2]])
+        # Try to get metadata from first page text (without consuming a page stream)
+        pages_iter = iter(pages_data)
+        head = list(itertools.islice(pages_iter, 2))
+        all_text = " ".join([p.get("text", "") for p in head])
         metadata = extract_plan_metadata(all_text)
+        pages_data = itertools.chain(head, pages_iter)
 
+    names, names_en, ects_texts, semesters, units, hour_rows = [], [], [], [], [], []
+    for page_columns in _iter_page_columns(pages_data, layout_counts):
+        for column, values in zip((names, names_en, ects_texts, semesters, units, hour_rows), page_columns):
+            column.extend(values)
+
+    # Hours (total, wykład, ćwiczenia, inne, konsultacje, praca własna) go to the S or NS template tags
+    return PlanTable.from_rows(names, names_en, ects_texts, semesters, units, hour_rows, _plan_mode(metadata))
+
+
+def iter_plan_subjects(pages_data, metadata):
+    """
+    Generator form of extract_plan_subjects for streaming responses: yields each
+    page's subject dicts as soon as that page has been read from `pages_data`
+    (typically a file_parser.stream_pdf page stream).
+    """
+    mode = _plan_mode(metadata)
+    for page_columns in _iter_page_columns(pages_data):
+        if page_columns[0]:
+            yield from PlanTable.from_rows(*page_columns, mode).to_subjects()
+
+
+def _plan_mode(metadata):
     # Use override_tryb if provided, otherwise use metadata
     tryb = metadata.get("tryb", "S")
     if metadata.get("override_tryb"):
         tryb = metadata["override_tryb"]
+    return "NS" if tryb == "NS" else "S"
 
-    subjects = []
+
+def _iter_page_columns(pages_data, layout_counts=None):
+    """
+    Yields, per page, the (names, names_en, ects_texts, semesters, units, hour_rows)
+    column lists of the subjects read from it. The semester carries over pages.
+    """
     current_semester = ""
     past_header = False  # Track if we've seen the header rows
 
     for page_data in pages_data:
-        for table in page_data.get("tables", []):
+        names, names_en, ects_texts, semesters, units, hour_rows = [], [], [], [], [], []
+        page_spans = page_data.get("table_spans") or []
+        for table_idx, table in enumerate(page_data.get("tables", [])):
             if not table:
                 continue
 
             num_cols = len(table[0]) if table else 0
+            # DOCX tables carry merged-cell spans: one entry per real cell in each row
+            table_spans = page_spans[table_idx] if table_idx < len(page_spans) else None
+            table_layout = _compile_table_layout(table, num_cols)
 
-            for row in table:
+            for row_idx, row in enumerate(table):
                 if not row or len(row) < 3:
                     continue
 
+                # Normalize once; the compressed row drops pdfplumber's empty joining columns
+                row = PlanRow(row, table_spans[row_idx] if table_spans and row_idx < len(table_spans) else None)
+
                 # Skip header rows
                 if _is_header_row(row):
                     past_header = True
@@ -258,338 +552,235 @@ def extract_plan_subjects(pages_data, metadata=None):
                     current_semester = _parse_semester_number(row)
                     continue
 
-                # Clean up and compress the row to handle empty joining columns from pdfplumber
-                raw_row = [str(c) if c is not None else "" for c in row]
-                compressed_row = [c.strip() for c in raw_row if c.strip()]
-                num_compressed = len(compressed_row)
-
-                # Determine column layout based on table width or compressed width
-                name_col = None
-                ects_col = None
-                total_col = None
-                wyklad_col = None
-                cwicz_col = None
-                typ_col = None
-                inne_col = None
-                konsult_col = None
-                praca_wlasna_col = None
-                unit_col = None
-                
-                # Check compressed row layout (for "OŚ I stopień" and similar)
-                if num_compressed == 11 and compressed_row[0].split('.')[0].isdigit() and compressed_row[1].isdigit():
-                    # 11-column compressed layout
-                    # Format: Name, ECTS, Total, Wykład, Ćwiczenia, Inne, Konsultacje, Praca własna, Egz/Zal, Typ, Jednostka
-                    name_col = "compressed:0"
-                    ects_col = "compressed:1"
-                    total_col = "compressed:2"
-                    wyklad_col = "compressed:3"
-                    cwicz_col = "compressed:4"
-                    inne_col = "compressed:5"
-                    konsult_col = "compressed:6"
-                    praca_wlasna_col = "compressed:7"
-                    typ_col = "compressed:9"
-                    unit_col = "compressed:10"
-                elif num_compressed == 10 and "fakultet" in compressed_row[0].lower():
-                    # 10-col compressed for facultative blocks (missing some columns like formy_zaliczenia often)
-                     name_col = "compressed:0"
-                     ects_col = "compressed:1"
-                     total_col = "compressed:2"
-                     wyklad_col = "compressed:3"
-                     cwicz_col = "compressed:4"
-                     inne_col = "compressed:5"
-                     konsult_col = "compressed:6"
-                     praca_wlasna_col = "compressed:7"
-                     typ_col = "compressed:8"
-                     unit_col = "compressed:9"
-                elif num_cols >= 17:
-                    # 17-column layout (niestacjonarne-style, wider table)
-                    name_col = 0
-                    ects_col = 1
-                    total_col = 2
-                    wyklad_col = 3
-                    cwicz_col = 6
-                    typ_col = None  # Exercise type embedded in cwicz value
-                    inne_col = 9
-                    konsult_col = 12
-                    praca_wlasna_col = 13
-                    unit_col = 16
-                elif num_cols >= 14:
-                    # 14-column layout (stacjonarne/niestacjonarne, landscape)
-                    # col0=nr, col1=name, col2=ECTS, col3=total, col4=wykł, col5=ćw,
-                    # col6=typ, col7=inne1, col8=(empty), col9=konsult, col10=praca_własna,
-                    # col11=forma, col12=typ_grupy, col13=jednostka
-                    name_col = 1 if (row[0] and str(row[0]).strip().replace(".", "").isdigit()) else 0
-                    if name_col == 1:
-                        ects_col = 2
-                        total_col = 3
-                        wyklad_col = 4
-                        cwicz_col = 5
-                        typ_col = 6
-                        inne_col = 7
-                        konsult_col = 9
-                        praca_wlasna_col = 10
-                        unit_col = 13
-                    else:
-                        ects_col = 2
-                        total_col = 3
-                        wyklad_col = 4
-                        cwicz_col = 5
-                        typ_col = 6
-                        inne_col = 7
-                        konsult_col = 9
-                        praca_wlasna_col = 10
-                        unit_col = 13
-                elif num_cols == 13:
-                    # 13-column layout — II stopień portrait (vertical page)
-                    # col0=nr, col1=name, col2=ECTS, col3=total, col4=wykł, col5=ćw,
-                    # col6=typ_ćw, col7=inne1(empty), col8=konsult, col9=praca_własna,
-                    # col10=forma, col11=typ_grupy, col12=jednostka
-                    name_col = 1 if (row[0] and str(row[0]).strip().replace(".", "").isdigit()) else 0
-                    if name_col == 1:
-                        ects_col = 2
-                        total_col = 3
-                        wyklad_col = 4
-                        cwicz_col = 5
-                        typ_col = 6
-                        inne_col = 7
-                        konsult_col = 8
-                        praca_wlasna_col = 9
-                        unit_col = 12
-                    else:
-                        ects_col = 1
-                        total_col = 2
-                        wyklad_col = 3
-                        cwicz_col = 4
-                        typ_col = 5
-                        inne_col = 6
-                        konsult_col = 7
-                        praca_wlasna_col = 8
-                        unit_col = 11
-                elif num_cols == 11:
-                    # 11-column layout (can be DOCX direct or PDF-derived with a row number column)
-                    is_numbered = False
-                    first_cell = str(row[0]).strip().replace(".", "")
-                    second_cell = str(row[1]).strip()
-                    third_cell = str(row[2]).strip()
-                    if first_cell.isdigit() and not second_cell.isdigit() and third_cell.isdigit():
-                        is_numbered = True
-
-                    if is_numbered:
-                        # col0=nr, col1=Name, col2=ECTS, col3=Total, col4=Lectures, col5=Classes,
-                        # col6=Others, col7=SelfWork, col8=Assessment, col9=GroupType, col10=Unit
-                        name_col = 1
-                        ects_col = 2
-                        total_col = 3
-                        wyklad_col = 4
-                        cwicz_col = 5
-                        inne_col = 6
-                        konsult_col = None
-                        praca_wlasna_col = 7
-                        typ_col = 8
-                        unit_col = 10
-                    else:
-                        # DOCX style (no row number)
-                        name_col = 0
-                        ects_col = 1
-                        total_col = 2
-                        wyklad_col = 3
-                        cwicz_col = 4
-                        inne_col = 5
-                        konsult_col = 6
-                        praca_wlasna_col = 7
-                        typ_col = 8
-                        unit_col = 10
-                elif num_cols == 10:
-                    # 10-column layout (e.g. English-language plans like Geoinformation)
-                    # col0=Name, col1=ECTS, col2=Total, col3=Lectures, col4=PractClasses,
-                    # col5=Others, col6=ContactHours, col7=ESW/SelfWork, col8=Assessment, col9=Unit
-                    name_col = 0
-                    ects_col = 1
-                    total_col = 2
-                    wyklad_col = 3
-                    cwicz_col = 4
-                    inne_col = 5
-                    konsult_col = 6
-                    praca_wlasna_col = 7
-                    typ_col = None
-                    unit_col = 9
-                else:
-                    # Unknown column count — try auto-detection based on content
-                    detected = _auto_detect_columns(raw_row, compressed_row)
-                    if detected:
-                        name_col = detected["name_col"]
-                        ects_col = detected["ects_col"]
-                        total_col = detected["total_col"]
-                        wyklad_col = detected["wyklad_col"]
-                        cwicz_col = detected["cwicz_col"]
-                        inne_col = detected["inne_col"]
-                        konsult_col = detected["konsult_col"]
-                        praca_wlasna_col = detected["praca_wlasna_col"]
-                        unit_col = detected["unit_col"]
-                        typ_col = detected["typ_col"]
-                    else:
-                        continue  # Truly unrecognizable row
-                    
-                def get_val(col_idx):
-                    if col_idx is None:
-                        return ""
-                    if isinstance(col_idx, str) and col_idx.startswith("compressed:"):
-                        idx = int(col_idx.split(":")[1])
-                        return compressed_row[idx] if idx < len(compressed_row) else ""
-                    return str(row[col_idx]).strip() if col_idx < len(row) and row[col_idx] else ""
-
-                # Get subject name
-                raw_name = get_val(name_col)
+                layout = table_layout.select(row)
+                if layout is None:
+                    continue  # Truly unrecognizable row
 
+                raw_name, ects_val, hours, unit_val = layout.read(row)
 
                 # Must have at least ECTS to be a valid subject row
-                ects_val = get_val(ects_col)
                 if not ects_val or not ects_val.isdigit():
                     continue
-
-                # Parse hours
-                total_hours = _safe_int(get_val(total_col))
-                wyklad_hours = _safe_int(get_val(wyklad_col))
-                cwicz_hours = _safe_int(get_val(cwicz_col))
-                inne_hours = _safe_int(get_val(inne_col))
-                konsult_hours = _safe_int(get_val(konsult_col))
-                selfwork_hours = _safe_int(get_val(praca_wlasna_col))
-
-                # Unit
-                unit_val = get_val(unit_col)
-
-                def _get_subject_names(full_name):
-                    """Splits combined subject names into a list of separate subject strings."""
-                    # Use regex to find markers like "1.3.1. ", "2.2A. ", "2. Fakultet"
-                    markers = list(re.finditer(r"(\d+[\.\w]+[\.\s]+)", full_name))
-                    if len(markers) <= 1:
-                        return [full_name]
-                    
-                    # Shared prefix check
-                    prefix = ""
-                    if markers[0].start() > 0:
-                        prefix = full_name[:markers[0].start()].strip()
-                    
-                    results = []
-                    for i in range(len(markers)):
-                        start_idx = markers[i].start()
-                        end_idx = markers[i+1].start() if i+1 < len(markers) else len(full_name)
-                        item = full_name[start_idx:end_idx].strip()
-                        if prefix:
-                            results.append(f"{prefix} {item}".strip())
-                        else:
-                            results.append(item)
-                    return results
+                if layout_counts is not None:
+                    layout_counts[layout.name] = layout_counts.get(layout.name, 0) + 1
 
                 # Get all individual subjects from this row
-                raw_names = _get_subject_names(raw_name)
-
-                for name_entry in raw_names:
+                for name_entry in _get_subject_names(raw_name):
                     if not name_entry or _is_summary_row(name_entry):
                         continue
                     if name_entry.replace(".", "").strip().isdigit():
                         continue
                     
                     name_pl, name_en = _split_name(name_entry)
+                    names.append(name_pl)
+                    names_en.append(name_en)
+                    ects_texts.append(ects_val)
+                    semesters.append(current_semester)
+                    units.append(unit_val)
+                    hour_rows.append(hours)
+        yield names, names_en, ects_texts, semesters, units, hour_rows
 
-                    # Build subject dict
-                    subject = {
-                        "nazwa_przedmiotu": name_pl,
-                        "nazwa_angielska": name_en,
-                        "ects": ects_val,
-                        "semestr": current_semester,
-                        "jednostka": unit_val,
-                    }
-
-                    # Map hours to template tags
-                    if tryb == "NS":
-                        subject["numTNS"] = str(total_hours) if total_hours else ""
-                        subject["numWNS"] = str(wyklad_hours) if wyklad_hours else ""
-                        subject["numCNS"] = str(cwicz_hours) if cwicz_hours else ""
-                        subject["numInNS"] = str(inne_hours) if inne_hours else ""
-                        subject["numKNS"] = str(konsult_hours) if konsult_hours else ""
-                        subject["numPwNS"] = str(selfwork_hours) if selfwork_hours else ""
-                    else:
-                        subject["numTS"] = str(total_hours) if total_hours else ""
-                        subject["numWS"] = str(wyklad_hours) if wyklad_hours else ""
-                        subject["numCS"] = str(cwicz_hours) if cwicz_hours else ""
-                        subject["numInS"] = str(inne_hours) if inne_hours else ""
-                        subject["numKS"] = str(konsult_hours) if konsult_hours else ""
-                        subject["numPwS"] = str(selfwork_hours) if selfwork_hours else ""
-
-                    subjects.append(subject)
-
-    return subjects
-
-
-def extract_full_plan(parsed_pdf, override_tryb=None, file_path=None):
-    """
-    Main entry point: takes the output of file_parser.parse_pdf() and returns
-    a dict with metadata and subjects.
-    
-    If file_path is provided and the initial parse yields fewer than
-    MIN_SUBJECTS_THRESHOLD subjects, the PDF will be re-parsed with
-    adjusted pdfplumber settings (snap_tolerance=6) which merges
-    narrow phantom columns, normalizing diverse layouts to ~11 cols.
-    """
+
+def _plan_pages(parsed_pdf):
+    """Per-page data of a parse result; .docx results (no pages) become a single page."""
     pages = parsed_pdf.get("pages")
     if pages is None:
-        pages = [{"text": parsed_pdf.get("content", ""), "tables": parsed_pdf.get("tables", [])}]
-    text = parsed_pdf.get("content", "")
+        pages = [{
+            "text": parsed_pdf.get("content", ""),
+            "tables": parsed_pdf.get("tables", []),
+            "table_spans": parsed_pdf.get("table_spans"),
+        }]
+    return pages
 
-    metadata = extract_plan_metadata(text)
-    if override_tryb:
-        metadata["override_tryb"] = override_tryb
 
-    # Phase 1: try with default-parsed data
-    subjects = extract_plan_subjects(pages, metadata)
-    
-    # Phase 2: if too few subjects found and we have a file path, try adaptive reparsing
-    if len(subjects) < MIN_SUBJECTS_THRESHOLD and file_path:
-        import file_parser
-        
-        adaptive_settings = [
-            # snap_tolerance=6 merges narrow phantom columns (17→11, 33→11)
-            {"snap_x_tolerance": 6, "snap_y_tolerance": 6},
-            # Higher snap for very noisy PDFs
-            {"snap_x_tolerance": 10, "snap_y_tolerance": 10},
-            # Even more aggressive merging
-            {"snap_x_tolerance": 15, "snap_y_tolerance": 15},
-        ]
-        
-        best_subjects = subjects
-        
-        for settings in adaptive_settings:
+def _candidate_settings(tolerances=None):
+    """Candidate pdfplumber table_settings, one per snap tolerance."""
+    settings = []
+    for t in (ADAPTIVE_SNAP_TOLERANCES if tolerances is None else tolerances):
+        t = int(t) if float(t).is_integer() else float(t)
+        settings.append({"snap_x_tolerance": t, "snap_y_tolerance": t})
+    return settings
+
+
+def adaptive_reparse(file_path, parsed_pdf, metadata, subjects, candidate_settings=None, workers=None,
+                     stats=None):
+    """
+    Phase 2 of extract_full_plan: re-parses the PDF with coarser snap tolerances
+    and returns the best PlanTable found (or `subjects`, the initial PlanTable,
+    if none is better).
+
+    Candidates are tried in order (candidate_settings, default: ADAPTIVE_SNAP_TOLERANCES)
+    and the first one reaching MIN_SUBJECTS_THRESHOLD ends the search; otherwise the
+    one with the most subjects wins. With workers > 1 (default: ADAPTIVE_REPARSE_WORKERS)
+    the candidates run concurrently and the same candidate is chosen.
+
+    If a candidate replaces `subjects`, its settings and layout counts are stored
+    in the optional `stats` dict ("table_settings", "layouts").
+    """
+    if candidate_settings is None:
+        candidate_settings = _candidate_settings()
+    if workers is None:
+        workers = ADAPTIVE_REPARSE_WORKERS
+
+    if workers > 1 and len(candidate_settings) > 1:
+        try:
+            return _adaptive_reparse_concurrent(file_path, metadata, subjects, candidate_settings, workers, stats)
+        except BrokenProcessPool:
+            logger.error("Parse pool broken during the adaptive reparse, trying the candidates serially")
+
+    import file_parser
+
+    best_subjects = subjects
+
+    # One layout pass shared by all candidates; text is reused from the initial parse
+    page_texts = [p.get("text", "") for p in parsed_pdf["pages"]] if parsed_pdf.get("pages") else None
+    candidates = file_parser.parse_pdf_candidates(file_path, candidate_settings, page_texts=page_texts)
+    try:
+        started = time.perf_counter()
+        for settings, reparsed in candidates:
             try:
-                reparsed = file_parser.parse_pdf_with_settings(file_path, table_settings=settings)
                 if reparsed.get("error"):
                     continue
-                
+
                 reparsed_pages = reparsed.get("pages")
                 if reparsed_pages is None:
                     reparsed_pages = [{"text": reparsed.get("content", ""), "tables": reparsed.get("tables", [])}]
-                
-                candidate = extract_plan_subjects(reparsed_pages, metadata)
-                
+
+                layouts = {}
+                candidate = extract_plan_table(reparsed_pages, metadata, layouts)
+
                 logger.info(
                     f"Adaptive reparse with {settings}: found {len(candidate)} subjects "
-                    f"(previous best: {len(best_subjects)})"
+                    f"in {time.perf_counter() - started:.2f}s (previous best: {len(best_subjects)})"
                 )
-                
+
                 if len(candidate) > len(best_subjects):
                     best_subjects = candidate
-                
+                    if stats is not None:
+                        stats.update(table_settings=settings, layouts=layouts)
+
                 # Early stop if we found enough subjects
                 if len(best_subjects) >= MIN_SUBJECTS_THRESHOLD:
                     break
-                    
+
+            except Exception as e:
+                logger.warning(f"Adaptive reparse failed with {settings}: {e}")
+                continue
+            finally:
+                started = time.perf_counter()
+    finally:
+        candidates.close()
+
+    return best_subjects
+
+
+def _evaluate_candidate(file_path, settings, metadata):
+    """Process-pool task: parses the PDF with one candidate's settings and extracts its subjects."""
+    import file_parser
+
+    started = time.perf_counter()
+    reparsed = file_parser.parse_pdf_with_settings(file_path, settings, workers=1, prefilter=False)
+    if reparsed.get("error"):
+        raise RuntimeError(reparsed["error"])
+    layouts = {}
+    subjects = extract_plan_table(_plan_pages(reparsed), metadata, layouts)
+    return subjects, layouts, time.perf_counter() - started
+
+
+def _adaptive_reparse_concurrent(file_path, metadata, subjects, candidate_settings, workers, stats=None):
+    """
+    Runs every candidate in the shared parse pool. Once candidate k reaches
+    MIN_SUBJECTS_THRESHOLD, candidates after k are cancelled (or, if already
+    running, no longer waited for); earlier ones are still awaited so the
+    result matches trying them in order.
+    """
+    import file_parser
+
+    pool = file_parser.get_pool(min(workers, len(candidate_settings)))
+    try:
+        futures = {
+            pool.submit(_evaluate_candidate, file_path, settings, metadata): index
+            for index, settings in enumerate(candidate_settings)
+        }
+    except BrokenProcessPool:
+        file_parser.reset_pool(pool)
+        raise
+    results = {}
+    cutoff = len(candidate_settings)  # index of the first candidate that reached the threshold
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = futures[future]
+            settings = candidate_settings[index]
+            try:
+                candidate, layouts, elapsed = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed): the pool is unusable for every candidate
+                file_parser.reset_pool(pool)
+                raise
             except Exception as e:
                 logger.warning(f"Adaptive reparse failed with {settings}: {e}")
                 continue
-        
-        subjects = best_subjects
+            logger.info(f"Adaptive reparse with {settings}: found {len(candidate)} subjects in {elapsed:.2f}s")
+            results[index] = candidate, layouts
+            if len(candidate) >= MIN_SUBJECTS_THRESHOLD:
+                cutoff = min(cutoff, index)
+
+        for future in list(pending):
+            if futures[future] > cutoff:
+                if not future.cancel():
+                    logger.info(f"Adaptive reparse with {candidate_settings[futures[future]]} no longer needed")
+                pending.discard(future)
+
+    best_subjects = subjects
+    for index in sorted(results):
+        if index > cutoff:
+            break
+        candidate, layouts = results[index]
+        if len(candidate) > len(best_subjects):
+            best_subjects = candidate
+            if stats is not None:
+                stats.update(table_settings=candidate_settings[index], layouts=layouts)
+    return best_subjects
+
+
+def extract_full_plan(parsed_pdf, override_tryb=None, file_path=None, stats=None, columnar=False):
+    """
+    Main entry point: takes the output of file_parser.parse_pdf() and returns
+    a dict with metadata and subjects.
+    
+    If file_path is provided and the initial parse yields fewer than
+    MIN_SUBJECTS_THRESHOLD subjects, the PDF will be re-parsed with
+    adjusted pdfplumber settings (snap_tolerance=6) which merges
+    narrow phantom columns, normalizing diverse layouts to ~11 cols.
+    file_path may also be the PDF bytes (e.g. an upload parsed from memory).
+
+    If `stats` (a dict) is given, it receives "layouts" - subject rows read with
+    each column layout - and, when the adaptive reparse replaced the initial
+    result, the winning "table_settings" (used by layout_profiles).
+
+    With columnar=True, "subjects" is a plan_table.PlanTable instead of the
+    list of dicts, for bulk analytics over many plans.
+    """
+    pages = _plan_pages(parsed_pdf)
+    text = parsed_pdf.get("content", "")
+
+    metadata = extract_plan_metadata(text)
+    if override_tryb:
+        metadata["override_tryb"] = override_tryb
+
+    # Phase 1: try with default-parsed data
+    layouts = {}
+    subjects = extract_plan_table(pages, metadata, layouts)
+    if stats is not None:
+        stats["layouts"] = layouts
+    
+    # Phase 2: if too few subjects found and we have a file path, try adaptive reparsing
+    if len(subjects) < MIN_SUBJECTS_THRESHOLD and file_path:
+        subjects = adaptive_reparse(file_path, parsed_pdf, metadata, subjects, stats=stats)
 
     return {
         "metadata": metadata,
-        "subjects": subjects
+        "subjects": subjects if columnar else subjects.to_subjects()
     }
@@ -0,0 +1,152 @@
+"""
+Columnar (NumPy-backed) form of the subjects extracted from a study plan.
+
+plan_parser collects subject rows straight into a PlanTable; the per-subject
+dict list used by the API (nazwa_przedmiotu, ects, numTS/numWNS, ...) is derived
+from it on demand with to_subjects(). Bulk analytics over many plans can stay
+on the arrays (concat, hour_totals, by_tag) without building per-row objects.
+"""
+import numpy as np
+
+# Hour columns, in the order of ColumnLayout's hour fields
+HOUR_COLUMNS = ("total", "wyklad", "cwiczenia", "inne", "konsultacje", "praca_wlasna")
+
+# Template tags per mode (row 0: stacjonarne, row 1: niestacjonarne), same column order
+HOUR_TAGS = np.array([
+    ("numTS", "numWS", "numCS", "numInS", "numKS", "numPwS"),
+    ("numTNS", "numWNS", "numCNS", "numInNS", "numKNS", "numPwNS"),
+], dtype=object)
+
+MODES = ("S", "NS")
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _int_array(values):
+    """
+    int64 array of parsed cell values. A value too large even for int64 (digits
+    glued together from a garbled cell) keeps the array as Python ints, so such
+    plans still extract and show the number the cell held.
+    """
+    try:
+        return np.array(values, dtype=np.int64)
+    except OverflowError:
+        return np.array(values, dtype=object)
+
+
+class PlanTable:
+    """
+    Subjects of one or more plans as parallel arrays.
+
+    name / name_en / semester / unit / ects_text are object arrays of strings,
+    ects is the parsed ECTS value, hours an (n, 6) int array in HOUR_COLUMNS order
+    and ns a bool array (True for niestacjonarne rows).
+    """
+
+    __slots__ = ("name", "name_en", "ects_text", "ects", "semester", "unit", "hours", "ns")
+
+    def __init__(self, name, name_en, ects_text, ects, semester, unit, hours, ns):
+        self.name = name
+        self.name_en = name_en
+        self.ects_text = ects_text
+        self.ects = ects
+        self.semester = semester
+        self.unit = unit
+        self.hours = hours
+        self.ns = ns
+
+    @classmethod
+    def from_rows(cls, names, names_en, ects_texts, semesters, units, hours, mode="S"):
+        """Builds a table from per-column lists (hours: one 6-int list per subject)."""
+        n = len(names)
+        ects = _int_array([int(v) if v.isascii() else 0 for v in ects_texts])
+        return cls(
+            _object_array(names),
+            _object_array(names_en),
+            _object_array(ects_texts),
+            ects,
+            _object_array(semesters),
+            _object_array(units),
+            _int_array(hours).reshape(n, len(HOUR_COLUMNS)),
+            np.full(n, mode == "NS", dtype=bool),
+        )
+
+    @classmethod
+    def empty(cls, mode="S"):
+        return cls.from_rows([], [], [], [], [], [], mode)
+
+    @classmethod
+    def concat(cls, tables):
+        """Stacks several tables (e.g. every plan of a faculty) into one."""
+        tables = list(tables)
+        if not tables:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(t, field) for t in tables]) for field in cls.__slots__))
+
+    def __len__(self):
+        return len(self.name)
+
+    def mode(self):
+        """Per-row mode as an array of "S" / "NS"."""
+        return np.where(self.ns, "NS", "S")
+
+    def by_tag(self):
+        """
+        Hours keyed by template tag (numTS ... numPwNS). Each row's hours land in its
+        own mode's tags; the other mode's tags are 0 for that row.
+        """
+        columns = {}
+        for mode_index, is_ns in enumerate((False, True)):
+            selected = np.where((self.ns == is_ns)[:, None], self.hours, 0)
+            columns.update(zip(HOUR_TAGS[mode_index], selected.T))
+        return columns
+
+    def hour_totals(self, by=None):
+        """
+        Sums of the hour columns. Returns {column: total}, or with by="semester" /
+        "mode" / "unit" a {group: {column: total}} dict.
+        """
+        if by is None:
+            return dict(zip(HOUR_COLUMNS, self.hours.sum(axis=0).tolist()))
+        keys = self.mode() if by == "mode" else getattr(self, by)
+        groups, inverse = np.unique(keys.astype(str), return_inverse=True)
+        sums = np.zeros((len(groups), len(HOUR_COLUMNS)), dtype=self.hours.dtype)
+        np.add.at(sums, inverse.ravel(), self.hours)
+        return {group: dict(zip(HOUR_COLUMNS, row)) for group, row in zip(groups.tolist(), sums.tolist())}
+
+    def to_columns(self):
+        """Plain JSON-serializable dict of lists (for exports)."""
+        columns = {
+            "nazwa_przedmiotu": self.name.tolist(),
+            "nazwa_angielska": self.name_en.tolist(),
+            "ects": self.ects.tolist(),
+            "semestr": self.semester.tolist(),
+            "jednostka": self.unit.tolist(),
+            "tryb": self.mode().tolist(),
+        }
+        columns.update(zip(HOUR_COLUMNS, self.hours.T.tolist()))
+        return columns
+
+    def to_subjects(self):
+        """The per-subject dict list returned by extract_plan_subjects."""
+        # Template values: hours as strings, 0 as an empty field
+        hours = np.where(self.hours != 0, self.hours.astype(str), "").tolist()
+        tags = HOUR_TAGS[self.ns.astype(np.intp)].tolist()
+        subjects = []
+        for name, name_en, ects, semester, unit, row_tags, row_hours in zip(
+                self.name.tolist(), self.name_en.tolist(), self.ects_text.tolist(),
+                self.semester.tolist(), self.unit.tolist(), tags, hours):
+            subject = {
+                "nazwa_przedmiotu": name,
+                "nazwa_angielska": name_en,
+                "ects": ects,
+                "semestr": semester,
+                "jednostka": unit,
+            }
+            subject.update(zip(row_tags, row_hours))
+            subjects.append(subject)
+        return subjects
@@ -0,0 +1,280 @@
+"""
+Synthetic study plans and programs for scaling and throughput tests.
+
+Plans are pdfplumber-style pages ({"text", "tables"}) built from the column
+layouts plan_parser knows (plan_parser._LAYOUTS), plus "mixed_17": a 17-column
+niestacjonarne plan that mixes full-grid rows, rows that compress to 11 cells,
+"30+10T" hour sums and summary rows. Programs are parse results ({"content",
+"tables", "pages"}) with an outcomes table and a subjects table per degree
+level, in the shape data_extractor_v2 reads. Both can also be written as real
+.docx files.
+
+    python synthetic.py plan --rows 5000 --layout width_14_numbered --docx plan.docx
+    python synthetic.py program --subjects 800 --outcomes 300 --levels 2 --docx program.docx
+"""
+import random
+import argparse
+
+import plan_parser
+
+# Table width per layout; compressed_11 rows sit in a 17-column grid with empty joining columns
+LAYOUT_WIDTHS = {
+    "width_17": 17,
+    "width_14": 14,
+    "width_14_numbered": 14,
+    "width_13": 13,
+    "width_13_numbered": 13,
+    "width_11": 11,
+    "width_11_numbered": 11,
+    "width_10": 10,
+    "compressed_11": 17,
+}
+PLAN_LAYOUTS = ("mixed_17",) + tuple(LAYOUT_WIDTHS)
+
+# Grid positions of the 11 non-empty cells of a compressed_11 row in a 17-column table
+_COMPRESSED_11_GRID = (0, 1, 2, 3, 5, 7, 9, 10, 12, 14, 16)
+
+_UNITS = ["Katedra Ekologii", "Instytut Chemii", "Katedra Gleboznawstwa", "Studium Języków Obcych"]
+_TOPICS = [("Matematyka", "Mathematics"), ("Chemia ogólna", "General chemistry"),
+           ("Ekologia lasu", "Forest ecology"), ("Gleboznawstwo", "Soil science"),
+           ("Język angielski", "English"), ("Hydrologia", "Hydrology")]
+_LEVELS = ("studia pierwszego stopnia", "studia drugiego stopnia")
+
+
+def plan_pages(n_rows, layout="mixed_17", rows_per_table=60, seed=0):
+    """
+    Builds pdfplumber-style plan pages with n_rows table rows in total: a
+    column-number header and a semester marker at the top of every table, then
+    subject rows in the given layout (see PLAN_LAYOUTS).
+    """
+    if layout == "mixed_17":
+        return _mixed_17_pages(n_rows, rows_per_table, seed)
+    if layout not in LAYOUT_WIDTHS:
+        raise ValueError(f"Unknown plan layout: {layout}")
+
+    rng = random.Random(seed)
+    width = LAYOUT_WIDTHS[layout]
+    column_layout = plan_parser._LAYOUTS[layout]
+    numbered = layout.endswith("_numbered") or layout == "compressed_11"
+    pages, table, semester, subject_no = [], [], 1, 0
+
+    for i in range(n_rows):
+        if i % rows_per_table == 0:
+            if table:
+                pages.append({"text": "Plan studiów stacjonarnych I stopnia", "tables": [table]})
+            table = [[str(c) for c in range(1, width + 1)]]
+            continue
+        if i % rows_per_table == 1:
+            table.append([f"Semestr {semester}"] + [None] * (width - 1))
+            semester = semester % 7 + 1
+            continue
+        subject_no += 1
+        table.append(_layout_row(column_layout, width, numbered, subject_no, rng))
+
+    if table:
+        pages.append({"text": "Plan studiów stacjonarnych I stopnia", "tables": [table]})
+    return pages
+
+
+def _layout_row(column_layout, width, numbered, subject_no, rng):
+    topic = rng.choice(_TOPICS)
+    ects, wyk, cw, kons = rng.randint(1, 8), rng.choice([0, 15, 30]), rng.choice([15, 30, 45]), rng.choice([0, 5])
+    pw = ects * 25 - wyk - cw - kons
+    hours = [wyk + cw + kons + pw, wyk, cw, 0, kons, pw]
+    # Unnumbered names never start with a number (that would make them numbered/compressed rows);
+    # numbered ones carry no other number (a "12 " inside would read as a second subject marker)
+    name = f"{topic[0]} {subject_no} / {topic[1]}"
+
+    if column_layout.compressed:
+        cells = ["-"] * 11
+        cells[0] = f"{subject_no}. {topic[0]} / {topic[1]}"
+    else:
+        cells = [None] * width
+        if numbered:
+            cells[0] = f"{subject_no}."
+        cells[column_layout.name_col] = name
+    cells[column_layout.ects_col] = str(ects)
+    for col, value in zip(column_layout[3:9], hours):
+        if col is not None:
+            cells[col] = str(value) if value else "-"
+    cells[column_layout.unit_col] = rng.choice(_UNITS)
+    if column_layout.typ_col is not None:
+        cells[column_layout.typ_col] = "O"
+
+    if column_layout.compressed:
+        row = [None] * width
+        for col, value in zip(_COMPRESSED_11_GRID, cells):
+            row[col] = value
+        return row
+    return cells
+
+
+def _mixed_17_pages(n_rows, rows_per_table, seed):
+    rng = random.Random(seed)
+    pages, table, semester, subject_no = [], [], 1, 0
+
+    def push_table():
+        nonlocal table
+        if table:
+            pages.append({"text": "Plan studiów niestacjonarnych I stopnia", "tables": [table]})
+        table = []
+
+    for i in range(n_rows):
+        if i % rows_per_table == 0:
+            push_table()
+            table.append([str(c) for c in range(1, 18)])
+            continue
+        if i % rows_per_table == 1:
+            table.append([f"Semestr {semester}"] + [None] * 16)
+            semester = semester % 7 + 1
+            continue
+        subject_no += 1
+        topic = rng.choice(_TOPICS)
+        name = f"{subject_no}. {topic[0]} / {topic[1]}"
+        ects, wyk, cw = rng.randint(1, 8), rng.choice([0, 15, 30]), rng.choice([15, 30, 45])
+        kind = rng.random()
+        if kind < 0.1:
+            table.append(["Semestr łącznie", "30", "450"] + [None] * 14)
+        elif kind < 0.35:
+            # Phantom columns merged away: 11 non-empty cells in a 17-column grid
+            table.append([name, str(ects), str(wyk + cw), str(wyk) if wyk else "-", None, str(cw), None,
+                          "0", None, "5", "20", None, "E", None, "O", None, rng.choice(_UNITS)])
+        else:
+            cw_cell = f"{cw}+10T" if kind > 0.9 else f"{cw}L"
+            table.append([name, str(ects), str(wyk + cw), str(wyk) if wyk else None, None, None, cw_cell,
+                          None, None, "0", None, None, "5", str(ects * 25 - wyk - cw), "Z", "F", rng.choice(_UNITS)])
+    push_table()
+    return pages
+
+
+def _outcome_symbol(prefix, category, index):
+    # data_extractor_v2 matches symbols ending in _W/_U/_K plus at most two digits
+    block, number = divmod(index, 99)
+    return f"{prefix}{block or ''}_{category}{number + 1:02d}"
+
+
+def program_pages(n_subjects, n_outcomes=60, levels=1, rows_per_table=40, seed=0):
+    """
+    Builds a program parse result with `levels` degree levels, each with a
+    subjects table of n_subjects rows followed by an outcomes table of
+    n_outcomes rows (W/U/K sections); both continue across pages without a
+    header. Every subject refers to 3-6 of its level's outcomes.
+
+    With rows_per_table=None every table stays whole and each level's details
+    also go into a one-cell table, the way .docx programs carry them.
+    """
+    rng = random.Random(seed)
+    pages = []
+
+    for level_no in range(levels):
+        level = _LEVELS[level_no % len(_LEVELS)]
+        prefix = f"SYN{level_no + 1}"
+        info = (f"Nazwa kierunku studiów: kierunek syntetyczny\nPoziom kształcenia: {level}\n"
+                "Profil kształcenia: ogólnoakademicki\nForma studiów: stacjonarne\n")
+
+        # Subject and outcome symbols are generated first; the subjects table precedes the outcomes
+        # table in the documents, and outcome tables continue until the next long-header table
+        symbols = []
+        outcome_rows = [["Symbol", "Kierunkowe efekty uczenia się", "Sposoby weryfikacji i oceny efektów uczenia się"]]
+        sections = (("W", "Wiedza: absolwent zna i rozumie"), ("U", "Umiejętności: absolwent potrafi"),
+                    ("K", "Kompetencje społeczne: absolwent jest gotów do"))
+        per_section = [n_outcomes // 3 + (1 if i < n_outcomes % 3 else 0) for i in range(3)]
+        for (category, title), count in zip(sections, per_section):
+            outcome_rows.append([None, title, None])
+            for index in range(count):
+                symbol = _outcome_symbol(prefix, category, index)
+                symbols.append(symbol)
+                outcome_rows.append([symbol, f"{rng.choice(_TOPICS)[0].lower()} w stopniu zaawansowanym",
+                                     rng.choice(["egzamin", "kolokwium; projekt", "sprawozdanie"])])
+
+        subject_rows = [["Nr semestru.\nNr przedmiotu.\nNazwa przedmiotu", "ECTS", "Kategoria przedmiotu",
+                         "Treści programowe zapewniające uzyskanie efektów uczenia się",
+                         "Symbol efektów uczenia się", "Jednostka realizująca"]]
+        for i in range(n_subjects):
+            topic = rng.choice(_TOPICS)
+            semester = i * 7 // max(1, n_subjects) + 1
+            refs = rng.sample(symbols, min(len(symbols), rng.randint(3, 6)))
+            subject_rows.append([f"{semester}.{i + 1}.\n{topic[0]} {i + 1}", str(rng.randint(1, 8)), "K/W",
+                                 f"Treści przedmiotu {topic[0].lower()}: wykłady, ćwiczenia, projekt.",
+                                 ", ".join(refs), rng.choice(_UNITS)])
+        if rows_per_table:
+            pages.append({"text": info, "tables": []})
+            pages.extend(_split_table(subject_rows, rows_per_table, "Program studiów"))
+            pages.extend(_split_table(outcome_rows, rows_per_table, "Kierunkowe efekty uczenia się"))
+        else:
+            pages.append({"text": info, "tables": [[[info.strip()]], subject_rows, outcome_rows]})
+
+    return {
+        "content": "\n".join(page["text"] for page in pages),
+        "tables": [table for page in pages for table in page["tables"]],
+        "pages": pages,
+    }
+
+
+def _split_table(rows, rows_per_table, text):
+    """Splits a table over pages; continuation tables start with a data row, as in the PDFs."""
+    pages = []
+    chunk = []
+    for row in rows:
+        # Don't start a continuation page with a section header (it has no symbol)
+        if len(chunk) >= rows_per_table and row[0]:
+            pages.append({"text": text, "tables": [chunk]})
+            chunk = []
+        chunk.append(row)
+    if chunk:
+        pages.append({"text": text, "tables": [chunk]})
+    return pages
+
+
+def write_docx(path, pages):
+    """Writes pages ({"text", "tables"}) as a .docx: each page's text as paragraphs, then its tables."""
+    from docx import Document
+
+    document = Document()
+    for page in pages:
+        for line in page.get("text", "").splitlines():
+            document.add_paragraph(line)
+        for table in page.get("tables", []):
+            width = max(len(row) for row in table)
+            docx_table = document.add_table(rows=len(table), cols=width)
+            for row, docx_row in zip(table, docx_table.rows):
+                for value, cell in zip(row, docx_row.cells):
+                    if value:
+                        cell.text = value
+    document.save(path)
+    return path
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generates a synthetic study plan or program.")
+    sub = arg_parser.add_subparsers(dest="kind", required=True)
+    plan_args = sub.add_parser("plan")
+    plan_args.add_argument("--rows", type=int, default=1000)
+    plan_args.add_argument("--layout", choices=PLAN_LAYOUTS, default="mixed_17")
+    plan_args.add_argument("--docx", help="write a .docx file")
+    program_args = sub.add_parser("program")
+    program_args.add_argument("--subjects", type=int, default=200)
+    program_args.add_argument("--outcomes", type=int, default=60)
+    program_args.add_argument("--levels", type=int, default=1)
+    program_args.add_argument("--docx", help="write a .docx file")
+    for p in (plan_args, program_args):
+        p.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    if args.kind == "plan":
+        generated = plan_pages(args.rows, args.layout, seed=args.seed)
+        subjects = len(plan_parser.extract_plan_subjects(generated, {"tryb": "S"}))
+    else:
+        import data_extractor_v2
+
+        generated = program_pages(args.subjects, args.outcomes, args.levels, seed=args.seed)
+        subjects = len(data_extractor_v2.extract_data_from_docx_v2(
+            generated["tables"], generated["content"], generated["pages"]))
+        if args.docx:
+            # Whole tables in the .docx, like Word programs (page breaks only exist in PDFs)
+            generated = program_pages(args.subjects, args.outcomes, args.levels, rows_per_table=None, seed=args.seed)
+        generated = generated["pages"]
+    print(f"{len(generated)} pages, {sum(len(t) for p in generated for t in p['tables'])} table rows, "
+          f"{subjects} subjects extracted")
+    if args.docx:
+        print(f"Written to {write_docx(args.docx, generated)}")
@@ -0,0 +1,44 @@
+"""Assertion checks for catalog level normalization (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+import catalog
+import models
+from database import SessionLocal, DB_DIR
+from data_extractor_v2 import normalize_level, FIRST_DEGREE, SECOND_DEGREE
+
+
+@pytest.fixture
+def db():
+    # conftest.py points DB_DIR at a temporary directory
+    assert "syllabus-tests-" in DB_DIR
+    with SessionLocal() as session:
+        session.query(models.CatalogEntry).delete()
+        session.commit()
+        yield session
+
+
+def test_normalize_level():
+    for value in ("I", "1", "I°", "I stopnia", "studia I stopnia", "studiów I°", "Studia pierwszego stopnia"):
+        assert normalize_level(value) == FIRST_DEGREE, value
+    for value in ("ii", "2", "IIo", "II stopnia", "studia II stopnia", "drugiego stopnia"):
+        assert normalize_level(value) == SECOND_DEGREE, value
+    assert normalize_level(" jednolite studia magisterskie ") == "jednolite studia magisterskie"
+    assert normalize_level(None) == ""
+
+
+def test_levels_normalized_at_index_time(db):
+    program, plan = "programs/test.pdf", "plans/test.pdf"
+    subject = {"nazwa_przedmiotu": "Zzyzx katalogowa", "kierunek": "Leśnictwo", "poziom": "I stopnia", "forma": "S"}
+    catalog.index_file(db, program, "program", [subject])
+    catalog.index_file(db, plan, "plan", [{"nazwa_przedmiotu": "Zzyzx katalogowa", "num1": 30}],
+                       {"kierunek": "Leśnictwo", "poziom": "studia II stopnia", "tryb": "NS"})
+    db.commit()
+    first = catalog.search("zzyzx", poziom="studia pierwszego stopnia")["results"]
+    second = catalog.search("zzyzx", poziom="II")["results"]
+    assert [row["file"] for row in first] == [program]
+    assert [row["file"] for row in second] == [plan]
+    assert catalog.search("zzyzx", poziom="I stopnia")["count"] == 1
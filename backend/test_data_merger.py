@@ -0,0 +1,58 @@
+"""Assertion checks for data_merger.merge_plan_hours (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_merger import merge_plan_hours, normalize_subject_name
+
+
+def _plan(poziom, *subjects):
+    return {"metadata": {"poziom": poziom}, "subjects": list(subjects)}
+
+
+def test_normalize_subject_name():
+    assert normalize_subject_name("1.2. Chemia (do wyboru)") == "chemia"
+    assert normalize_subject_name("Fakultet IV 3a. Ekologia lasu -") == "ekologia lasu"
+    assert normalize_subject_name(None) == ""
+
+
+def test_merge_plan_hours_name_matching():
+    program = [
+        {"nazwa_przedmiotu": "Chemia", "poziom": "studia pierwszego stopnia", "ects": "6"},
+        {"nazwa_przedmiotu": "Ekologia lasu", "poziom": "studia pierwszego stopnia"},
+        {"nazwa_przedmiotu": "Genetyka", "poziom": "studia pierwszego stopnia"},  # substring fallback
+        {"nazwa_przedmiotu": "Seminarium", "poziom": "studia drugiego stopnia"},
+        {"nazwa_przedmiotu": "", "poziom": "studia pierwszego stopnia"},
+    ]
+    first = _plan("studia pierwszego stopnia",
+                  {"nazwa_przedmiotu": "1. Chemia (do wyboru)", "numWS": "30", "ects": "5", "semestr": "1"},
+                  {"nazwa_przedmiotu": "Fakultet II Ekologia lasu", "numCS": "15"},
+                  {"nazwa_przedmiotu": "Genetyka roślin", "numLS": "20"},
+                  {"nazwa_przedmiotu": "Seminarium", "numWS": "99"})
+    second = _plan("studia drugiego stopnia", {"nazwa_przedmiotu": "Seminarium", "numCNS": "10"})
+
+    merged, matched = merge_plan_hours(program, [first, second])
+    chemia, ekologia, genetyka, seminarium, unnamed = merged
+    assert chemia == {"nazwa_przedmiotu": "Chemia", "poziom": "studia pierwszego stopnia",
+                      "ects": "6", "semestr": "1", "numWS": "30"}  # the program's own ects is kept
+    assert ekologia["numCS"] == "15"
+    assert genetyka["numLS"] == "20"
+    assert seminarium == {"nazwa_przedmiotu": "Seminarium", "poziom": "studia drugiego stopnia", "numCNS": "10"}
+    assert unnamed == program[4]
+    assert matched == [3, 1]
+    assert "numWS" not in program[0]  # the input subjects are not modified
+
+
+def test_merge_plan_hours_level_spellings():
+    plans = [
+        _plan("studia pierwszego stopnia", {"nazwa_przedmiotu": "Seminarium", "numCS": "15"}),
+        _plan("studia drugiego stopnia", {"nazwa_przedmiotu": "Seminarium", "numCS": "30", "numWS": "10"}),
+    ]
+    program = [
+        {"nazwa_przedmiotu": "Seminarium", "poziom": "I stopnia"},
+        {"nazwa_przedmiotu": "Seminarium", "poziom": "studia II stopnia"},
+        {"nazwa_przedmiotu": "Seminarium", "poziom": "II°"},
+    ]
+    merged, matched = merge_plan_hours(program, plans)
+    assert [(s["numCS"], s.get("numWS")) for s in merged] == [("15", None), ("30", "10"), ("30", "10")]
+    assert matched == [1, 2]
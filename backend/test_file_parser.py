@@ -0,0 +1,111 @@
+"""Assertion checks for file_parser's PDF page handling (run with pytest)."""
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pypdfium2 as pdfium
+
+import file_parser
+import parse_cache
+
+
+def _blank_pdf(pages):
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(pages):
+        pdf.new_page(595, 842)
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def test_broken_parse_pool_falls_back_to_serial(monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(parse_cache, "PAGE_CACHE_ENABLED", False)
+    broken = ProcessPoolExecutor(max_workers=2)
+    broken.submit(os._exit, 1).exception()  # the worker dies, the pool is now broken
+    monkeypatch.setattr(file_parser, "_pool", broken)
+    monkeypatch.setattr(file_parser, "_pool_workers", 2)
+
+    parsed = file_parser.parse_pdf(_blank_pdf(8), workers=2, prefilter=False)
+    assert "error" not in parsed
+    assert len(parsed["pages"]) == 8
+    assert file_parser._pool is not broken
+
+    # The next parallel parse gets a fresh pool
+    assert len(file_parser.parse_pdf(_blank_pdf(8), workers=2, prefilter=False)["pages"]) == 8
+
+
+def test_broken_parse_pool_adaptive_reparse_runs_serially(monkeypatch):
+    import plan_parser
+    from plan_table import PlanTable
+
+    monkeypatch.setattr(parse_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(parse_cache, "PAGE_CACHE_ENABLED", False)
+    broken = ProcessPoolExecutor(max_workers=2)
+    broken.submit(os._exit, 1).exception()
+    monkeypatch.setattr(file_parser, "_pool", broken)
+    monkeypatch.setattr(file_parser, "_pool_workers", 2)
+
+    data = _blank_pdf(2)
+    parsed = file_parser.parse_pdf(data, workers=1, prefilter=False)
+    initial = PlanTable.empty()
+    best = plan_parser.adaptive_reparse(data, parsed, {"tryb": "S"}, initial,
+                                        candidate_settings=[{"snap_tolerance": 6}, {"snap_tolerance": 10}],
+                                        workers=2)
+    assert best is initial
+    assert file_parser._pool is not broken
+
+
+def _sized_pdf(widths):
+    """Blank pages told apart by their width, so each page has its own page_digest."""
+    pdf = pdfium.PdfDocument.new()
+    for width in widths:
+        pdf.new_page(width, 842)
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def _cache_files(cache_dir):
+    return [name for name in os.listdir(cache_dir) if name.endswith(".json.z")]
+
+
+def test_revised_document_reuses_unchanged_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(parse_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(parse_cache, "PAGE_CACHE_ENABLED", True)
+    extracted = []
+    extract_page = file_parser._extract_page
+    monkeypatch.setattr(file_parser, "_extract_page",
+                        lambda page, *args: extracted.append(page.width) or extract_page(page, *args))
+
+    widths = [500 + i for i in range(6)]
+    first = file_parser.parse_pdf(_sized_pdf(widths), workers=1, prefilter=False)
+    assert extracted == widths
+    assert len(_cache_files(tmp_path)) == 7  # six pages and the document
+
+    # A revision with one page changed and one added: only those two are parsed again
+    extracted.clear()
+    revised = file_parser.parse_pdf(_sized_pdf(widths[:2] + [700] + widths[3:] + [701]), workers=1, prefilter=False)
+    assert extracted == [700, 701]
+    assert len(revised["pages"]) == 7
+    assert revised["pages"][:2] == first["pages"][:2]
+
+
+def test_page_entries_count_toward_the_size_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(parse_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(parse_cache, "PAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(parse_cache, "_EVICT_EVERY_BYTES", 1)
+    file_parser.parse_pdf(_sized_pdf([500 + i for i in range(10)]), workers=1, prefilter=False)
+    page_entry = min(os.path.getsize(tmp_path / name) for name in _cache_files(tmp_path))
+
+    monkeypatch.setattr(parse_cache, "CACHE_MAX_BYTES", 4 * page_entry)
+    # A stream closed early never stores its document entry; its pages must still be evicted
+    stream = file_parser.stream_pdf(_sized_pdf([600 + i for i in range(10)]), prefilter=False)
+    for _ in range(8):
+        next(stream)
+    stream.close()
+    assert sum(os.path.getsize(tmp_path / name) for name in _cache_files(tmp_path)) <= 4 * page_entry
@@ -0,0 +1,39 @@
+"""Assertion checks for layout_profiles fingerprints (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+import file_parser
+import layout_profiles
+import parse_cache
+
+PLAN = os.path.join(os.path.dirname(__file__), "..", "plans", "is_i_st_n_2024_2025.pdf")
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(parse_cache, "CACHE_ENABLED", True)
+
+
+def test_fingerprint_from_parsed_pages_matches_table_finding(monkeypatch):
+    found = layout_profiles._fingerprint(PLAN, None)
+    assert found["columns"] > 0
+    parsed = file_parser.parse_pdf(PLAN, workers=1)
+    assert layout_profiles._fingerprint(PLAN, parsed["pages"]) == found
+
+    # The default parse is cached now, so the fingerprint is read from it without table finding
+    monkeypatch.setattr(layout_profiles.pdfplumber.page.Page, "find_tables",
+                        lambda *args, **kwargs: pytest.fail("find_tables ran"))
+    assert layout_profiles.fingerprint(PLAN) == found
+
+
+def test_fingerprint_cached_by_content(monkeypatch):
+    with open(PLAN, "rb") as f:
+        data = f.read()
+    found = layout_profiles.fingerprint(data)
+    monkeypatch.setattr(layout_profiles, "_fingerprint", lambda *args: pytest.fail("not served from the cache"))
+    assert layout_profiles.fingerprint(PLAN) == found
+    assert layout_profiles.fingerprint(os.path.join(os.path.dirname(PLAN), "missing.pdf")) is None
@@ -0,0 +1,43 @@
+"""Assertion checks for the outcome index's level filter (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+import models
+import outcome_index
+from database import SessionLocal, DB_DIR
+from data_extractor_v2 import FIRST_DEGREE
+
+
+def _subject(name, description):
+    outcomes = {"W": [{"symbol": "ZZ_W01", "description": description, "verification": "egzamin"}], "U": [], "K": []}
+    return {"nazwa_przedmiotu": name, "kierunek": "Leśnictwo", "poziom": "I stopnia",
+            "learning_outcomesW": "ZZ_W01", "available_outcomes": outcomes}
+
+
+@pytest.fixture
+def db():
+    # conftest.py points DB_DIR at a temporary directory
+    assert "syllabus-tests-" in DB_DIR
+    with SessionLocal() as session:
+        for model in (models.OutcomeSymbol, models.OutcomeReference):
+            session.query(model).delete()
+        session.commit()
+        yield session
+
+
+def test_poziom_filter_covers_every_catalogue_of_the_level(db):
+    program = "programs/test.pdf"
+    # Two different catalogues of one level: normalize_subjects keys them "I stopnia" and "I stopnia (2)"
+    subjects = [_subject("Dendrologia", "zna drzewa"), _subject("Botanika", "zna rośliny")]
+    outcome_index.index_file(db, program, "program", subjects)
+    db.commit()
+    found = outcome_index.lookup("zz_w01", program=program, poziom="I")
+    assert found["count"] == 2
+    assert {row["poziom"] for row in found["results"]} == {FIRST_DEGREE, FIRST_DEGREE + " (2)"}
+    assert sorted(s["nazwa_przedmiotu"] for row in found["results"] for s in row["subjects"]) == [
+        "Botanika", "Dendrologia"]
+    assert outcome_index.subject_outcomes("Botanika", program, "studia pierwszego stopnia")["count"] == 1
+    assert outcome_index.lookup("ZZ_W01", program=program, poziom="II")["count"] == 0
@@ -0,0 +1,76 @@
+"""Assertion checks for parse_cache keys, coalescing and eviction (run with pytest)."""
+import io
+import os
+import sys
+import time
+import threading
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+import parse_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(parse_cache, "CACHE_ENABLED", True)
+    return tmp_path
+
+
+def test_key_depends_on_content_kind_and_settings(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"%PDF-1.4 test")
+    digests = {parse_cache.read_source(source)[1]
+               for source in (str(path), b"%PDF-1.4 test", io.BytesIO(b"%PDF-1.4 test"))}
+    assert len(digests) == 1
+    digest = digests.pop()
+    key = parse_cache.make_key(digest, "pdf", {"snap_tolerance": 3, "vertical_strategy": "lines"})
+    assert key == parse_cache.make_key(digest, "pdf", {"vertical_strategy": "lines", "snap_tolerance": 3})
+    assert key != parse_cache.make_key(digest, "pdf", {"snap_tolerance": 4, "vertical_strategy": "lines"})
+    assert key != parse_cache.make_key(digest, "pdf+prefilter", {"snap_tolerance": 3, "vertical_strategy": "lines"})
+    assert parse_cache.make_key(digest, "pdf") != parse_cache.make_key(digest[::-1], "pdf")
+
+
+def test_concurrent_parses_are_coalesced(cache_dir):
+    calls = []
+
+    def parse(data):
+        calls.append(data)
+        time.sleep(0.2)
+        return {"content": data.decode(), "tables": []}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(parse_cache.get_or_parse(b"same", "docx", parse)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [r["content"] for r in results] == ["same"] * 4
+    # Different documents lock a fixed set of stripe files, not one file per key
+    for i in range(20):
+        parse_cache.get_or_parse(f"doc {i}".encode(), "docx", parse)
+    lock_files = [name for name in os.listdir(cache_dir) if name.endswith(".lock")]
+    assert len(lock_files) <= 21 and all(name.startswith("stripe-") for name in lock_files)
+
+
+def test_errors_are_not_cached_and_unreadable_sources_raise(tmp_path):
+    assert parse_cache.get_or_parse(b"bad", "docx", lambda data: {"error": "zepsuty plik"}) == {"error": "zepsuty plik"}
+    assert parse_cache.get_or_parse(b"bad", "docx", lambda data: {"content": "ok"})["content"] == "ok"
+    with pytest.raises(OSError):
+        parse_cache.get_or_parse(str(tmp_path / "missing.pdf"), "pdf", lambda data: {"content": "never"})
+
+
+def test_eviction_keeps_recently_used_entries(cache_dir):
+    for i in range(5):
+        parse_cache.store(f"{i:064x}", {"content": "x" * 1000 + str(i)})
+        os.utime(cache_dir / f"{i:064x}.json.z", (1000 + i, 1000 + i))
+    parse_cache.load(f"{0:064x}")  # touching an entry makes it the most recent
+    size = os.path.getsize(cache_dir / f"{0:064x}.json.z")
+    parse_cache.evict(max_bytes=2 * size + size // 2)
+    assert sorted(name[:64] for name in os.listdir(cache_dir) if name.endswith(".json.z")) == [
+        f"{0:064x}", f"{4:064x}"]
+    parse_cache.clear()
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".json.z")]
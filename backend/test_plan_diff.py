@@ -0,0 +1,41 @@
+"""Assertion checks for plan_diff.diff_tables (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+from plan_diff import diff_tables, normalize_name
+from plan_table import PlanTable
+
+
+def _table(rows):
+    """PlanTable of (name, ects, semester, [T, W, C, In, K, Pw]) rows."""
+    return PlanTable.from_rows([r[0] for r in rows], [""] * len(rows), [r[1] for r in rows],
+                               [r[2] for r in rows], [""] * len(rows), [r[3] for r in rows])
+
+
+def test_normalize_name():
+    assert normalize_name("  2.1. Ochrona   Środowiska ") == "ochrona srodowiska"
+    assert normalize_name("Zarządzanie łąkami.") == normalize_name("ZARZADZANIE LAKAMI")
+
+
+def test_diff_tables():
+    old = _table([
+        ("1. Chemia", "5", "1", [60, 30, 30, 0, 0, 90]),
+        ("Fizyka", "3", "1", [45, 15, 30, 0, 0, 30]),
+        ("Praktyka", "2", "2", [0, 0, 0, 0, 0, 60]),
+        ("Praktyka", "2", "2", [0, 0, 0, 0, 0, 30]),
+    ])
+    new = _table([
+        ("Chémia", "5", "1", [60, 30, 30, 0, 0, 90]),  # renumbered and accented: same subject
+        ("Fizyka", "4", "1", [45, 15, 30, 0, 0, 45]),
+        ("Praktyka", "2", "2", [0, 0, 0, 0, 0, 60]),
+        ("Fizyka", "3", "2", [45, 15, 30, 0, 0, 30]),  # same name, other semester: added
+    ])
+    diff = diff_tables(old, new)
+    assert diff["summary"] == {"added": 1, "removed": 1, "changed": 1, "unchanged": 2}
+    assert diff["changed"] == [{"nazwa_przedmiotu": "Fizyka", "semestr": "1",
+                                "changes": {"ects": {"old": 3, "new": 4}, "praca_wlasna": {"old": 30, "new": 45}}}]
+    assert [(s["nazwa_przedmiotu"], s["semestr"]) for s in diff["added"]] == [("Fizyka", "2")]
+    # The second occurrence of a repeated name is the one that disappeared
+    assert [(s["nazwa_przedmiotu"], s["praca_wlasna"]) for s in diff["removed"]] == [("Praktyka", 30)]
+    assert diff_tables(new, new)["summary"]["unchanged"] == 4
@@ -0,0 +1,75 @@
+"""Assertion checks for plan_parser's per-table layout dispatch (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import plan_parser
+import synthetic
+from plan_parser import PlanRow, _compile_table_layout
+
+
+def _old_layout_name(row, num_cols):
+    """The per-row if/elif chain extract_plan_subjects used before layouts were compiled per table."""
+    raw_row = [str(c) if c is not None else "" for c in row]
+    compressed_row = [c.strip() for c in raw_row if c.strip()]
+    if len(compressed_row) == 11 and compressed_row[0].split('.')[0].isdigit() and compressed_row[1].isdigit():
+        return "compressed_11"
+    if len(compressed_row) == 10 and "fakultet" in compressed_row[0].lower():
+        return "compressed_10"
+    numbered = bool(row[0]) and str(row[0]).strip().replace(".", "").isdigit()
+    if num_cols >= 17:
+        return "width_17"
+    if num_cols >= 14:
+        return "width_14_numbered" if numbered else "width_14"
+    if num_cols == 13:
+        return "width_13_numbered" if numbered else "width_13"
+    if num_cols == 11:
+        first_cell = str(row[0]).strip().replace(".", "")
+        is_numbered = first_cell.isdigit() and not str(row[1]).strip().isdigit() and str(row[2]).strip().isdigit()
+        return "width_11_numbered" if is_numbered else "width_11"
+    if num_cols == 10:
+        return "width_10"
+    return "auto"
+
+
+def _padded(cells, width):
+    return cells + [None] * (width - len(cells))
+
+
+def _tables():
+    for layout in synthetic.PLAN_LAYOUTS:
+        for page in synthetic.plan_pages(60, layout=layout, seed=3):
+            yield from page["tables"]
+    # Row-level overrides inside wide tables, and widths without a layout of their own
+    compressed_11 = ["1.2", "4", "60", "30", "30", "0", "0", "90", "Zo", "O", "WNoŚ"]
+    fakultet_10 = ["Fakultet 1", "2", "30", "15", "15", "0", "0", "30", "O", "WNoŚ"]
+    plain = ["Chemia", "5", "60", "30", "30", "", "", "90", "Zo", "", "", ""]
+    for width in (10, 11, 12, 13, 14, 17, 20):
+        yield [_padded(compressed_11[:width], width), _padded(fakultet_10[:width], width),
+               _padded(plain[:width], width), _padded(["3."] + plain[:width - 1], width)]
+
+
+def test_layout_dispatch_matches_if_elif_chain():
+    checked = 0
+    for table in _tables():
+        num_cols = len(table[0])
+        compiled = _compile_table_layout(table, num_cols)
+        for row in table:
+            if not row or len(row) < 3:
+                continue
+            layout = compiled.select(PlanRow(row))
+            name = "auto" if layout is None else layout.name
+            assert name == _old_layout_name(row, num_cols), (row, num_cols)
+            checked += 1
+    assert checked > 500
+
+
+def test_fixed_layout_applies_to_tables_with_overrides():
+    table = [_padded(["Chemia", "5", "60"], 17)]
+    compiled = _compile_table_layout(table, 17)
+    assert compiled.overrides and compiled.fixed is not None and compiled.fixed.name == "width_17"
+
+
+def test_table_of_empty_rows():
+    assert _compile_table_layout([[]], 0).overrides == {}
+    assert plan_parser.extract_plan_subjects([{"text": "", "tables": [[[]], [[], []]]}]) == []
@@ -0,0 +1,61 @@
+"""Assertion checks for plan_table.PlanTable (run with pytest)."""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+import plan_parser
+import synthetic
+from plan_table import PlanTable, HOUR_COLUMNS
+
+
+def _rows():
+    return (["Chemia", "Fizyka"], ["Chemistry", ""], ["5", "3"], ["1", "2"], ["WNoŚ", ""],
+            [[60, 30, 30, 0, 0, 90], [45, 15, 30, 0, 5, 30]])
+
+
+def test_round_trip():
+    table = PlanTable.from_rows(*_rows(), mode="NS")
+    assert len(table) == 2
+    assert table.to_subjects()[0] == {
+        "nazwa_przedmiotu": "Chemia", "nazwa_angielska": "Chemistry", "ects": "5", "semestr": "1",
+        "jednostka": "WNoŚ", "numTNS": "60", "numWNS": "30", "numCNS": "30", "numInNS": "",
+        "numKNS": "", "numPwNS": "90",
+    }
+    both = PlanTable.concat([table, PlanTable.from_rows(*_rows(), mode="S")])
+    assert both.mode().tolist() == ["NS", "NS", "S", "S"]
+    assert both.hour_totals()["total"] == 210
+    assert both.hour_totals(by="mode")["S"]["praca_wlasna"] == 120
+    assert both.by_tag()["numTS"].tolist() == [0, 0, 60, 45]
+    assert both.to_columns()["ects"] == [5, 3, 5, 3]
+
+
+def test_empty():
+    assert PlanTable.empty().to_subjects() == []
+    assert PlanTable.concat([]).hour_totals() == dict.fromkeys(HOUR_COLUMNS, 0)
+
+
+def test_oversized_cells():
+    names, names_en, ects, semesters, units, hours = _rows()
+    hours[0][0] = 12345678901  # does not fit int32
+    table = PlanTable.from_rows(names, names_en, ["12345678901", "3"], semesters, units, hours)
+    assert table.to_subjects()[0]["numTS"] == "12345678901"
+    assert table.ects.tolist() == [12345678901, 3]
+
+    hours[1][1] = 10 ** 25  # not even int64
+    table = PlanTable.from_rows(names, names_en, ects, semesters, units, hours)
+    assert table.to_subjects()[1]["numWS"] == str(10 ** 25)
+    assert table.hour_totals(by="semester")["2"]["wyklad"] == 10 ** 25
+
+
+def test_garbage_numeric_cells_in_plan():
+    pages = synthetic.plan_pages(20, layout="width_10", seed=1)
+    count = len(plan_parser.extract_plan_table(pages))
+    row = pages[0]["tables"][0][2]
+    row[2], row[3] = "12345678901", "2024/2025/2026"
+    subject = plan_parser.extract_plan_subjects(pages)[0]
+    assert subject["numTS"] == "12345678901"
+    assert subject["numWS"] == "202420252026"
+
+    row[2] = "1234567890123456789012345"
+    assert plan_parser.extract_plan_subjects(pages)[0]["numTS"] == "1234567890123456789012345"
+    assert len(plan_parser.extract_plan_table(pages)) == count
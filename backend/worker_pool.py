@@ -0,0 +1,219 @@
+import os
+import math
+import time
+import asyncio
+import logging
+import multiprocessing
+from queue import Empty
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Server settings: worker processes for CPU-heavy stages, and how many jobs may be
+# admitted (running + waiting) before new requests are rejected with 429.
+POOL_SIZE = max(1, int(os.environ.get("WORKER_POOL_SIZE", os.cpu_count() or 1)))
+QUEUE_LIMIT = max(POOL_SIZE, int(os.environ.get("WORKER_QUEUE_LIMIT", POOL_SIZE * 4)))
+
+# How often a stream reader checks whether its job died without finishing the stream (seconds)
+STREAM_POLL_INTERVAL = 1.0
+
+_executor = None
+_manager = None
+_in_flight = 0
+_stats = {
+    "completed": 0,
+    "failed": 0,
+    "rejected": 0,
+}
+# Recent samples (seconds) for wait/run time statistics
+_wait_times = deque(maxlen=500)
+_run_times = deque(maxlen=500)
+
+
+class QueueFull(Exception):
+    """Raised when the bounded queue is full; retry_after is a suggested delay in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Worker queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Spawned, so workers don't inherit the server's threads or its open database connections
+        _executor = ProcessPoolExecutor(max_workers=POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _timed_call(fn, args, kwargs):
+    """Runs in the worker process; reports when the job actually started and finished."""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+def _get_manager():
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+
+def _streamed_call(fn, args, kwargs, queue, cancelled):
+    """Runs in the worker process: puts each item of fn(*args, **kwargs) on the queue, then None."""
+    started = time.time()
+    try:
+        for item in fn(*args, **kwargs):
+            if cancelled.is_set():
+                break
+            queue.put(item)
+    finally:
+        queue.put(None)
+    return started, time.time(), None
+
+
+def _retry_after():
+    """Estimates how long until a slot frees up, from recent run times."""
+    avg_run = sum(_run_times) / len(_run_times) if _run_times else 5.0
+    queued = max(0, _in_flight - POOL_SIZE)
+    return max(1, math.ceil(avg_run * (queued + 1) / POOL_SIZE))
+
+
+def _admit(count):
+    """Reserves `count` queue slots or raises QueueFull. A batch larger than the queue is admitted when idle."""
+    global _in_flight
+    if _in_flight and _in_flight + count > QUEUE_LIMIT:
+        _stats["rejected"] += 1
+        raise QueueFull(_retry_after())
+    _in_flight += count
+
+
+async def _execute(fn, args, kwargs):
+    """Runs one admitted job and releases its slot."""
+    global _in_flight, _executor
+    submitted = time.time()
+    try:
+        loop = asyncio.get_running_loop()
+        started, finished, result = await loop.run_in_executor(_get_executor(), _timed_call, fn, args, kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool for the next request
+        logger.error("Worker pool broken, restarting it")
+        _executor = None
+        _stats["failed"] += 1
+        raise
+    except Exception:
+        _stats["failed"] += 1
+        raise
+    finally:
+        _in_flight -= 1
+
+    _stats["completed"] += 1
+    _wait_times.append(max(0.0, started - submitted))
+    _run_times.append(finished - started)
+    return result
+
+
+async def run(fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) in the worker pool without blocking the event loop.
+
+    fn must be a module-level function and its arguments/result picklable.
+    Raises QueueFull when QUEUE_LIMIT jobs are already admitted.
+    """
+    _admit(1)
+    return await _execute(fn, args, kwargs)
+
+
+async def run_batch(calls):
+    """
+    Runs several (fn, *args) calls in the pool at the same time and returns their
+    results in order. The batch is admitted (or rejected with QueueFull) as a whole,
+    so a request never ends up with only part of its files running. If a call fails,
+    the first error is raised once all calls have finished.
+    """
+    _admit(len(calls))
+    results = await asyncio.gather(*(_execute(fn, args, {}) for fn, *args in calls), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+def stream(fn, *args, **kwargs):
+    """
+    Runs the generator function fn(*args, **kwargs) in the worker pool and returns
+    an async iterator over its items, delivered as the worker produces them
+    (through a multiprocessing.Manager queue). fn must not yield None.
+
+    Admitted like run(): raises QueueFull right away, before any response is
+    started. The job is submitted immediately and holds its slot until the
+    generator finishes; closing the iterator early (e.g. the client went away)
+    tells the worker to stop. A worker error is raised after the last item.
+    """
+    global _in_flight
+    _admit(1)
+    try:
+        manager = _get_manager()
+        queue, cancelled = manager.Queue(), manager.Event()
+    except Exception:
+        _in_flight -= 1
+        raise
+    task = asyncio.ensure_future(_execute(_streamed_call, (fn, args, kwargs, queue, cancelled), {}))
+    return _stream_items(task, queue, cancelled)
+
+
+async def _stream_items(task, queue, cancelled):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                item = await loop.run_in_executor(None, queue.get, True, STREAM_POLL_INTERVAL)
+            except Empty:
+                if task.done():
+                    break  # the worker died before ending the stream
+                continue
+            if item is None:
+                break
+            yield item
+        await task
+    finally:
+        if not task.done():
+            cancelled.set()
+
+
+def _summary(samples):
+    if not samples:
+        return {"avg_ms": 0, "p95_ms": 0, "max_ms": 0}
+    ordered = sorted(samples)
+    return {
+        "avg_ms": round(1000 * sum(ordered) / len(ordered), 1),
+        "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max_ms": round(1000 * ordered[-1], 1),
+    }
+
+
+def stats():
+    """Current queue depth and recent wait/run times, for sizing the pool."""
+    return {
+        "workers": POOL_SIZE,
+        "queue_limit": QUEUE_LIMIT,
+        "in_flight": _in_flight,
+        "running": min(_in_flight, POOL_SIZE),
+        "queued": max(0, _in_flight - POOL_SIZE),
+        **_stats,
+        "wait": _summary(_wait_times),
+        "run": _summary(_run_times),
+    }
+
+
+def shutdown():
+    global _executor, _manager
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None